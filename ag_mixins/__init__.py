@@ -8,7 +8,24 @@ The key concept here is code reuse and encapsulation of common functionality in
 a separate class, which can be inherited by other classes as needed.
 """
 
+import hashlib
+import logging
+import operator
+import threading
+import time
+from collections import defaultdict
+from functools import reduce
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db import connection, transaction
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
 
 
 class AgObjectRetrievalMixin:  # pylint: disable=R0903
@@ -21,7 +38,8 @@ class AgObjectRetrievalMixin:  # pylint: disable=R0903
         Retrieve the object by its primary key.
 
         Args:
-            model (Model): The model class to retrieve the object from.
+            model (Model): The model class (or a queryset, e.g. with
+                select_related) to retrieve the object from.
             pk (int): The primary key of the object.
 
         Returns:
@@ -36,3 +54,402 @@ class AgObjectRetrievalMixin:  # pylint: disable=R0903
         # requested object cannot be found, instead of server error page.
 
         return get_object_or_404(model, id=pk)
+
+
+class AgKeysetPaginationMixin:
+    """
+    Mixin class providing cursor (keyset) pagination.
+
+    Instead of OFFSET (which makes the database walk over every skipped row)
+    the next page is asked for with a "WHERE (date_created, id) > (the last
+    row of the previous page)" filter, which an index answers directly. The
+    position is handed to the client as an opaque, signed cursor token.
+    """
+
+    page_size = 50
+    # the fields the rows are ordered by, the last one must be unique
+    keyset_ordering = ("date_created", "id")
+
+    def ag_get_keyset_page(self, queryset, cursor=None):
+        """
+        Get one page of the queryset.
+
+        Args:
+            queryset (QuerySet): The rows to paginate, model instances or
+                values() dicts (with the keyset_ordering fields in them).
+            cursor (str): The token of the page to get, None for the first.
+
+        Returns:
+            tuple: A list of the page's rows and the cursor of the next page
+            (None if this is the last page).
+
+        Raises:
+            BadRequest: If the cursor is not a valid token.
+        """
+
+        queryset = queryset.order_by(*self.keyset_ordering)
+
+        if cursor:
+            values = ag_decode_cursor(cursor, salt=self.ag_keyset_salt())
+            if not isinstance(values, list) or len(values) != len(
+                self.keyset_ordering
+            ):
+                raise BadRequest("Invalid cursor")
+            queryset = queryset.filter(
+                ag_keyset_filter(self.keyset_ordering, values)
+            )
+
+        # one row more than needed, to know if there is a next page
+        rows = list(queryset[: self.page_size + 1])
+
+        if len(rows) <= self.page_size:
+            return rows, None
+
+        rows = rows[: self.page_size]
+        last_values = [
+            ag_row_value(rows[-1], field.lstrip("-"))
+            for field in self.keyset_ordering
+        ]
+        return rows, ag_encode_cursor(last_values, salt=self.ag_keyset_salt())
+
+    def ag_keyset_salt(self):
+        """A cursor is only good for the ordering it was made for."""
+
+        return f"keyset.{','.join(self.keyset_ordering)}"
+
+    def ag_get_list_page(self, items, cursor=None):
+        """
+        Get one page of an already fetched list (like ranked search results,
+        which are capped anyway), the cursor is the position in the list.
+
+        Returns:
+            tuple: The page's items and the cursor of the next page (None if
+            this is the last page).
+
+        Raises:
+            BadRequest: If the cursor is not a valid token.
+        """
+
+        start = 0
+        if cursor:
+            start = ag_decode_cursor(cursor, salt="list")
+            if not isinstance(start, int) or start < 0:
+                raise BadRequest("Invalid cursor")
+
+        end = start + self.page_size
+        next_cursor = None
+        if end < len(items):
+            next_cursor = ag_encode_cursor(end, salt="list")
+
+        return items[start:end], next_cursor
+
+
+def ag_row_value(row, name):
+    """The value of a model instance's field or a values() dict's key."""
+
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def ag_keyset_filter(ordering, values):
+    """
+    Build the "comes after this row" filter for keyset pagination.
+
+    For the ordering ("date_created", "id") and the values (d, i) it is
+    date_created > d OR (date_created = d AND id > i). A "-" in front of a
+    field means descending order, so there it is "<" instead.
+
+    Returns:
+        Q: The filter.
+    """
+
+    alternatives = []
+    equal_so_far = Q()
+
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        alternatives.append(equal_so_far & Q(**{f"{name}__{lookup}": value}))
+        equal_so_far &= Q(**{name: value})
+
+    return reduce(operator.or_, alternatives)
+
+
+def ag_encode_cursor(value, salt):
+    """Turn a position (json-able, dates allowed) into an opaque token."""
+
+    if isinstance(value, list):
+        value = [
+            item.isoformat() if hasattr(item, "isoformat") else item
+            for item in value
+        ]
+
+    return signing.dumps(value, salt=f"ag_mixins.cursor.{salt}")
+
+
+def ag_decode_cursor(token, salt):
+    """
+    Turn a token made by ag_encode_cursor back into the position.
+
+    Raises:
+        BadRequest: If the token is damaged or was made for something else.
+    """
+
+    try:
+        return signing.loads(token, salt=f"ag_mixins.cursor.{salt}")
+    except signing.BadSignature as error:
+        raise BadRequest("Invalid cursor") from error
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more database queries than its query_budget allows."""
+
+
+class AgQueryCounter:  # pylint: disable=R0903
+    """
+    A database execute wrapper (connection.execute_wrapper) that counts the
+    queries going through it.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class AgQueryBudgetMixin:  # pylint: disable=R0903
+    """
+    Mixin class that counts the database queries of every request to the
+    view and complains when there are more than query_budget of them - the
+    usual sign of an N+1 problem (a query per row in a template loop).
+
+    Over the budget it raises QueryBudgetExceeded when QUERY_BUDGET_STRICT
+    is on (defaults to DEBUG), otherwise only logs an error. The budget
+    covers the whole request, including loading the session and the user.
+    """
+
+    query_budget = None  # None - count, but don't limit
+
+    def dispatch(self, request, *args, **kwargs):
+        """Run the view (and render its response) while counting queries."""
+
+        counter = AgQueryCounter()
+
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+            # TemplateResponse renders lazily, after dispatch, so render it
+            # here - template queries are the usual N+1 suspects
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+
+        request.query_count = counter.count
+        logger.debug(
+            "%s ran %s queries", self.__class__.__name__, counter.count
+        )
+
+        if self.query_budget is not None and counter.count > self.query_budget:
+            message = (
+                f"{self.__class__.__name__} ran {counter.count} queries, "
+                f"its budget is {self.query_budget}"
+            )
+            if getattr(settings, "QUERY_BUDGET_STRICT", settings.DEBUG):
+                raise QueryBudgetExceeded(message)
+            logger.error(message)
+
+        return response
+
+
+class AgQueryBudgetTestMixin:  # pylint: disable=R0903
+    """
+    Mixin class for TestCases, to check a view stays within its
+    query_budget (see AgQueryBudgetMixin).
+    """
+
+    def assert_within_query_budget(self, url, method="get", data=None):
+        """
+        Request the url and fail if the view behind it ran more queries than
+        its query_budget.
+
+        Returns:
+            HttpResponse: The response, for further checks.
+        """
+        # test tools, not needed (imported) outside of tests
+        # pylint: disable=import-outside-toplevel
+        from django.test.utils import CaptureQueriesContext, override_settings
+
+        view_class = resolve(url.split("?")[0]).func.view_class
+        budget = view_class.query_budget
+        self.assertIsNotNone(budget, f"{view_class.__name__} has no budget")
+
+        with override_settings(
+            QUERY_BUDGET_STRICT=False
+        ), CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+
+        executed = "\n".join(query["sql"] for query in queries)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{view_class.__name__} ran {len(queries)} queries, its budget "
+            f"is {budget}:\n{executed}",
+        )
+
+        return response
+
+
+class AgAnonymousCacheMixin:
+    """
+    Mixin class that caches the (rendered) responses to anonymous GET
+    requests, so a hit costs no queries and no template rendering.
+
+    The cache keys contain the versions of the cache_namespaces the view
+    depends on (see ag_cache_versions), so bumping a namespace's version
+    (ag_bump_cache_versions, e.g. from a post_save signal) makes every page
+    built from the old data a miss - there is no need to know which pages
+    those were.
+
+    Only 200 responses without cookies are kept, and never a page with a
+    CSRF token in it (the token is per user). Every response gets an X-Cache
+    header (hit or miss), see ag_cache_stats for the counts.
+    """
+
+    # the namespaces of the data the page shows, () - don't cache
+    cache_namespaces = ()
+    # how long (in seconds) a page is kept, None - PAGE_CACHE_TIMEOUT
+    cache_timeout = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """Serve the response from the cache, or cache it."""
+
+        if not self.ag_is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.ag_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            _count_cache(self.__class__.__name__, "hit")
+            response["X-Cache"] = "hit"
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+
+        _count_cache(self.__class__.__name__, "miss")
+        if self.ag_is_cacheable_response(request, response):
+            timeout = self.cache_timeout
+            if timeout is None:
+                timeout = getattr(settings, "PAGE_CACHE_TIMEOUT", 300)
+            cache.set(key, response, timeout)
+        response["X-Cache"] = "miss"
+        return response
+
+    def ag_is_cacheable_request(self, request):
+        """Only anonymous reads of views that declare their namespaces."""
+
+        return (
+            bool(self.cache_namespaces)
+            and request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated
+        )
+
+    def ag_is_cacheable_response(self, request, response):
+        """Only complete, successful responses that are the same for all."""
+
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            # the page has a CSRF token in it
+            and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        )
+
+    def ag_cache_key(self, request):
+        """The cache key of the request's response, at current versions."""
+
+        versions = ag_cache_versions(self.cache_namespaces)
+        path = hashlib.md5(
+            request.get_full_path().encode("utf-8"), usedforsecurity=False
+        ).hexdigest()
+        return f"ag_mixins.page.{self.__class__.__name__}.{versions}.{path}"
+
+
+# view name -> {"hit": n, "miss": n}, of this process
+_cache_stats = defaultdict(lambda: {"hit": 0, "miss": 0})
+_cache_stats_lock = threading.Lock()
+
+
+def _count_cache(view_name, outcome):
+    """Count a page cache hit or miss."""
+
+    with _cache_stats_lock:
+        _cache_stats[view_name][outcome] += 1
+    logger.debug("Page cache %s: %s", outcome, view_name)
+
+
+def ag_cache_stats():
+    """
+    The page cache hits and misses (see AgAnonymousCacheMixin) of this
+    process, since it started.
+
+    Returns:
+        dict: View name -> {"hit": n, "miss": n}.
+    """
+
+    with _cache_stats_lock:
+        return {name: dict(counts) for name, counts in _cache_stats.items()}
+
+
+def _version_key(namespace):
+    """The cache key of a namespace's version."""
+
+    return f"ag_mixins.version.{namespace}"
+
+
+def _new_version():
+    """
+    A version for a namespace that has none (yet, or any more). The current
+    time in milliseconds, so a version lost with the cache (evicted, or the
+    cache restarted) is never handed out again.
+    """
+
+    return int(time.time() * 1000)
+
+
+def ag_cache_versions(namespaces):
+    """
+    The current versions of the namespaces, as one string for cache keys.
+
+    Returns:
+        str: Like "1718000000000.1718000000005".
+    """
+
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return ".".join(str(versions[key]) for key in keys)
+
+
+def ag_bump_cache_versions(*namespaces):
+    """
+    Invalidate everything cached from the namespaces' data by moving them
+    to a new version.
+
+    Done right away and once more when the current transaction commits - so
+    a page rendered from the old data in between is not kept either.
+    """
+
+    def bump():
+        for namespace in namespaces:
+            try:
+                cache.incr(_version_key(namespace))
+            except ValueError:
+                # not in the cache (any more)
+                cache.set(_version_key(namespace), _new_version(), None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,27 @@
+"""
+App configuration for the API application.
+
+This module contains the Django configuration for the 'api' app - a read-only
+JSON API over the quotes and authors. The app has no models of its own, it
+serves the ones of the 'quotes' and 'authors' apps.
+
+The 'ApiConfig' class within this module is used by Django's app registry
+to configure app-specific settings.
+
+See Django's documentation on applications and AppConfig for more information:
+https://docs.djangoproject.com/en/stable/ref/applications/
+"""
+
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    """
+    Configuration for the 'api' application.
+
+    Overrides the default auto field type with 'BigAutoField', like the other
+    apps do. It also sets the application's name within the Django project.
+    """
+
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.api"
@@ -0,0 +1,33 @@
+"""A module that contains all the urls for the api app (version 1)."""
+
+from django.urls import path
+
+from apps.api.views import (
+    AuthorDetailApiView,
+    AuthorListApiView,
+    QuoteDetailApiView,
+    QuoteListApiView,
+    QuoteSearchApiView,
+    RandomQuoteApiView,
+)
+
+urlpatterns = [
+    path("quotes", QuoteListApiView.as_view(), name="api-quote-list"),
+    path(
+        "quotes/search", QuoteSearchApiView.as_view(), name="api-quote-search"
+    ),
+    path(
+        "quotes/random", RandomQuoteApiView.as_view(), name="api-quote-random"
+    ),
+    path(
+        "quotes/<int:pk>",
+        QuoteDetailApiView.as_view(),
+        name="api-quote-detail",
+    ),
+    path("authors", AuthorListApiView.as_view(), name="api-author-list"),
+    path(
+        "authors/<int:pk>",
+        AuthorDetailApiView.as_view(),
+        name="api-author-detail",
+    ),
+]
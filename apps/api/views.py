@@ -0,0 +1,340 @@
+"""
+A module for the read-only JSON API (version 1).
+
+Rows are read with values() - plain dicts, no model instances - and
+serialized with ujson. Lists are keyset paginated (see
+AgKeysetPaginationMixin): a page has the "results" and the url of the
+"next" page (null on the last one).
+
+Every response carries an ETag made of the versions of the data it shows
+(see ag_cache_versions), which change with every save or delete. A client
+that sends it back in If-None-Match gets an empty 304 Not Modified when
+nothing changed - decided before any query runs, so polling costs next to
+nothing. Anonymous responses are cached too (see AgAnonymousCacheMixin).
+"""
+
+import hashlib
+
+import ujson
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag, urlencode
+from django.views import View
+
+from ag_mixins import (
+    AgAnonymousCacheMixin,
+    AgKeysetPaginationMixin,
+    AgQueryBudgetMixin,
+    ag_cache_versions,
+)
+from apps.authors.models import Author
+from apps.quotes import sampling
+from apps.quotes.models import Quote
+from apps.quotes.query import (
+    QueryError,
+    explain_query,
+    parse_query,
+    query_quote_ids,
+)
+
+QUOTE_FIELDS = (
+    "id",
+    "text",
+    "active",
+    "date_created",
+    "author_id",
+    "author__name",
+    "author__lastname",
+)
+
+AUTHOR_FIELDS = (
+    "id",
+    "name",
+    "lastname",
+    "date_created",
+    "quote_count",
+    "active_quote_count",
+)
+
+
+def quote_data(row):
+    """The API representation of a quote values() row."""
+
+    author = None
+    if row["author_id"] is not None:
+        author = {
+            "id": row["author_id"],
+            "name": row["author__name"],
+            "lastname": row["author__lastname"],
+        }
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "active": row["active"],
+        "date_created": row["date_created"].isoformat(),
+        "author": author,
+    }
+
+
+def author_data(row):
+    """The API representation of an author values() row."""
+
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "lastname": row["lastname"],
+        "date_created": row["date_created"].isoformat(),
+        "quote_count": row["quote_count"],
+        "active_quote_count": row["active_quote_count"],
+    }
+
+
+class ApiView(AgAnonymousCacheMixin, AgQueryBudgetMixin, View):
+    """
+    Base class of the API views: GET only, JSON responses (errors too) with
+    an ETag.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    # the data the responses are made of, () - no ETag and no caching
+    cache_namespaces = ("quotes", "authors")
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Answer 304 right away if the client is up to date, otherwise get
+        the response (turning errors into JSON too) and tag it.
+        """
+
+        etag = self.get_etag(request)
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified["ETag"] = etag
+                return not_modified
+
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.json_response({"detail": "Not found"}, status=404)
+        except BadRequest as error:
+            return self.json_response({"detail": str(error)}, status=400)
+
+        if etag is not None and response.status_code == 200:
+            response["ETag"] = etag
+            # clients may keep the response, but have to check it's fresh
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_etag(self, request):
+        """The ETag of the response: the data's versions and the url."""
+
+        if not self.cache_namespaces:
+            return None
+        versions = ag_cache_versions(self.cache_namespaces)
+        tag = hashlib.md5(
+            f"{versions}:{request.get_full_path()}".encode("utf-8"),
+            usedforsecurity=False,
+        ).hexdigest()
+        return quote_etag(tag)
+
+    def json_response(self, data, status=200):
+        """Serialize the data into a response."""
+
+        return HttpResponse(
+            ujson.dumps(
+                data, ensure_ascii=False, escape_forward_slashes=False
+            ),
+            content_type="application/json",
+            status=status,
+        )
+
+
+class ApiListView(AgKeysetPaginationMixin, ApiView):
+    """Base class of the paginated API lists."""
+
+    page_size = 100
+
+    def page_response(self, results, next_cursor, extra=None, **parameters):
+        """
+        A page of results, with the absolute url of the next page (and the
+        extra data, if any).
+        """
+
+        next_url = None
+        if next_cursor:
+            parameters = {
+                name: value
+                for name, value in parameters.items()
+                if value is not None
+            }
+            parameters["cursor"] = next_cursor
+            next_url = self.request.build_absolute_uri(
+                f"{self.request.path}?{urlencode(parameters)}"
+            )
+        return self.json_response(
+            {"results": results, "next": next_url, **(extra or {})}
+        )
+
+
+def _int_parameter(request, name):
+    """An optional integer GET parameter."""
+
+    value = request.GET.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError as error:
+        raise BadRequest(f"{name} must be a number") from error
+
+
+class QuoteListApiView(ApiListView):
+    """All the quotes (or the quotes of ?author=id), oldest first."""
+
+    # the page of quotes (with their authors)
+    query_budget = 1
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        quotes = Quote.objects.values(*QUOTE_FIELDS)
+        author = _int_parameter(request, "author")
+        if author is not None:
+            quotes = quotes.filter(author_id=author)
+
+        rows, next_cursor = self.ag_get_keyset_page(
+            quotes, request.GET.get("cursor")
+        )
+        return self.page_response(
+            [quote_data(row) for row in rows], next_cursor, author=author
+        )
+
+
+class QuoteSearchApiView(ApiListView):
+    """
+    The quotes matching ?q=, best matches first (see quotes.search). The
+    query can have fields, like author:Huxley (see quotes.query). With
+    DEBUG on, ?explain=1 adds the query's plan to the page.
+    """
+
+    # the authors of author: + the search + the page of quotes
+    query_budget = 3
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        query = request.GET.get("q", "").strip()
+        if not query:
+            raise BadRequest("q is required")
+
+        try:
+            parsed = parse_query(query)
+        except QueryError as error:
+            raise BadRequest(str(error)) from error
+
+        quote_ids, next_cursor = self.ag_get_list_page(
+            query_quote_ids(parsed), request.GET.get("cursor")
+        )
+        rows = {
+            row["id"]: row
+            for row in Quote.objects.values(*QUOTE_FIELDS).filter(
+                pk__in=quote_ids
+            )
+        }
+        results = [quote_data(rows[pk]) for pk in quote_ids if pk in rows]
+
+        extra = None
+        if settings.DEBUG and request.GET.get("explain") == "1":
+            # explaining runs the query again, and EXPLAIN QUERY PLAN
+            self.query_budget = None
+            extra = {"plan": explain_query(parsed)}
+
+        return self.page_response(results, next_cursor, extra, q=query)
+
+
+class QuoteDetailApiView(ApiView):
+    """A single quote."""
+
+    # the quote (with its author)
+    query_budget = 1
+
+    def get(self, _request, pk):
+        """What happens to this view when get request knocks on the door."""
+
+        row = Quote.objects.values(*QUOTE_FIELDS).filter(pk=pk).first()
+        if row is None:
+            raise Http404
+        return self.json_response(quote_data(row))
+
+
+class RandomQuoteApiView(ApiView):
+    """A random quote (see quotes.sampling), different on every request."""
+
+    # the last slot + the quote in the picked slot + its author
+    query_budget = 3
+    cache_namespaces = ()
+
+    def get(self, _request):
+        """What happens to this view when get request knocks on the door."""
+
+        quote = sampling.random_quote()
+        if quote is None:
+            raise Http404
+
+        row = {
+            "author__name": None,
+            "author__lastname": None,
+            **{
+                field: getattr(quote, field)
+                for field in QUOTE_FIELDS
+                if "__" not in field
+            },
+        }
+        if quote.author is not None:
+            row["author__name"] = quote.author.name
+            row["author__lastname"] = quote.author.lastname
+
+        response = self.json_response(quote_data(row))
+        # no point in keeping (or revalidating) something random
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+class AuthorListApiView(ApiListView):
+    """All the authors, oldest first."""
+
+    # the page of authors
+    query_budget = 1
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        rows, next_cursor = self.ag_get_keyset_page(
+            Author.objects.values(*AUTHOR_FIELDS), request.GET.get("cursor")
+        )
+        return self.page_response(
+            [author_data(row) for row in rows], next_cursor
+        )
+
+
+class AuthorDetailApiView(ApiView):
+    """A single author, with the url of their quotes."""
+
+    # the author
+    query_budget = 1
+
+    def get(self, request, pk):
+        """What happens to this view when get request knocks on the door."""
+
+        row = Author.objects.values(*AUTHOR_FIELDS).filter(pk=pk).first()
+        if row is None:
+            raise Http404
+
+        data = author_data(row)
+        data["quotes"] = request.build_absolute_uri(
+            f"{reverse('api-quote-list')}?{urlencode({'author': pk})}"
+        )
+        return self.json_response(data)
@@ -12,6 +12,8 @@ class AuthorAdmin(admin.ModelAdmin):
         "id",
         "name",
         "lastname",
+        "quote_count",
+        "active_quote_count",
     )
     list_editable = ("name",)
 
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 21:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    """
+    SQLite can't rename the rebuilt table while the quote search triggers
+    refer to it, so drop them - apps.quotes puts them back after migrate
+    (see apps.quotes.search.ensure_triggers).
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in (
+        "quote_insert",
+        "quote_update",
+        "quote_delete",
+        "author_update",
+    ):
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS quotes_quote_fts_{name}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="author",
+            name="date_modified",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
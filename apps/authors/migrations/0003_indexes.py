@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:32
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0002_author_date_modified"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["date_created", "id"], name="authors_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(fields=["name"], name="authors_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="authors_name_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Lower("lastname"),
+                name="authors_lastname_lower_idx",
+            ),
+        ),
+    ]
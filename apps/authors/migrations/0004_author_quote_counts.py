@@ -0,0 +1,68 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def drop_search_triggers(apps, schema_editor):
+    """
+    SQLite can't rename the rebuilt table while the quote search triggers
+    refer to it, so drop them - apps.quotes puts them back after migrate
+    (see apps.quotes.search.ensure_triggers).
+    """
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in (
+        "quote_insert",
+        "quote_update",
+        "quote_delete",
+        "author_update",
+    ):
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS quotes_quote_fts_{name}"
+        )
+
+
+def count_quotes(apps, schema_editor):
+    """Count the quotes of the authors that already exist."""
+    Author = apps.get_model("authors", "Author")
+    Quote = apps.get_model("quotes", "Quote")
+    counts = (
+        Quote.objects.filter(author=OuterRef("pk"))
+        .values("author")
+        .annotate(total=Count("pk"), active=Count("pk", filter=Q(active=True)))
+    )
+    Author.objects.update(
+        quote_count=Coalesce(Subquery(counts.values("total")), 0),
+        active_quote_count=Coalesce(Subquery(counts.values("active")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0003_indexes"),
+        ("quotes", "0008_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="author",
+            name="quote_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="author",
+            name="active_quote_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["-quote_count", "id"], name="authors_popular_idx"
+            ),
+        ),
+        migrations.RunPython(count_quotes, migrations.RunPython.noop),
+    ]
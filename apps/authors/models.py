@@ -1,6 +1,7 @@
 """A module to register author app models to django admin."""
 
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class Author(models.Model):
@@ -9,6 +10,56 @@ class Author(models.Model):
     name = models.CharField(max_length=50, blank=False)
     lastname = models.CharField(max_length=50, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    # changes on every save, a version of the author (see quotes.fragments)
+    date_modified = models.DateTimeField(auto_now=True)
+    # maintained by the quote signals (see apps.quotes.counters)
+    quote_count = models.PositiveIntegerField(default=0, editable=False)
+    active_quote_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        """The author table's indexes."""
+
+        # pylint: disable=too-few-public-methods
+
+        indexes = [
+            # the author list (keyset pagination)
+            models.Index(
+                fields=["date_created", "id"], name="authors_created_idx"
+            ),
+            # the importers look authors up by their exact name
+            models.Index(fields=["name"], name="authors_name_idx"),
+            # case insensitive lookups, filter on Lower("name") to use them
+            # (see apps.quotes.query)
+            models.Index(Lower("name"), name="authors_name_lower_idx"),
+            models.Index(Lower("lastname"), name="authors_lastname_lower_idx"),
+            # the author list by popularity
+            models.Index(
+                fields=["-quote_count", "id"], name="authors_popular_idx"
+            ),
+        ]
+
+    # maintained by the database (see apps.quotes.counters), never written
+    # by a save of the author
+    COUNT_FIELDS = ("quote_count", "active_quote_count")
 
     def __str__(self):
         return str(self.name)
+
+    @property
+    def full_name(self):
+        """Name and lastname (if there is one)."""
+        return " ".join(part for part in (self.name, self.lastname) if part)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the author, but not the quote counts it loaded - they may be
+        outdated by now, the quote signals change them in the database.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNT_FIELDS
+            ]
+        super().save(*args, **kwargs)
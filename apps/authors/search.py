@@ -0,0 +1,99 @@
+"""
+A module for looking authors up by what was typed so far (see the author
+picker, apps.authors.widgets.AuthorPickerWidget).
+
+A query matches the authors whose name or lastname starts with it, case
+insensitively - "hux" finds Aldous Huxley - and "aldous hu" the ones with
+that name and a lastname starting with "hu". The lookups are range searches
+of the Lower("name") and Lower("lastname") indexes, each capped at the
+limit, so they cost the same however many authors there are. Without a
+query the most popular authors are the options.
+
+The query is lowercased the way the database lowercases the indexed values
+(see fold_case): SQLite's LOWER() only folds the ASCII letters, so "Émile"
+is found by "émile" only if it was stored that way - but by "ÉMILE" too.
+"""
+
+import string
+import sys
+
+from django.db import connection
+from django.db.models.functions import Lower
+
+from apps.authors.models import Author
+
+DEFAULT_LIMIT = 10
+
+# the most authors ever returned
+MAX_LIMIT = 20
+
+
+# SQLite's LOWER() folds the ASCII letters only
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def fold_case(text):
+    """The text lowercased like the database's LOWER() does it."""
+
+    if connection.vendor == "sqlite":
+        return text.translate(ASCII_LOWER)
+    return text.lower()
+
+
+def prefix_range(prefix):
+    """The gte/lt lookups of the values that start with the prefix."""
+
+    # every value with the prefix sorts before prefix + U+10FFFF
+    return {"gte": prefix, "lt": prefix + chr(sys.maxunicode)}
+
+
+def search_authors(query, limit=DEFAULT_LIMIT):
+    """
+    Find the authors whose name (or lastname) starts with the query.
+
+    Args:
+        query (str): What was typed so far.
+        limit (int): How many authors to return, at most MAX_LIMIT.
+
+    Returns:
+        list: The authors, ordered by their full name.
+    """
+
+    limit = max(1, min(limit, MAX_LIMIT))
+    words = fold_case(query).split()
+    if not words:
+        return list(Author.objects.order_by("-quote_count", "id")[:limit])
+
+    authors = Author.objects.alias(
+        lower_name=Lower("name"), lower_lastname=Lower("lastname")
+    )
+    if len(words) > 1:
+        name, lastname = words[0], " ".join(words[1:])
+        lookups = [
+            authors.filter(
+                lower_name=name,
+                **{
+                    f"lower_lastname__{lookup}": value
+                    for lookup, value in prefix_range(lastname).items()
+                },
+            ).order_by(Lower("lastname"), "id")
+        ]
+    else:
+        lookups = [
+            authors.filter(
+                **{
+                    f"lower_{field}__{lookup}": value
+                    for lookup, value in prefix_range(words[0]).items()
+                }
+            ).order_by(Lower(field), "id")
+            for field in ("name", "lastname")
+        ]
+
+    found = {}
+    for lookup in lookups:
+        for author in lookup[:limit]:
+            found[author.pk] = author
+    return sorted(
+        found.values(),
+        key=lambda author: (author.full_name.lower(), author.pk),
+    )[:limit]
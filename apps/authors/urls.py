@@ -6,13 +6,23 @@ from apps.authors.views import (
     AuthorCreateView,
     AuthorDeleteView,
     AuthorDetailView,
+    AuthorListPageView,
     AuthorListView,
+    AuthorOptionsView,
+    AuthorQuotesPageView,
     AuthorUpdateView,
 )
 
 urlpatterns = [
     path("list", AuthorListView.as_view(), name="author-list"),
+    path("list/page", AuthorListPageView.as_view(), name="author-list-page"),
     path("detail/<int:pk>", AuthorDetailView.as_view(), name="author-detail"),
+    path(
+        "detail/<int:pk>/quotes",
+        AuthorQuotesPageView.as_view(),
+        name="author-quotes-page",
+    ),
+    path("options", AuthorOptionsView.as_view(), name="author-options"),
     path("create", AuthorCreateView.as_view(), name="author-create"),
     path("delete/<int:pk>", AuthorDeleteView.as_view(), name="author-delete"),
     path("update/<int:pk>", AuthorUpdateView.as_view(), name="author-update"),
@@ -1,35 +1,131 @@
 """A module for author app views."""
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.core.exceptions import BadRequest
+from django.shortcuts import render
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
+from django.views import View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 from django.views.generic.list import ListView
 
+from ag_mixins import (
+    AgAnonymousCacheMixin,
+    AgKeysetPaginationMixin,
+    AgQueryBudgetMixin,
+)
 from apps.authors.models import Author
+from apps.authors.search import DEFAULT_LIMIT, search_authors
 
 
-class AuthorListView(ListView):
-    """Generic CBV view for author list page"""
+class AuthorListView(
+    AgAnonymousCacheMixin,
+    AgQueryBudgetMixin,
+    AgKeysetPaginationMixin,
+    ListView,
+):
+    """
+    Generic CBV view for author list page
+
+    Only the first page of authors is rendered, the next ones are appended by
+    HTMX (from AuthorListPageView) when the last list item is scrolled into
+    view.
+
+    The authors are sorted by popularity (the most quotes first, by the
+    maintained Author.quote_count) or, with ?sort=date, oldest first.
+    """
 
     model = Author
     template_name = "authors/author_list.html"  # default
+    # the page is a list, not a queryset, so ListView can't guess the name
+    context_object_name = "author_list"
+    # session + user + the page of authors
+    query_budget = 3
+    # the quote counts are the authors' too (see counters.change_author)
+    cache_namespaces = ("authors",)
+    # sort -> the keyset ordering, every one has an index
+    orderings = {
+        "popular": ("-quote_count", "id"),
+        "date": ("date_created", "id"),
+    }
+
+    def get_context_data(self, **kwargs):
+        """Replace the full author list with one page of it"""
+        sort = self.request.GET.get("sort", "popular")
+        if sort not in self.orderings:
+            raise BadRequest("Invalid sort")
+        self.keyset_ordering = self.orderings[sort]
+
+        authors, next_cursor = self.ag_get_keyset_page(
+            self.object_list, self.request.GET.get("cursor")
+        )
+        context = super().get_context_data(object_list=authors, **kwargs)
+
+        context["sort"] = sort
+        context["next_page_url"] = None
+        if next_cursor:
+            context["next_page_url"] = (
+                f"{reverse('author-list-page')}?"
+                f"{urlencode({'sort': sort, 'cursor': next_cursor})}"
+            )
+        return context
+
 
+class AuthorListPageView(AuthorListView):
+    """The next page of author list items, for the HTMX infinite scroll"""
 
-class AuthorDetailView(DetailView):
-    """Generic CBV view for author detail page"""
+    # pylint: disable=too-many-ancestors
+
+    template_name = "authors/partials/author_list_partial.html"
+
+
+class AuthorDetailView(
+    AgAnonymousCacheMixin,
+    AgQueryBudgetMixin,
+    AgKeysetPaginationMixin,
+    DetailView,
+):
+    """
+    Generic CBV view for author detail page
+
+    Only the first page of the author's quotes is rendered, the next ones are
+    appended by HTMX (from AuthorQuotesPageView).
+    """
 
     model = Author
     template_name = "authors/author_detail.html"  # default
+    # session + user + the author + a page of their quotes
+    query_budget = 4
+    # the author and their quotes
+    cache_namespaces = ("authors", "quotes")
 
     def get_context_data(self, **kwargs):
-        """Add the author's quotes to the context"""
+        """Add a page of the author's quotes to the context"""
         context = super().get_context_data(**kwargs)
-        context["quotes"] = self.object.quotes.all()
+        # in list order, straight from the quotes_author_created_idx index
+        quotes, next_cursor = self.ag_get_keyset_page(
+            self.object.quotes.all(), self.request.GET.get("cursor")
+        )
+        context["quotes"] = quotes
+
+        context["next_page_url"] = None
+        if next_cursor:
+            context["next_page_url"] = (
+                f"{reverse('author-quotes-page', args=[self.object.pk])}?"
+                f"{urlencode({'cursor': next_cursor})}"
+            )
         return context
 
 
+class AuthorQuotesPageView(AuthorDetailView):
+    """The next page of an author's quotes, for the HTMX infinite scroll"""
+
+    # pylint: disable=too-many-ancestors
+
+    template_name = "authors/partials/author_quotes_partial.html"
+
+
 # CreateView is very similar to FormView, but use CreateView anyway, it must be
 # there for a reason
 # does some additional magic for us, like saving to the db
@@ -73,3 +169,33 @@ class AuthorUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def test_func(self):
         """Checks if the user is a superuser."""
         return self.request.user.is_superuser
+
+
+class AuthorOptionsView(AgQueryBudgetMixin, View):
+    """
+    The <option>s of the authors that match what's typed in the author
+    picker (see apps.authors.widgets.AuthorPickerWidget), for HTMX to swap
+    into its select.
+
+    GET parameters:
+        q: what was typed so far (nothing - the most popular authors).
+        limit: how many authors (10 by default, 20 at most).
+    """
+
+    # session + user + the lookups of the name and the lastname
+    query_budget = 4
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+        except ValueError as error:
+            raise BadRequest("limit must be a number") from error
+
+        authors = search_authors(request.GET.get("q", ""), limit)
+        return render(
+            request,
+            "authors/partials/author_options.html",
+            {"authors": authors},
+        )
@@ -0,0 +1,34 @@
+"""
+A module for the author form widgets.
+
+A select of every author is a page of megabytes once there are tens of
+thousands of them, so AuthorPickerWidget renders only the selected author.
+The search box above it swaps in the options that match what's typed (see
+AuthorOptionsView and apps.authors.search).
+"""
+
+from django import forms
+
+from apps.authors.models import Author
+
+
+class AuthorPickerWidget(forms.Select):
+    """
+    A select of only the selected author, with a search-as-you-type box
+    that replaces its options.
+
+    Use it with a ModelChoiceField: validating a submitted author is one
+    lookup of its id.
+    """
+
+    template_name = "authors/widgets/author_picker.html"
+
+    def optgroups(self, name, value, attrs=None):
+        """Only the selected author is an option (and the empty one)."""
+
+        ids = [item for item in value if str(item).isdigit()]
+        self.choices = [("", "---------")] + [
+            (author.pk, author.full_name)
+            for author in Author.objects.filter(pk__in=ids)
+        ]
+        return super().optgroups(name, value, attrs)
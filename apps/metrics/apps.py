@@ -0,0 +1,40 @@
+"""
+App configuration for the metrics application.
+
+This module contains the Django configuration for the 'metrics' app - the
+request timing middleware and the Prometheus /metrics endpoint. The app has
+no models of its own.
+
+The 'MetricsConfig' class within this module is used by Django's app
+registry to configure app-specific settings.
+
+See Django's documentation on applications and AppConfig for more information:
+https://docs.djangoproject.com/en/stable/ref/applications/
+"""
+
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    """
+    Configuration for the 'metrics' application.
+
+    Overrides the default auto field type with 'BigAutoField', like the other
+    apps do. It also sets the application's name within the Django project.
+    """
+
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.metrics"
+
+    def ready(self):
+        """Connect the signal receivers once the app registry is ready."""
+        # pylint: disable=import-outside-toplevel
+        from django.db.backends.signals import connection_created
+        from django.test.signals import setting_changed
+
+        from apps.metrics import slow_queries
+        from apps.metrics.middleware import install_query_timer
+
+        # every connection counts its queries in the request's metrics
+        connection_created.connect(install_query_timer)
+        setting_changed.connect(slow_queries.settings_changed)
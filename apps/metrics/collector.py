@@ -0,0 +1,564 @@
+"""
+A module for the request metrics: per view latency histograms, response
+sizes and database query counts and time (see MetricsMiddleware), in the
+Prometheus text format (see render).
+
+Every process adds its requests up in memory - observing one is a lock, a
+bisect and a few additions. With METRICS_DIR set, every process also writes
+its totals to a file of its own there (every METRICS_FLUSH_INTERVAL seconds,
+also while no requests come - see Metrics.beat), and /metrics adds up the
+files of all the processes - so the counters of the other workers are in
+too.
+
+A file that wasn't written for STALE_FLUSHES intervals is of a process that
+is gone: its counters are moved to the retired file (so they still count,
+once) and the file is deleted (see retire_stale). Its gauges - the sizes of
+its caches, its queued log records - are dropped, they're no more.
+
+The counters of the caches (the page cache, the search result cache and
+the suggest index) and of the log queue (see their *_stats functions) are
+taken when the totals are, and added up the same way.
+"""
+
+import bisect
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from ag_mixins import ag_cache_stats
+from project.logs import log_queue_stats
+
+logger = logging.getLogger(__name__)
+
+# the upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# how often (in seconds) a process writes its totals to METRICS_DIR
+DEFAULT_FLUSH_INTERVAL = 15
+
+# a process's file is stale (the process is gone) when it wasn't written for
+# this many flush intervals
+STALE_FLUSHES = 4
+
+# the file in METRICS_DIR that keeps the counters of the gone processes
+RETIRED_NAME = "retired"
+
+# the totals of a (view, method): the counts of the buckets (not
+# cumulative, the last one is +Inf) follow these
+COUNT, SECONDS, SIZE_BYTES, SIZED, QUERIES, DB_SECONDS = range(6)
+FIRST_BUCKET = 6
+
+
+class Metrics:  # pylint: disable=R0902
+    """The request totals of this process. Thread safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (view, method) -> totals, see COUNT...FIRST_BUCKET
+        self.requests = {}
+        # (view, method, status) -> requests
+        self.statuses = {}
+        self.next_flush = 0.0
+        # the file of this process in METRICS_DIR (see name)
+        self.pid = None
+        self._name = None
+        # whether the file was written, and the thread that keeps writing it
+        self.flushed = False
+        self.heartbeat = None
+
+    @property
+    def name(self):
+        """
+        The name of this process's file: its pid and when it was first
+        asked for (pids get reused). A forked worker gets a name of its own.
+        """
+
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self._name = f"{self.pid}-{time.time_ns()}"
+            self.flushed = False
+            self.heartbeat = None
+        return self._name
+
+    def observe(self, view, method, status, seconds, measured=None):
+        """
+        Count a request.
+
+        Args:
+            view (str): The url name of the view.
+            method (str): The request method.
+            status (int): The response status code.
+            seconds (float): How long the request took.
+            measured (tuple): The response's size in bytes (None if not
+                known - a streamed response), the database queries and
+                their seconds.
+        """
+
+        size, queries, db_seconds = measured or (None, 0, 0.0)
+        bucket = FIRST_BUCKET + bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            totals = self.requests.get((view, method))
+            if totals is None:
+                totals = [0] * (FIRST_BUCKET + len(BUCKETS) + 1)
+                self.requests[(view, method)] = totals
+            totals[COUNT] += 1
+            totals[SECONDS] += seconds
+            if size is not None:
+                totals[SIZE_BYTES] += size
+                totals[SIZED] += 1
+            totals[QUERIES] += queries
+            totals[DB_SECONDS] += db_seconds
+            totals[bucket] += 1
+
+            key = (view, method, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def snapshot(self):
+        """
+        The totals, as they are now.
+
+        Returns:
+            dict: "requests", "statuses" and "samples", json-able lists.
+        """
+
+        with self.lock:
+            requests = [
+                [view, method, list(totals)]
+                for (view, method), totals in self.requests.items()
+            ]
+            statuses = [[*key, count] for key, count in self.statuses.items()]
+        return {
+            "requests": requests,
+            "statuses": statuses,
+            "samples": process_samples(),
+        }
+
+    def flush_if_due(self):
+        """Write the totals to METRICS_DIR, if it's set and it's time."""
+
+        now = time.monotonic()
+        if now < self.next_flush:
+            return
+        # the settings are read only when it's time, they're slow to read
+        self.next_flush = now + flush_interval()
+        directory = getattr(settings, "METRICS_DIR", None)
+        if directory:
+            self.flush(directory)
+            if self.heartbeat is None:
+                self.heartbeat = threading.Thread(
+                    target=self.beat, name="metrics-heartbeat", daemon=True
+                )
+                self.heartbeat.start()
+
+    def beat(self):
+        """
+        Keep writing the totals, while no requests come too - a file that
+        isn't written is taken for the one of a gone process.
+        """
+
+        while self.heartbeat is threading.current_thread():
+            time.sleep(flush_interval())
+            self.flush_if_due()
+
+    def flush(self, directory):
+        """Write the totals to this process's file in the directory."""
+
+        path = Path(directory) / f"{self.name}.json"
+        temporary = path.with_suffix(".tmp")
+        try:
+            if self.flushed and not path.exists():
+                # taken for a gone process's file (this one hung for a
+                # while), its counters are retired - they can't count twice
+                logger.warning("The metrics in %s were retired", path)
+                with self.lock:
+                    self.requests = {}
+                    self.statuses = {}
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary.write_text(json.dumps(self.snapshot()), "utf-8")
+            # atomic, a reader never sees half a file
+            os.replace(temporary, path)
+            self.flushed = True
+        except OSError:
+            logger.exception("Could not write the metrics to %s", path)
+
+
+def flush_interval():
+    """How often (in seconds) a process writes its totals to METRICS_DIR."""
+
+    return getattr(settings, "METRICS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)
+
+
+def is_counter(name):
+    """Whether the sample is a counter (it adds up), not a gauge."""
+
+    return name.endswith("_total")
+
+
+def process_samples():
+    """
+    The counters of the caches and the log queue of this process.
+
+    Returns:
+        list: [metric name, labels, value] samples.
+    """
+    # pylint: disable=import-outside-toplevel
+    # (the quotes app imports the models, this module is imported early)
+    from apps.quotes.search import search_cache_stats
+    from apps.quotes.suggest import suggest_index_stats
+
+    samples = []
+    for view, counts in ag_cache_stats().items():
+        for outcome, count in counts.items():
+            samples.append(
+                [
+                    "quotes_page_cache_requests_total",
+                    {"view": view, "outcome": outcome},
+                    count,
+                ]
+            )
+
+    search_stats = search_cache_stats()
+    for outcome in ("hit", "miss", "coalesced"):
+        samples.append(
+            [
+                "quotes_search_cache_requests_total",
+                {"outcome": outcome},
+                search_stats[outcome],
+            ]
+        )
+    samples.append(["quotes_search_cache_entries", {}, search_stats["size"]])
+
+    suggest_stats = suggest_index_stats()
+    samples.append(["quotes_suggest_index_words", {}, suggest_stats["words"]])
+    samples.append(
+        ["quotes_suggest_index_bytes", {}, suggest_stats["memory_bytes"]]
+    )
+
+    log_stats = log_queue_stats()
+    samples.append(["quotes_log_records_queued", {}, log_stats["queued"]])
+    samples.append(
+        ["quotes_log_records_dropped_total", {}, log_stats["dropped"]]
+    )
+    return samples
+
+
+def merge(snapshots):
+    """
+    Add up the totals of several processes.
+
+    Returns:
+        dict: A snapshot (see Metrics.snapshot) of all of them.
+    """
+    # pylint: disable=too-many-locals
+
+    requests = {}
+    statuses = {}
+    samples = {}
+    for snapshot in snapshots:
+        for view, method, totals in snapshot["requests"]:
+            merged = requests.setdefault((view, method), [0] * len(totals))
+            for index, value in enumerate(totals):
+                merged[index] += value
+        for view, method, status, count in snapshot["statuses"]:
+            key = (view, method, status)
+            statuses[key] = statuses.get(key, 0) + count
+        for name, labels, value in snapshot["samples"]:
+            key = (name, tuple(sorted(labels.items())))
+            if value is not None:
+                samples[key] = samples.get(key, 0) + value
+
+    return {
+        "requests": [[*key, totals] for key, totals in requests.items()],
+        "statuses": [[*key, count] for key, count in statuses.items()],
+        "samples": [
+            [name, dict(labels), value]
+            for (name, labels), value in samples.items()
+        ],
+    }
+
+
+_metrics = Metrics()
+
+
+def observe(view, method, status, seconds, measured=None):
+    """Count a request (see Metrics.observe), in this process's totals."""
+
+    _metrics.observe(view, method, status, seconds, measured)
+    _metrics.flush_if_due()
+
+
+def collect():
+    """
+    The totals of this process - or, with METRICS_DIR set, of all the
+    processes that wrote theirs there.
+
+    Returns:
+        dict: A snapshot (see Metrics.snapshot).
+    """
+
+    directory = getattr(settings, "METRICS_DIR", None)
+    if not directory:
+        return _metrics.snapshot()
+
+    # this process's file, up to date
+    _metrics.flush(directory)
+    directory = Path(directory)
+    stale_after = STALE_FLUSHES * flush_interval()
+    with directory_lock(directory) as locked:
+        if locked:
+            retire_stale(directory, stale_after)
+        snapshots = []
+        for path in directory.glob("*.json"):
+            snapshot = read_snapshot(path)
+            if snapshot is None:
+                logger.warning("Skipping the unreadable metrics file %s", path)
+            elif path.stem != RETIRED_NAME and is_stale(path, stale_after):
+                # not retired (no lock), its gauges are gone all the same
+                snapshots.append(counters_of(snapshot))
+            else:
+                snapshots.append(snapshot)
+    return merge(snapshots)
+
+
+@contextlib.contextmanager
+def directory_lock(directory):
+    """
+    Hold the lock of the metrics directory (one collect retires the stale
+    files at a time).
+
+    Yields:
+        bool: Whether it's locked - it can't be without fcntl.
+    """
+
+    if fcntl is None:
+        yield False
+        return
+    try:
+        lock = open(  # pylint: disable=consider-using-with
+            directory / ".lock", "a", encoding="utf-8"
+        )
+    except OSError:
+        logger.exception("Could not lock the metrics in %s", directory)
+        yield False
+        return
+    with lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield True
+
+
+def read_snapshot(path):
+    """A snapshot (see Metrics.snapshot) from a file, None if unreadable."""
+
+    try:
+        return json.loads(path.read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(path, stale_after):
+    """Whether the file wasn't written for stale_after seconds."""
+
+    try:
+        return time.time() - path.stat().st_mtime > stale_after
+    except OSError:
+        return False
+
+
+def counters_of(snapshot):
+    """The snapshot without its gauges."""
+
+    return {
+        **snapshot,
+        "samples": [
+            sample for sample in snapshot["samples"] if is_counter(sample[0])
+        ],
+    }
+
+
+def retire_stale(directory, stale_after):
+    """
+    Add the counters of the gone processes - their files weren't written
+    for stale_after seconds - to the retired file, and delete their files.
+    To be called holding the directory's lock.
+
+    The retired file names the files it took, a file that's left behind
+    (the deleting failed) isn't added up twice.
+    """
+
+    retired_path = directory / f"{RETIRED_NAME}.json"
+    retired = read_snapshot(retired_path) or {
+        "requests": [],
+        "statuses": [],
+        "samples": [],
+    }
+    taken = set(retired.get("files", []))
+    stale = [
+        path
+        for path in directory.glob("*.json")
+        if path != retired_path and is_stale(path, stale_after)
+    ]
+    if not stale:
+        return
+
+    snapshots = [retired]
+    for path in stale:
+        snapshot = read_snapshot(path)
+        if path.name not in taken and snapshot is not None:
+            snapshots.append(counters_of(snapshot))
+    merged = merge(snapshots)
+    merged["files"] = [path.name for path in stale]
+    temporary = retired_path.with_suffix(".tmp")
+    try:
+        temporary.write_text(json.dumps(merged), "utf-8")
+        os.replace(temporary, retired_path)
+        for path in stale:
+            path.unlink()
+    except OSError:
+        logger.exception("Could not retire the metrics in %s", directory)
+
+
+def reset():
+    """Forget this process's totals (for tests)."""
+
+    global _metrics  # pylint: disable=global-statement
+    # its heartbeat stops
+    _metrics.heartbeat = None
+    _metrics = Metrics()
+
+
+def label_value(value):
+    """A label value, escaped for the text format."""
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def labels_of(labels):
+    """Labels in the text format, like {view="a",method="GET"}."""
+
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{label_value(value)}"' for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def render(snapshot):
+    """
+    The totals in the Prometheus text exposition format (version 0.0.4).
+
+    Returns:
+        str: The exposition.
+    """
+    # pylint: disable=too-many-locals
+
+    lines = []
+
+    def family(name, kind, description):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def sample(name, labels, value):
+        lines.append(f"{name}{labels_of(labels)} {value}")
+
+    requests = sorted(snapshot["requests"])
+
+    family(
+        "quotes_request_duration_seconds",
+        "histogram",
+        "How long the requests took, by view.",
+    )
+    for view, method, totals in requests:
+        labels = {"view": view, "method": method}
+        cumulative = 0
+        for bound, count in zip([*BUCKETS, "+Inf"], totals[FIRST_BUCKET:]):
+            cumulative += count
+            sample(
+                "quotes_request_duration_seconds_bucket",
+                {**labels, "le": bound},
+                cumulative,
+            )
+        sample("quotes_request_duration_seconds_sum", labels, totals[SECONDS])
+        sample("quotes_request_duration_seconds_count", labels, totals[COUNT])
+
+    family(
+        "quotes_response_size_bytes",
+        "summary",
+        "The sizes of the (not streamed) responses, by view.",
+    )
+    for view, method, totals in requests:
+        labels = {"view": view, "method": method}
+        sample("quotes_response_size_bytes_sum", labels, totals[SIZE_BYTES])
+        sample("quotes_response_size_bytes_count", labels, totals[SIZED])
+
+    family(
+        "quotes_db_queries_total",
+        "counter",
+        "The database queries the requests ran, by view.",
+    )
+    for view, method, totals in requests:
+        sample(
+            "quotes_db_queries_total",
+            {"view": view, "method": method},
+            totals[QUERIES],
+        )
+
+    family(
+        "quotes_db_query_duration_seconds_total",
+        "counter",
+        "How long the requests' database queries took, by view.",
+    )
+    for view, method, totals in requests:
+        sample(
+            "quotes_db_query_duration_seconds_total",
+            {"view": view, "method": method},
+            totals[DB_SECONDS],
+        )
+
+    family(
+        "quotes_requests_total",
+        "counter",
+        "The requests, by view and response status.",
+    )
+    for view, method, status, count in sorted(snapshot["statuses"]):
+        sample(
+            "quotes_requests_total",
+            {"view": view, "method": method, "status": status},
+            count,
+        )
+
+    kinds = {"_total": "counter"}
+    described = set()
+    for name, labels, value in sorted(
+        snapshot["samples"],
+        key=lambda item: (item[0], sorted(item[1].items())),
+    ):
+        if value is None:
+            continue
+        if name not in described:
+            described.add(name)
+            family(
+                name,
+                kinds.get(name[-6:], "gauge"),
+                name.removeprefix("quotes_").replace("_", " ").capitalize()
+                + ".",
+            )
+        sample(name, labels, value)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.metrics.slow_queries import read_entries, summarize
+
+SORTS = {
+    "total": "total_seconds",
+    "max": "max_seconds",
+    "count": "count",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the logged slow queries, grouped by fingerprint, with how the "
+        "database runs them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sort",
+            choices=SORTS,
+            default="total",
+            help="the slowest by their total time, worst time or count",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="how many queries to show",
+        )
+        parser.add_argument(
+            "--view",
+            help="only the queries of this view (its url name)",
+        )
+        parser.add_argument(
+            "--log",
+            help=(
+                "the log to read, {pid} in it for the logs of all the "
+                "processes, SLOW_QUERY_LOG by default"
+            ),
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["limit"] < 1:
+            raise CommandError("--limit must be at least 1")
+
+        entries = read_entries(kwargs["log"])
+        if kwargs["view"]:
+            entries = (
+                entry
+                for entry in entries
+                if entry.get("view") == kwargs["view"]
+            )
+        groups = sorted(
+            summarize(entries),
+            key=lambda group: group[SORTS[kwargs["sort"]]],
+            reverse=True,
+        )
+
+        for group in groups[: kwargs["limit"]]:
+            self.stdout.write(
+                f"{group['fingerprint']}: {group['count']} times, "
+                f"{group['total_seconds']:.3f}s total, "
+                f"{group['max_seconds']:.3f}s worst, last at "
+                f"{group['time']}, in {', '.join(sorted(group['views']))}"
+            )
+            self.stdout.write(f"    {group['sql']}")
+            for line in group["plan"] or ["(no plan in the log)"]:
+                self.stdout.write(f"    | {line}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully read {len(groups)} slow queries")
+        )
@@ -0,0 +1,114 @@
+"""
+A module for the middleware that measures every request for the metrics
+(see apps.metrics.collector): how long it took, how big the response was,
+and how many database queries it ran and for how long.
+
+It's the first middleware, so the time is the whole request's, the other
+middleware (sessions, authentication, ...) included. The view is the url
+name (like "quote-list") - "unresolved" for the urls that match no view.
+
+The queries are measured by time_queries, an execute wrapper every
+connection gets once, when it connects (see install_query_timer) - not by
+one wrapped around every request: connection.execute_wrapper goes through
+the connection proxy, which alone costs more than the rest of the
+measuring. The request's QueryTimer is found through a context variable.
+The wrapper also hands the slow queries, of the requests and of everything
+else, to the slow query log.
+"""
+
+import time
+from contextvars import ContextVar
+
+from apps.metrics import slow_queries
+from apps.metrics.collector import observe
+
+# the QueryTimer of the request being measured
+_current_timer = ContextVar("metrics_query_timer", default=None)
+
+
+class QueryTimer:  # pylint: disable=R0903
+    """The database queries of a request, and how long they took."""
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def view(self):
+        """The url name of the request's view (once it's resolved)."""
+
+        match = getattr(self.request, "resolver_match", None)
+        return match.view_name if match else None
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    A database execute wrapper that counts the query in the current
+    request's QueryTimer (if a request is being measured), and logs it if
+    it's slow (see apps.metrics.slow_queries).
+    """
+
+    timer = _current_timer.get()
+    started = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        if timer is not None:
+            timer.seconds += seconds
+            timer.count += 1
+
+    # the failed ones aren't slow, they raise
+    slow = slow_queries.threshold()
+    if slow is not None and seconds >= slow and not many:
+        slow_queries.record(
+            sql, params, seconds, context, timer.view if timer else None
+        )
+    return result
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    The connection_created receiver: wrap the connection's queries in
+    time_queries (a connection reconnects with its wrappers).
+    """
+    # pylint: disable=unused-argument
+
+    # first, not last: a connection opened in a connection.execute_wrapper
+    # block gets it while the block's wrapper is on the list - appended, it
+    # would be the one the block pops when it ends
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_queries)
+
+
+class MetricsMiddleware:  # pylint: disable=R0903
+    """Measure every request and count it in the metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer(request)
+        token = _current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        observe(
+            match.view_name if match else "unresolved",
+            request.method,
+            response.status_code,
+            seconds,
+            (
+                # a streamed response's size isn't known until it's sent
+                None if response.streaming else len(response.content),
+                timer.count,
+                timer.seconds,
+            ),
+        )
+        return response
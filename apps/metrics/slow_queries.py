@@ -0,0 +1,257 @@
+"""
+A module for the slow query log: every database query that takes at least
+SLOW_QUERY_THRESHOLD seconds (None turns it off) is logged with its SQL,
+a fingerprint of it and of its params, how long it took and the view it
+ran for (None outside of a request - a management command, the shell).
+
+The queries are timed by the metrics' execute wrapper (see
+apps.metrics.middleware.time_queries), which hands the slow ones to
+record. The first time a process sees a fingerprint it also asks the
+database how it runs the query (EXPLAIN QUERY PLAN on SQLite), so the log
+says why it's slow.
+
+The entries go to the "apps.metrics.slow_queries" logger, which writes
+them to SLOW_QUERY_LOG through the logging queue (see project.logs, so
+the request doesn't wait for the disk), rotated like the other logs - a
+file per process (see project.logs.PID_PLACEHOLDER). The slow_queries
+command reads them all back, grouped by fingerprint.
+
+The SQL is logged as Django ran it - with placeholders, the params
+themselves are not logged (they can be anything users typed), only their
+fingerprint: two entries with the same one ran with the same params.
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from project.logs import PID_PLACEHOLDER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.1
+
+# how many fingerprints a process remembers having explained
+MAX_EXPLAINED = 1000
+
+# the statements worth explaining (the others are pragmas, DDL, ...)
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# what varies between runs of the same query: the count of placeholders in
+# an IN list, numbers and strings inlined in the SQL
+PLACEHOLDERS_RE = re.compile(r"\bIN \(%s(?:\s*,\s*%s)*\)", re.IGNORECASE)
+LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SPACES_RE = re.compile(r"\s+")
+
+# the threshold, read from the settings once (see settings_changed)
+_threshold = {}
+
+_explained = set()
+_explained_lock = threading.Lock()
+
+
+def threshold():
+    """The least seconds a logged query takes, None when it's off."""
+
+    if "seconds" not in _threshold:
+        _threshold["seconds"] = getattr(
+            settings, "SLOW_QUERY_THRESHOLD", DEFAULT_THRESHOLD
+        )
+    return _threshold["seconds"]
+
+
+def settings_changed(sender, setting, **kwargs):
+    """
+    The setting_changed receiver (tests change the settings): read the
+    threshold again.
+    """
+    # pylint: disable=unused-argument
+
+    if setting == "SLOW_QUERY_THRESHOLD":
+        _threshold.clear()
+
+
+def normalize(sql):
+    """The SQL without what varies between runs of the same query."""
+
+    sql = PLACEHOLDERS_RE.sub("IN (...)", sql)
+    sql = LITERALS_RE.sub("?", sql)
+    return SPACES_RE.sub(" ", sql).strip()
+
+
+def fingerprint(value):
+    """A short, stable hash of a string."""
+
+    return hashlib.sha1(value.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """
+    How the database runs a query, without running it.
+
+    Returns:
+        list: The lines of the plan.
+    """
+
+    statement = (
+        "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+    )
+    try:
+        # a cursor of the backend's own, not wrapped - the EXPLAIN isn't
+        # timed (and can't be slow-logged and explained in turn)
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(f"{statement} {sql}", params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except DatabaseError as error:
+        return [f"EXPLAIN failed: {error}"]
+
+
+def first_time(query_fingerprint):
+    """Whether this process sees the fingerprint for the first time."""
+
+    with _explained_lock:
+        if query_fingerprint in _explained:
+            return False
+        if len(_explained) >= MAX_EXPLAINED:
+            _explained.clear()
+        _explained.add(query_fingerprint)
+        return True
+
+
+def record(sql, params, seconds, context, view=None):
+    """
+    Log a slow query.
+
+    Args:
+        sql (str): The query, with placeholders.
+        params: Its params.
+        seconds (float): How long it took.
+        context (dict): The execute wrapper's context (the connection).
+        view (str): The url name of the view it ran for.
+    """
+
+    query_fingerprint = fingerprint(normalize(sql))
+    entry = {
+        "sql": sql,
+        "fingerprint": query_fingerprint,
+        "params_fingerprint": fingerprint(repr(params)),
+        "seconds": round(seconds, 6),
+        "view": view,
+        "database": context["connection"].alias,
+        "plan": None,
+    }
+    if sql.lstrip().upper().startswith(EXPLAINABLE) and first_time(
+        query_fingerprint
+    ):
+        entry["plan"] = explain(context["connection"], sql, params)
+
+    logger.warning(
+        "Slow query (%.3fs) in %s: %s",
+        seconds,
+        view or "no view",
+        query_fingerprint,
+        extra=entry,
+    )
+
+
+def read_entries(path=None):
+    """
+    The logged slow queries of all the processes, the oldest first.
+
+    Args:
+        path (str): The log, SLOW_QUERY_LOG by default (see
+            project.logs.PID_PLACEHOLDER).
+
+    Yields:
+        dict: The entries (see record), with "time".
+    """
+
+    path = Path(path or settings.SLOW_QUERY_LOG)
+    pattern = path.name.replace(PID_PLACEHOLDER, "*")
+    logs = set(path.parent.glob(pattern))
+    # a rotated log's current file isn't there until it's written again
+    for rotated_path in path.parent.glob(f"{pattern}.*"):
+        if rotated_path.suffix[1:].isdigit():
+            logs.add(rotated_path.with_suffix(""))
+    # every process's log is in order, they're merged by time
+    yield from heapq.merge(
+        *(read_log(log_path) for log_path in sorted(logs)),
+        key=lambda entry: entry.get("time") or "",
+    )
+
+
+def read_log(path):
+    """
+    The logged slow queries of a process, from the oldest rotated file to
+    the current one.
+
+    Yields:
+        dict: The entries (see record), with "time".
+    """
+
+    # log.jsonl.2 is older than log.jsonl.1, which is older than log.jsonl
+    rotated = sorted(
+        (
+            rotated_path
+            for rotated_path in path.parent.glob(f"{path.name}.*")
+            if rotated_path.suffix[1:].isdigit()
+        ),
+        key=lambda rotated_path: int(rotated_path.suffix[1:]),
+        reverse=True,
+    )
+    for log_path in [*rotated, path]:
+        if not log_path.exists():
+            continue
+        with log_path.open(encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the line the process was writing when it was killed
+                    continue
+                if "fingerprint" in entry:
+                    yield entry
+
+
+def summarize(entries):
+    """
+    Group the slow queries by fingerprint.
+
+    Returns:
+        list: A dict per fingerprint - its "count", "total_seconds",
+            "max_seconds", "views", the last "sql" and "time", and the
+            "plan" captured for it (if it's still in the log).
+    """
+
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(
+            entry["fingerprint"],
+            {
+                "fingerprint": entry["fingerprint"],
+                "count": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "views": set(),
+                "plan": None,
+            },
+        )
+        group["count"] += 1
+        group["total_seconds"] += entry["seconds"]
+        group["max_seconds"] = max(group["max_seconds"], entry["seconds"])
+        group["views"].add(entry.get("view") or "-")
+        group["sql"] = entry["sql"]
+        group["time"] = entry.get("time")
+        if entry.get("plan"):
+            group["plan"] = entry["plan"]
+    return list(groups.values())
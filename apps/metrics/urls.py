@@ -0,0 +1,9 @@
+"""A module that contains all the urls for the metrics app."""
+
+from django.urls import path
+
+from apps.metrics.views import MetricsView
+
+urlpatterns = [
+    path("metrics", MetricsView.as_view(), name="metrics"),
+]
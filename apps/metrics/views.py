@@ -0,0 +1,44 @@
+"""
+A module that contains the view of the metrics app - the /metrics endpoint
+Prometheus scrapes.
+
+It's for a scraper with the METRICS_TOKEN (as "Authorization: Bearer
+<token>") or a logged in superuser, everyone else gets a 403.
+"""
+
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.views import View
+
+from apps.metrics.collector import collect, render
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def may_scrape(request):
+    """Whether the request may see the metrics."""
+
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        scheme, _, given = request.headers.get("Authorization", "").partition(
+            " "
+        )
+        if scheme.lower() == "bearer" and hmac.compare_digest(
+            given.encode(), token.encode()
+        ):
+            return True
+    return request.user.is_authenticated and request.user.is_superuser
+
+
+class MetricsView(View):
+    """The request and cache metrics, in the Prometheus text format."""
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        if not may_scrape(request):
+            raise PermissionDenied
+        return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
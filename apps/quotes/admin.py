@@ -10,10 +10,13 @@ class QuoteAdmin(admin.ModelAdmin):
 
     list_display = (
         "id",
+        "author",
         "date_created",
         "active",
     )
     list_editable = ("active",)
+    # the author column would cost a query per row otherwise
+    list_select_related = ("author",)
 
 
 admin.site.register(Quote, QuoteAdmin)
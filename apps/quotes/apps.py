@@ -28,3 +28,19 @@ class QuotesConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.quotes"
+
+    def ready(self):
+        """Connect the signal receivers once the app registry is ready."""
+        # pylint: disable=import-outside-toplevel
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from apps.quotes import database, signals
+
+        # post_migrate is sent by every app, only react to this one's
+        post_migrate.connect(signals.quotes_migrated, sender=self)
+
+        # the SQLite performance profile (when SQLITE_PROFILE is on)
+        connection_created.connect(database.configure_connection)
+        request_finished.connect(database.request_finished)
@@ -0,0 +1,166 @@
+"""
+A module for the maintained quote counts (the QuoteCounter row, and every
+author's quote_count and active_quote_count).
+
+The counts are changed by the quote signal receivers in the same transaction
+as the quote itself, and repaired (counted from scratch) after bulk
+operations. Reads of the QuoteCounter row are cached in the process for
+QUOTE_COUNTS_TTL seconds, so a busy index page doesn't hit the database on
+every request.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from ag_mixins import ag_bump_cache_versions
+from apps.authors.models import Author
+from apps.quotes.models import Quote, QuoteCounter
+
+logger = logging.getLogger(__name__)
+
+# there is only one counter row
+COUNTER_PK = 1
+
+# how long (in seconds) a read count is trusted without asking the database
+DEFAULT_TTL = 5
+
+_cache = {"counts": None, "expires": 0.0}
+_cache_lock = threading.Lock()
+
+
+def get_counts():
+    """
+    Get the number of quotes.
+
+    Returns:
+        dict: "total" and "active" quote counts.
+    """
+
+    now = time.monotonic()
+
+    with _cache_lock:
+        if _cache["counts"] is not None and now < _cache["expires"]:
+            return dict(_cache["counts"])
+
+    counts = (
+        QuoteCounter.objects.filter(pk=COUNTER_PK)
+        .values("total", "active")
+        .first()
+    )
+    if counts is None:
+        counts = repair()
+
+    ttl = getattr(settings, "QUOTE_COUNTS_TTL", DEFAULT_TTL)
+    with _cache_lock:
+        _cache["counts"] = counts
+        _cache["expires"] = now + ttl
+
+    return dict(counts)
+
+
+def invalidate():
+    """Forget the cached counts, the next read goes to the database."""
+
+    with _cache_lock:
+        _cache["counts"] = None
+
+
+def change(total=0, active=0):
+    """
+    Add to (or subtract from, with negative numbers) the counts.
+
+    Args:
+        total (int): The change of the total count.
+        active (int): The change of the active count.
+    """
+
+    if not total and not active:
+        return
+
+    # F() expressions - the database does the math, so two concurrent
+    # changes can't overwrite each other
+    updated = QuoteCounter.objects.filter(pk=COUNTER_PK).update(
+        total=F("total") + total, active=F("active") + active
+    )
+    if not updated:
+        # the row is gone (a flushed database?), count from scratch
+        repair()
+
+    invalidate()
+    # ...and once more after commit, in case someone read the old counts
+    # from another thread while this transaction was still open
+    transaction.on_commit(invalidate)
+
+
+def repair():
+    """
+    Count the quotes from scratch and store the counts.
+
+    Returns:
+        dict: "total" and "active" quote counts.
+    """
+
+    counts = Quote.objects.aggregate(
+        total=Count("pk"), active=Count("pk", filter=Q(active=True))
+    )
+    QuoteCounter.objects.update_or_create(pk=COUNTER_PK, defaults=counts)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+    logger.info(
+        "Quote counts repaired: %s total, %s active",
+        counts["total"],
+        counts["active"],
+    )
+
+    return counts
+
+
+def change_author(author_id, total=0, active=0):
+    """
+    Add to (or subtract from) an author's quote counts.
+
+    Args:
+        author_id (int): The author, None for quotes without one.
+        total (int): The change of the author's quote_count.
+        active (int): The change of the author's active_quote_count.
+    """
+
+    if author_id is None or (not total and not active):
+        return
+
+    Author.objects.filter(pk=author_id).update(
+        quote_count=F("quote_count") + total,
+        active_quote_count=F("active_quote_count") + active,
+    )
+    # the pages showing authors show their counts
+    ag_bump_cache_versions("authors")
+
+
+def repair_authors():
+    """
+    Count the quotes of every author from scratch, with one query.
+
+    Returns:
+        int: The number of authors.
+    """
+
+    counts = (
+        Quote.objects.filter(author=OuterRef("pk"))
+        .values("author")
+        .annotate(total=Count("pk"), active=Count("pk", filter=Q(active=True)))
+    )
+    authors = Author.objects.update(
+        quote_count=Coalesce(Subquery(counts.values("total")), 0),
+        active_quote_count=Coalesce(Subquery(counts.values("active")), 0),
+    )
+
+    logger.info("Quote counts of %s authors repaired", authors)
+    return authors
@@ -0,0 +1,170 @@
+"""
+A module for the SQLite performance profile (the SQLITE_PROFILE setting).
+
+With SQLite's default rollback journal a write locks the whole database
+file: the readers wait for it, or fail with "database is locked" once they
+waited too long. The profile switches every connection, as it's opened (see
+configure_connection), to:
+
+- the WAL journal: the readers read the last committed state while the
+  writer writes, so a save no longer blocks the pages. Only writers wait
+  for each other.
+- synchronous=NORMAL: in WAL mode a commit is not synced to disk, only the
+  checkpoints are. A power loss can lose the last commits, but never
+  corrupts the database.
+- mmap_size and cache_size: the database is read through memory mapping,
+  with a bigger page cache per connection.
+- busy_timeout: how long a writer waits for another one before giving up.
+
+The profile also keeps the connections open between requests (CONN_MAX_AGE,
+see settings.py), and runs PRAGMA optimize - which updates the statistics
+the query planner chooses indexes by - after a request, at most every
+SQLITE_OPTIMIZE_INTERVAL seconds (see optimize_if_due).
+
+The pragmas can be changed with the SQLITE_PRAGMAS setting (a dict, merged
+with DEFAULT_PRAGMAS).
+"""
+
+import contextlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # 256 MiB
+    "mmap_size": 256 * 2**20,
+    # negative - in KiB, so 64 MiB
+    "cache_size": -64 * 2**10,
+    # in milliseconds
+    "busy_timeout": 5000,
+}
+
+# the page cache of a bulk write (see bulk_write_cache), 256 MiB
+BULK_WRITE_CACHE_SIZE = -256 * 2**10
+
+# how often (in seconds) a persistent connection runs PRAGMA optimize
+DEFAULT_OPTIMIZE_INTERVAL = 60 * 60
+
+
+def enabled():
+    """Whether the SQLite performance profile is on."""
+
+    return getattr(settings, "SQLITE_PROFILE", False)
+
+
+def profile_pragmas():
+    """The pragmas of the profile, with the SQLITE_PRAGMAS changes."""
+
+    return {**DEFAULT_PRAGMAS, **getattr(settings, "SQLITE_PRAGMAS", {})}
+
+
+def apply_profile(connection):
+    """
+    Set the profile's pragmas on an open SQLite connection.
+
+    Args:
+        connection (DatabaseWrapper): The connection.
+
+    Returns:
+        dict: The pragmas, as the database reports them back.
+    """
+
+    applied = {}
+    with connection.cursor() as cursor:
+        for name, value in profile_pragmas().items():
+            # names and values come from the settings, not from users
+            cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.execute(f"PRAGMA {name}")
+            row = cursor.fetchone()
+            applied[name] = row[0] if row else None
+    return applied
+
+
+@contextlib.contextmanager
+def bulk_write_cache(connection, size=BULK_WRITE_CACHE_SIZE):
+    """
+    Give the connection a bigger page cache for the block (a cache_size
+    pragma value), then its own back.
+
+    A transaction that inserts a lot writes to index pages all over the
+    file, and SQLite spills the changed pages to the file (and the journal)
+    whenever its cache is full. With a cache that holds them, every page is
+    written once, at the commit.
+    """
+
+    if connection.vendor != "sqlite":
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA cache_size")
+        previous = cursor.fetchone()[0]
+        cursor.execute(f"PRAGMA cache_size = {int(size)}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA cache_size = {int(previous)}")
+
+
+# when this process last ran PRAGMA optimize
+_optimized = {"last": None}
+
+
+def optimize(connection):
+    """
+    Let SQLite refresh the query planner's statistics of the tables the
+    connection used, where they are outdated.
+    """
+
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+    _optimized["last"] = time.monotonic()
+    logger.debug("PRAGMA optimize took %.3fs", time.perf_counter() - started)
+
+
+def optimize_if_due(connection):
+    """Run PRAGMA optimize if this process didn't in a while."""
+
+    interval = getattr(
+        settings, "SQLITE_OPTIMIZE_INTERVAL", DEFAULT_OPTIMIZE_INTERVAL
+    )
+    last = _optimized["last"]
+    if last is None or time.monotonic() - last >= interval:
+        optimize(connection)
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    The connection_created receiver: apply the profile to every new SQLite
+    connection (when it's on).
+    """
+    # pylint: disable=unused-argument
+
+    if connection.vendor != "sqlite" or not enabled():
+        return
+
+    applied = apply_profile(connection)
+    logger.debug("SQLite profile applied: %s", applied)
+
+
+def request_finished(sender, **kwargs):
+    """
+    The request_finished receiver: PRAGMA optimize every now and then, on a
+    connection that has served requests (the statistics it refreshes are of
+    the tables the connection used).
+    """
+    # pylint: disable=unused-argument
+
+    if not enabled():
+        return
+    for connection in connections.all(initialized_only=True):
+        if connection.vendor == "sqlite" and connection.connection is not None:
+            optimize_if_due(connection)
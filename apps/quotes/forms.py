@@ -3,6 +3,8 @@
 from django import forms
 
 from apps.authors.models import Author
+from apps.authors.widgets import AuthorPickerWidget
+from apps.quotes.models import Quote, content_hash_of
 
 
 class QuoteForm(forms.Form):
@@ -18,5 +20,31 @@ class QuoteForm(forms.Form):
     text = forms.CharField(
         widget=forms.Textarea(attrs={"rows": 4, "cols": 40}), max_length=200
     )  # if it was a modelForm, Django automatically render it as a textarea
-    author = forms.ModelChoiceField(queryset=Author.objects.all())
+    # renders only the selected author, validates only the submitted one
+    author = forms.ModelChoiceField(
+        queryset=Author.objects.all(), widget=AuthorPickerWidget
+    )
     active = forms.BooleanField(required=False)
+
+    def __init__(self, *args, instance_pk=None, **kwargs):
+        # the quote being edited, it's not a duplicate of itself
+        self.instance_pk = instance_pk
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        """The same quote by the same author can't be added twice."""
+
+        cleaned_data = super().clean()
+        text = cleaned_data.get("text")
+        author = cleaned_data.get("author")
+
+        if text and author:
+            duplicates = Quote.objects.filter(
+                content_hash=content_hash_of(text, author.full_name)
+            ).exclude(pk=self.instance_pk)
+            if duplicates.exists():
+                raise forms.ValidationError(
+                    "This quote by this author already exists."
+                )
+
+        return cleaned_data
@@ -0,0 +1,317 @@
+"""
+A module for the fuzzy (typo tolerant) quote search - the fallback of the
+search when it finds nothing (see QuoteListView).
+
+Every word of a quote is cut into trigrams, three character pieces padded
+like pg_trgm does ("word" -> "  w", " wo", "wor", "ord", "rd "), and the
+distinct trigrams of every quote are kept in the QuoteTrigram table. A
+misspelt word still shares a good part of its trigrams with the right one
+("ilusoin" and "ilusion" share "  i", " il", "ilu" and "lus"), so:
+
+1. The candidates are the quotes that share the most trigrams with the
+   query, counted over the query's selective trigrams only - the ones at
+   most QUOTES_FUZZY_POSTINGS quotes have ("the" is in half of them and
+   tells nothing), the rarest QUOTES_FUZZY_MAX_TRIGRAMS of them. At most
+   QUOTES_FUZZY_CANDIDATES are taken. They bound the work, however many
+   quotes there are (and however long the query is - only its MAX_WORDS
+   longest words are searched for).
+2. The candidates are scored: the best similarity (shared / all trigrams)
+   of every query word to a word of the quote, averaged. The ones scoring
+   at least QUOTES_FUZZY_THRESHOLD are the results, best first.
+
+The index is optional (QUOTES_TRIGRAM_INDEX): it takes a few dozen rows per
+quote and a bit of every save. The quote signals keep it in sync, the bulk
+writes index the quotes they write (see index_quotes), the
+rebuild_quote_trigrams command fills it from scratch.
+"""
+
+import itertools
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from apps.quotes.database import bulk_write_cache
+from apps.quotes.models import Quote, QuoteTrigram
+from apps.quotes.search import cached_search, clear_search_cache, search_limit
+from apps.quotes.suggest import words_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANDIDATES = 200
+
+# a trigram in more quotes than this is not used to find candidates
+DEFAULT_POSTINGS = 5000
+
+# the least similarity of a result, pg_trgm's default
+DEFAULT_THRESHOLD = 0.3
+
+# when all the query's trigrams are common, the rarest ones are used
+FALLBACK_TRIGRAMS = 3
+
+# the most (rarest) trigrams candidates are looked up by - a subquery each,
+# SQLite takes at most 500 in a compound SELECT
+DEFAULT_MAX_TRIGRAMS = 50
+
+# the most words of a query that are searched for
+MAX_WORDS = 20
+
+# how many trigrams are counted per query (see _selective)
+PROBE_SIZE = 200
+
+BATCH_SIZE = 2000
+
+
+def enabled():
+    """Whether the trigram index is kept (and the fuzzy search is on)."""
+
+    return getattr(settings, "QUOTES_TRIGRAM_INDEX", False)
+
+
+def word_trigrams(word):
+    """The trigrams of a (normalized) word, padded like pg_trgm's."""
+
+    padded = f"  {word} "
+    return {padded[start : start + 3] for start in range(len(padded) - 2)}
+
+
+def trigrams_of(text):
+    """The distinct trigrams of all the words of a text."""
+
+    trigrams = set()
+    for word in words_of(text):
+        trigrams |= word_trigrams(word)
+    return trigrams
+
+
+def similarity(trigrams, other):
+    """How alike two sets of trigrams are, from 0 to 1."""
+
+    if not trigrams or not other:
+        return 0.0
+    return len(trigrams & other) / len(trigrams | other)
+
+
+def index_quote(quote):
+    """Replace the quote's trigrams with the ones of its current text."""
+
+    QuoteTrigram.objects.filter(quote=quote).delete()
+    QuoteTrigram.objects.bulk_create(
+        QuoteTrigram(trigram=trigram, quote_id=quote.pk)
+        for trigram in trigrams_of(quote.text)
+    )
+
+
+def _insert_trigrams(quotes, replace=True):
+    """
+    Insert the trigrams of the quotes, with an executemany per batch of
+    them - not as model instances, there are a few dozen per quote.
+
+    Args:
+        quotes (QuerySet): The quotes.
+        replace (bool): Delete the trigrams they had first.
+
+    Returns:
+        int: The number of trigram rows.
+    """
+    # pylint: disable=protected-access
+
+    table = connection.ops.quote_name(QuoteTrigram._meta.db_table)
+    columns = ", ".join(
+        QuoteTrigram._meta.get_field(name).column
+        for name in ("trigram", "quote")
+    )
+    insert = f"INSERT INTO {table} ({columns}) VALUES (%s, %s)"
+    rows = 0
+    quotes = quotes.values_list("pk", "text").iterator(chunk_size=BATCH_SIZE)
+    while batch := list(itertools.islice(quotes, BATCH_SIZE)):
+        if replace:
+            QuoteTrigram.objects.filter(
+                quote_id__in=[pk for pk, _ in batch]
+            ).delete()
+        trigrams = [
+            (trigram, pk)
+            for pk, text in batch
+            for trigram in trigrams_of(text)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(insert, trigrams)
+        rows += len(trigrams)
+    return rows
+
+
+def index_quotes(quotes):
+    """
+    Replace the trigrams of the quotes with the ones of their current
+    texts - index_quote for the bulk writes, which skip the signals (see
+    quotes_bulk_changed).
+
+    Args:
+        quotes (QuerySet): The quotes that were inserted or changed.
+
+    Returns:
+        int: The number of trigram rows.
+    """
+
+    with transaction.atomic():
+        return _insert_trigrams(quotes)
+
+
+def rebuild_trigrams():
+    """
+    Fill the trigram index from scratch, in one transaction with a page
+    cache that holds it (see bulk_write_cache).
+
+    Returns:
+        int: The number of trigram rows.
+    """
+
+    with transaction.atomic(), bulk_write_cache(connection):
+        QuoteTrigram.objects.all().delete()
+        rows = _insert_trigrams(Quote.objects.all(), replace=False)
+
+    clear_search_cache()
+    logger.info("Trigram index rebuilt with %s rows", rows)
+    return rows
+
+
+def fuzzy_quote_ids(query, limit=None):
+    """
+    Search the quotes for words like the query's (through the search
+    result cache).
+
+    Args:
+        query (str): What the user typed.
+        limit (int): How many ids to return at most.
+
+    Returns:
+        list: Ids of the quotes like the query, most alike first. Empty if
+            the index is off or the query has no words to go by.
+    """
+
+    # the longest words tell the most, the others are left out
+    words = sorted(
+        sorted(words_of(query), key=lambda word: (-len(word), word))[
+            :MAX_WORDS
+        ]
+    )
+    if not enabled() or not words:
+        return []
+
+    limit = limit or search_limit()
+    return cached_search(
+        f"fuzzy.{limit}.{' '.join(words)}", lambda: _search(words, limit)
+    )
+
+
+def _search(words, limit):
+    """Find the candidates, score them, keep the ones alike enough."""
+
+    query_trigrams = {word: word_trigrams(word) for word in words}
+    trigrams = set().union(*query_trigrams.values())
+    try:
+        candidates = _candidates(_selective(trigrams))
+    except DatabaseError:
+        logger.exception("Fuzzy search failed for %r", " ".join(words))
+        return []
+
+    threshold = getattr(settings, "QUOTES_FUZZY_THRESHOLD", DEFAULT_THRESHOLD)
+    scored = []
+    for pk, text in candidates:
+        quote_words = [word_trigrams(word) for word in words_of(text)]
+        score = sum(
+            max(
+                (similarity(wanted, other) for other in quote_words),
+                default=0.0,
+            )
+            for wanted in query_trigrams.values()
+        ) / len(query_trigrams)
+        if score >= threshold:
+            scored.append((-score, pk))
+
+    return [pk for _, pk in sorted(scored)[:limit]]
+
+
+def _selective(trigrams):
+    """
+    The trigrams worth looking candidates up by: the rarest ones, of those
+    not too many quotes have (or the rarest few if they're all common). At
+    most QUOTES_FUZZY_MAX_TRIGRAMS.
+    """
+
+    postings = getattr(settings, "QUOTES_FUZZY_POSTINGS", DEFAULT_POSTINGS)
+    # pylint: disable=protected-access
+    table = connection.ops.quote_name(QuoteTrigram._meta.db_table)
+
+    # counting stops at postings + 1, so a common trigram costs no more
+    # than a selective one
+    counts = []
+    trigrams = iter(sorted(trigrams))
+    with connection.cursor() as cursor:
+        while probe := list(itertools.islice(trigrams, PROBE_SIZE)):
+            values = ", ".join(["(%s)"] * len(probe))
+            cursor.execute(
+                f"SELECT wanted.column1, (SELECT COUNT(*) FROM ("  # nosec B608
+                f"SELECT 1 FROM {table} WHERE trigram = wanted.column1 "
+                f"LIMIT %s)) FROM (VALUES {values}) AS wanted",
+                [postings + 1, *probe],
+            )
+            counts += [
+                (count, trigram)
+                for trigram, count in cursor.fetchall()
+                if count
+            ]
+    counts.sort()
+
+    selective = [trigram for count, trigram in counts if count <= postings]
+    if not selective:
+        selective = [trigram for _, trigram in counts[:FALLBACK_TRIGRAMS]]
+    return selective[
+        : getattr(settings, "QUOTES_FUZZY_MAX_TRIGRAMS", DEFAULT_MAX_TRIGRAMS)
+    ]
+
+
+def _candidates(trigrams):
+    """
+    The quotes that have the most of the trigrams.
+
+    Returns:
+        list: (id, text) of at most QUOTES_FUZZY_CANDIDATES quotes.
+    """
+
+    if not trigrams:
+        return []
+
+    postings = getattr(settings, "QUOTES_FUZZY_POSTINGS", DEFAULT_POSTINGS)
+    candidates = getattr(
+        settings, "QUOTES_FUZZY_CANDIDATES", DEFAULT_CANDIDATES
+    )
+    # pylint: disable=protected-access
+    table = connection.ops.quote_name(QuoteTrigram._meta.db_table)
+    quotes_table = connection.ops.quote_name(Quote._meta.db_table)
+    # every trigram's quotes are capped too (the rarest common ones)
+    postings_of = " UNION ALL ".join(
+        [
+            f"SELECT * FROM (SELECT quote_id FROM {table} "  # nosec B608
+            f"WHERE trigram = %s LIMIT %s)"
+        ]
+        * len(trigrams)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT quote.id, quote.text FROM ("  # nosec B608
+            f"SELECT quote_id, COUNT(*) AS shared FROM ({postings_of}) "
+            f"GROUP BY quote_id ORDER BY shared DESC, quote_id LIMIT %s"
+            f") AS candidate JOIN {quotes_table} AS quote "
+            f"ON quote.id = candidate.quote_id",
+            [
+                *(
+                    value
+                    for trigram in trigrams
+                    for value in (trigram, postings)
+                ),
+                candidates,
+            ],
+        )
+        return cursor.fetchall()
@@ -0,0 +1,461 @@
+"""
+A module for generating synthetic quotes and authors in bulk, for scale
+testing (see the generate_quotes command and the benchmarks' seed_quotes).
+
+The corpus is made to look like the real one where it matters to the
+database and the search:
+
+- a few authors have most of the quotes: the author of a quote is drawn
+  with a Zipfian distribution (the author of rank r with weight
+  1 / r ** author_skew),
+- the words are drawn from a vocabulary (see vocabulary) with a Zipfian
+  distribution too, so the full text and trigram indexes see common and
+  rare words,
+- the quote lengths (in words) are log-normal around a median, within
+  bounds,
+- active_ratio of the quotes are active,
+- the creation dates are spread over since..until, growing with the id like
+  the real ones.
+
+The same seed (and options) generates the same corpus.
+
+The quotes are written to the database with batched multi-row inserts
+(executemany of one prepared statement, not model instances, see
+write_to_database) or to an NDJSON file the import_quotes command reads
+(see write_ndjson).
+
+With QUOTES_TRIGRAM_INDEX on, the trigrams of the new quotes can be
+indexed in the same transaction (a few dozen rows per quote, see
+apps.quotes.fuzzy) - that takes ten times longer than the quotes
+themselves. The command and the benchmarks skip it, the
+rebuild_quote_trigrams command indexes them afterwards.
+"""
+
+import bisect
+import datetime
+import itertools
+import json
+import math
+import random
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.db.models.constants import OnConflict
+
+from apps.authors.models import Author
+from apps.quotes import fuzzy, search
+from apps.quotes.database import bulk_write_cache
+from apps.quotes.importing import ImportStats
+from apps.quotes.models import Quote, content_hash_of
+from apps.quotes.signals import quotes_bulk_changed
+
+DEFAULT_BATCH_SIZE = 10000
+
+# how many quotes are drawn at once (see QuoteGenerator.quotes)
+BLOCK_SIZE = 1000
+
+DEFAULT_SINCE = datetime.datetime(2014, 1, 1, tzinfo=datetime.timezone.utc)
+DEFAULT_UNTIL = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+# the vocabulary, most common first (its rank is its weight, see WORD_SKEW)
+WORDS = (
+    "the of and to a in is that it you not be for life what all are we "
+    "one with as will but have your this no when love can man his "
+    "who they only there if do from mind time world nothing more never "
+    "by people know them which so must truth way always good those our "
+    "happiness thing make own other great heart want see little "
+    "without things fear every nature being live day better change "
+    "itself nobody yourself wisdom courage peace freedom silence art "
+    "knowledge power death beauty others hope dream light mistake "
+    "friend journey memory kindness patience strength future present "
+    "past moment question answer reason soul spirit body desire "
+    "suffering joy anger doubt faith habit virtue wealth poverty "
+    "character failure success effort attention imagination curiosity "
+    "humility honesty justice duty choice chance luck reality illusion "
+    "perception experience understanding ignorance learning teaching "
+    "solitude gratitude compassion forgiveness "
+    "discipline ambition purpose meaning absurd eternal fleeting "
+    "ordinary extraordinary simple difficult quiet restless ancient "
+    "modern invisible gentle fierce honest foolish wise brave careful "
+    "lonely grateful patient curious humble proud free bound awake "
+    "asleep"
+).split()
+
+# made up words (of these syllables) make the vocabulary's long tail, the
+# words few quotes have
+SYLLABLES = "ka lo mi ne ru ta vo si de pa gu fe zo li ba mo".split()
+
+VOCABULARY_SIZE = 5000
+
+# the words' Zipfian exponent
+WORD_SKEW = 1.0
+
+# the slots of the words' table (see zipf_table), every word gets one
+WORD_TABLE_SIZE = 2**17
+
+FIRST_NAMES = (
+    "Ada Albert Alan Anna Aristotle Augustine Blaise Carl Clarice "
+    "Confucius Dante Denis Edith Elena Emily Epictetus Erich Frida "
+    "Friedrich George Grace Hannah Helen Henry Hypatia Iris Isaac Jane "
+    "Johann John Karl Laozi Leo Lucretius Marcus Marie Mary Maya Michel "
+    "Miguel Nikola Octavia Oscar Pablo Rachel Rainer Ralph Rosa Seneca "
+    "Simone Socrates Soren Susan Sylvia Thomas Toni Ursula Virginia "
+    "Voltaire Walt Wislawa Yukio Zora"
+).split()
+
+LAST_NAMES = (
+    "Adams Arendt Austen Bacon Baldwin Borges Camus Cervantes Curie "
+    "Darwin Dickinson Einstein Eliot Emerson Frost Goethe Hesse Hugo "
+    "Hume Huxley Ibsen James Jung Kafka Kant Keller Lao Lewis Locke "
+    "Lovelace Mann Marquez Mill Milton Montaigne Morrison Murdoch Neruda "
+    "Nietzsche Orwell Pascal Plath Plato Poe Proust Rilke Rousseau "
+    "Russell Sagan Sartre Shelley Smith Sontag Spinoza Stein Tagore "
+    "Thoreau Tolstoy Turing Twain Weil Whitman Wilde Woolf Yeats"
+).split()
+
+
+def vocabulary(size=VOCABULARY_SIZE):
+    """WORDS, then made up words up to size, most common first."""
+
+    real = set(WORDS)
+    made_up = (
+        word
+        for length in (2, 3, 4)
+        for syllables in itertools.product(SYLLABLES, repeat=length)
+        # some are real ("li" "fe")
+        if (word := "".join(syllables)) not in real
+    )
+    return [*WORDS, *itertools.islice(made_up, max(size - len(WORDS), 0))]
+
+
+def zipf_cum_weights(count, skew):
+    """The cumulative Zipfian weights of count ranks, for random.choices."""
+
+    return list(
+        itertools.accumulate(1 / rank**skew for rank in range(1, count + 1))
+    )
+
+
+def zipf_table(population, skew, size):
+    """
+    The population in size slots, each item in as many as its Zipfian
+    weight gets it: a uniform choice of a slot is a Zipfian choice of the
+    population (to a 1 / size precision) - three times faster than a
+    weighted random.choices, which bisects the weights for every choice.
+    """
+
+    cum_weights = zipf_cum_weights(len(population), skew)
+    step = cum_weights[-1] / size
+    return [
+        population[bisect.bisect(cum_weights, (slot + 0.5) * step)]
+        for slot in range(size)
+    ]
+
+
+class QuoteGenerator:
+    """
+    Generates the synthetic authors and quotes (see the module docstring).
+
+    Args:
+        seed (int): The seed of the random numbers.
+        authors (int): How many authors to generate.
+        author_skew (float): The Zipfian exponent of the authors'
+            popularity, 0 spreads the quotes evenly.
+        words (int): The median length of a quote, in words.
+        words_sigma (float): The spread of the lengths (of their log).
+        min_words (int): The shortest quote.
+        max_words (int): The longest quote.
+        active_ratio (float): The share of the active quotes.
+        since (datetime): The first quote's creation date.
+        until (datetime): The last quote's creation date.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        seed=0,
+        *,
+        authors=1000,
+        author_skew=1.1,
+        words=14,
+        words_sigma=0.5,
+        min_words=4,
+        max_words=80,
+        active_ratio=0.5,
+        since=DEFAULT_SINCE,
+        until=DEFAULT_UNTIL,
+    ):  # pylint: disable=too-many-arguments
+        if authors < 1:
+            raise ValueError("There must be at least one author")
+        if not 1 <= min_words <= words <= max_words:
+            raise ValueError(
+                "The lengths must be 1 <= min_words <= words <= max_words"
+            )
+        if not 0 <= active_ratio <= 1:
+            raise ValueError("active_ratio must be between 0 and 1")
+        if since > until:
+            raise ValueError("since must be before until")
+
+        self.rng = random.Random(seed)
+        self.authors = authors
+        self.author_skew = author_skew
+        self.words_mu = math.log(words)
+        self.words_sigma = words_sigma
+        self.min_words = min_words
+        self.max_words = max_words
+        self.active_ratio = active_ratio
+        # in UTC, the database's time zone (see write_to_database)
+        self.since = since.astimezone(datetime.timezone.utc)
+        self.until = until.astimezone(datetime.timezone.utc)
+        self.words = zipf_table(vocabulary(), WORD_SKEW, WORD_TABLE_SIZE)
+
+    def author_names(self):
+        """
+        The authors' (name, lastname), most popular first. Unique up to
+        a few hundred thousand authors.
+        """
+
+        first, last = len(FIRST_NAMES), len(LAST_NAMES)
+        # the names in a random order, so the popular ones aren't all "A"s
+        order = list(range(first * last))
+        self.rng.shuffle(order)
+        names = []
+        for number in range(self.authors):
+            combination = order[number % len(order)]
+            lastname = LAST_NAMES[combination // first]
+            if number >= len(order):
+                # double-barrelled, when the combinations run out
+                lastname += "-" + LAST_NAMES[number // len(order) % last]
+            names.append((FIRST_NAMES[combination % first], lastname))
+        return names
+
+    def texts(self, count):
+        """
+        The texts of count quotes (their words drawn all at once, it's
+        faster).
+        """
+
+        rng = self.rng
+        lengths = [
+            min(
+                max(
+                    round(rng.lognormvariate(self.words_mu, self.words_sigma)),
+                    self.min_words,
+                ),
+                self.max_words,
+            )
+            for _ in range(count)
+        ]
+        words = rng.choices(self.words, k=sum(lengths))
+        texts = []
+        start = 0
+        for length in lengths:
+            text = " ".join(words[start : start + length])
+            texts.append(f"{text[0].upper()}{text[1:]}.")
+            start += length
+        return texts
+
+    def quotes(self, count, author_keys):
+        """
+        Generate quotes.
+
+        Args:
+            count (int): How many.
+            author_keys (list): What to identify the authors with (ids or
+                names), most popular first.
+
+        Yields:
+            tuple: (text, author key, active, date_created), oldest first.
+        """
+
+        rng = self.rng
+        author_weights = zipf_cum_weights(len(author_keys), self.author_skew)
+        spread = (self.until - self.since) / max(count, 1)
+        for first in range(0, count, BLOCK_SIZE):
+            size = min(BLOCK_SIZE, count - first)
+            authors = rng.choices(
+                author_keys, cum_weights=author_weights, k=size
+            )
+            for number, text, author in zip(
+                range(first, first + size), self.texts(size), authors
+            ):
+                yield (
+                    text,
+                    author,
+                    rng.random() < self.active_ratio,
+                    # stratified: growing with the id, random within the step
+                    self.since + spread * (number + rng.random()),
+                )
+
+
+def batched(iterable, size):
+    """Lists of up to size items of an iterable."""
+
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def naive_str(value):
+    """A UTC date as a string, without the time zone."""
+
+    return str(value.replace(tzinfo=None))
+
+
+def create_authors(generator):
+    """
+    Insert the generator's authors.
+
+    Returns:
+        list: Their ids, most popular first.
+    """
+
+    authors = Author.objects.bulk_create(
+        Author(name=name, lastname=lastname)
+        for name, lastname in generator.author_names()
+    )
+    return [author.pk for author in authors]
+
+
+def write_to_database(
+    generator,
+    count,
+    batch_size=DEFAULT_BATCH_SIZE,
+    author_ids=None,
+    index_trigrams=True,
+):
+    """
+    Insert generated quotes, and their authors.
+
+    Every batch is one executemany of a prepared INSERT - no model
+    instances, no signals (the derived data is rebuilt once at the end, see
+    quotes_bulk_changed). The batches share one transaction, with a page
+    cache big enough for it (see bulk_write_cache): a commit per batch
+    would write the index pages it changed (spread all over the file)
+    again and again. And the search indexes the new quotes at the end, all
+    at once (see deferred_indexing), as does the trigram index (if it's
+    on and index_trigrams, see fuzzy.index_quotes).
+
+    Args:
+        generator (QuoteGenerator): What to generate.
+        count (int): How many quotes.
+        batch_size (int): How many quotes to insert per executemany.
+        author_ids (list): The authors to spread the quotes over, most
+            popular first - the generator's new authors by default.
+        index_trigrams (bool): Index the new quotes' trigrams - most of
+            the time, fuzzy.rebuild_trigrams can do it later.
+
+    Returns:
+        ImportStats: How many quotes were inserted, how fast and with how
+            much memory. A quote that was already there (the same text by
+            the same author) is counted as a duplicate, not inserted.
+    """
+    # pylint: disable=too-many-locals,protected-access
+
+    table = connection.ops.quote_name(Quote._meta.db_table)
+    fields = [
+        Quote._meta.get_field(name)
+        for name in ("text", "author", "active", "date_created")
+    ]
+    fields += [
+        Quote._meta.get_field(name)
+        for name in ("date_modified", "content_hash")
+    ]
+    # a generated text by the same author can be there already - skipped
+    # (a conflict with the content hash's unique constraint)
+    insert = (
+        f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+        f"{table} ({', '.join(field.column for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        + connection.ops.on_conflict_suffix_sql(
+            fields, OnConflict.IGNORE, None, None
+        )
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    if adapt(DEFAULT_SINCE) == naive_str(DEFAULT_SINCE):
+        # the backend stores a UTC date as its naive str (SQLite) - Django's
+        # adapter gets there with time zone checks, several times slower
+        adapt = naive_str
+
+    stats = ImportStats()
+    with (
+        transaction.atomic(),
+        bulk_write_cache(connection),
+        search.deferred_indexing(),
+    ):
+        last_id = Quote.objects.aggregate(last=Max("pk"))["last"] or 0
+        if author_ids is None:
+            author_ids = create_authors(generator)
+        # the names go into the content hashes (see content_hash_of)
+        names = {
+            author.pk: author.full_name
+            for author in Author.objects.filter(pk__in=author_ids)
+        }
+
+        for batch in batched(generator.quotes(count, author_ids), batch_size):
+            rows = []
+            for text, author_id, active, created in batch:
+                created = adapt(created)
+                rows.append(
+                    (
+                        text,
+                        author_id,
+                        active,
+                        created,
+                        created,
+                        content_hash_of(text, names[author_id]),
+                    )
+                )
+            with connection.cursor() as cursor:
+                cursor.executemany(insert, rows)
+                inserted = cursor.rowcount
+            stats.rows += len(batch)
+            stats.inserted += inserted
+            stats.duplicates += len(batch) - inserted
+
+        if stats.inserted and index_trigrams and fuzzy.enabled():
+            fuzzy.index_quotes(Quote.objects.filter(pk__gt=last_id))
+
+    if stats.inserted:
+        # the slots, the counters, ... (see quotes.signals)
+        quotes_bulk_changed.send(sender=Quote)
+
+    stats.finish()
+    return stats
+
+
+def write_ndjson(generator, count, file):
+    """
+    Write generated quotes as NDJSON, one import_quotes item per line.
+
+    Args:
+        generator (QuoteGenerator): What to generate.
+        count (int): How many quotes.
+        file: A text file to write to.
+
+    Returns:
+        ImportStats: How many quotes were written, and how fast.
+    """
+
+    stats = ImportStats()
+    names = [
+        f"{name} {lastname}" for name, lastname in generator.author_names()
+    ]
+    for text, author, active, created in generator.quotes(count, names):
+        file.write(
+            json.dumps(
+                {
+                    "text": text,
+                    "author": author,
+                    "active": active,
+                    "date_created": created.isoformat(),
+                }
+            )
+            + "\n"
+        )
+        stats.rows += 1
+    stats.inserted = stats.rows
+
+    stats.finish()
+    return stats
@@ -0,0 +1,504 @@
+"""
+A module for importing quotes in bulk (see the import_quotes command).
+
+The file is read incrementally, item by item, so a big file is never held in
+memory as a whole. Items are synced in batches, every batch in its own
+transaction: a quote is identified by its content hash (see
+apps.quotes.models.content_hash_of), so the quotes of a batch are looked up
+with one query and only the new or changed ones are written. The authors of
+new quotes are resolved through an in-memory name -> id map (the missing
+ones are created with one bulk insert).
+
+Importing the same file twice writes nothing the second time. Every item
+is checked before it's synced (see validated), a malformed one stops the
+import with a ValueError naming it - the batches before it stay imported.
+"""
+
+import json
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.authors.models import Author
+from apps.quotes import fuzzy
+from apps.quotes.models import Quote, content_hash_of
+from apps.quotes.signals import quotes_bulk_changed
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BATCH_SIZE = 1000
+
+# how much of the file is read at once
+READ_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(file, read_size=READ_SIZE):
+    """
+    Read the items of a JSON array one by one, without loading the whole
+    file.
+
+    Args:
+        file: A text file with a JSON array in it.
+        read_size (int): How many characters to read at once.
+
+    Yields:
+        The array items, as json.load would return them.
+
+    Raises:
+        ValueError: If the file is not a JSON array.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def next_character():
+        """Skip whitespace (reading more if needed), return the next one."""
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position] if position < len(buffer) else ""
+            buffer = buffer[position:] + file.read(read_size)
+            position = 0
+            eof = len(buffer) == 0
+
+    if next_character() != "[":
+        raise ValueError("Expected a JSON array")
+    position += 1
+
+    expecting_item = True
+    after_comma = False
+    while True:
+        character = next_character()
+
+        if character == "]" and not (expecting_item and after_comma):
+            return
+        if character == "":
+            raise ValueError("Unexpected end of the JSON array")
+        if not expecting_item:
+            if character != ",":
+                raise ValueError(f"Expected ',' at character {position}")
+            position += 1
+            expecting_item = after_comma = True
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+            # a value that ends exactly at the end of the buffer may go on
+            # (a number like 12|34), so make sure it doesn't
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            chunk = file.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield item
+        position = end
+        expecting_item = False
+
+        # drop what was already parsed, so the buffer doesn't grow
+        if position > read_size:
+            buffer = buffer[position:]
+            position = 0
+
+
+def iter_ndjson(file):
+    """
+    Read the items of a newline delimited JSON file (one item per line).
+
+    Yields:
+        The items, as json.loads would return them.
+    """
+
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_items(file_path):
+    """
+    Read the quote items from a .json (array) or .ndjson file.
+
+    Yields:
+        dict: The items, like {"text": ..., "author": ..., ...}.
+    """
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        if str(file_path).endswith((".ndjson", ".jsonl")):
+            yield from iter_ndjson(file)
+        else:
+            yield from iter_json_array(file)
+
+
+def batched(items, size):
+    """
+    Split the items into lists of (at most) size items.
+
+    Yields:
+        list: The batches.
+    """
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class AuthorResolver:
+    """
+    Turns author names into author ids, remembering them, so every name is
+    looked up (or created) only once per import.
+
+    A name is an author's full name (see Author.full_name) - "Aldous
+    Huxley" is the author named Aldous with the lastname Huxley, like the
+    content hashes and the reload (see apps.quotes.reloading) have it.
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def resolve(self, names):
+        """
+        Make sure all the names are known, creating the missing authors.
+
+        Args:
+            names (iterable): Author names.
+        """
+
+        missing = {name for name in names if name and name not in self.ids}
+        if not missing:
+            return
+
+        self._remember(missing)
+
+        still_missing = missing - self.ids.keys()
+        if still_missing:
+            Author.objects.bulk_create(
+                Author(name=name) for name in sorted(still_missing)
+            )
+            self._remember(still_missing)
+
+    def _remember(self, names):
+        """Load the ids of the authors that exist, the oldest wins."""
+
+        # the name of an author is the full name, or the full name up to
+        # one of its spaces (the rest is the lastname)
+        first_names = set(names)
+        for name in names:
+            first_names.update(
+                name[:index]
+                for index, character in enumerate(name)
+                if character == " "
+            )
+        existing = Author.objects.filter(name__in=first_names).order_by("-pk")
+        # ordered newest first, so the oldest author is the one remembered
+        self.ids.update(
+            (author.full_name, author.pk)
+            for author in existing
+            if author.full_name in names
+        )
+
+    def get(self, name):
+        """The id of an already resolved name (None for no name)."""
+
+        return self.ids.get(name) if name else None
+
+
+def parse_date(value):
+    """
+    The date_created of an item, None if it has none.
+
+    Raises:
+        ValueError: If the date can't be parsed.
+    """
+
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f"Invalid date_created: {value!r}")
+    if settings.USE_TZ and timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def validated(items):
+    """
+    Check the items as they are read: "text" is a non-empty string, "author"
+    (if any) a string, "active" (if any) a boolean and "date_created" (if
+    any) a date parse_date understands.
+
+    Yields:
+        dict: The items, unchanged.
+
+    Raises:
+        ValueError: At the first malformed item, with its index.
+    """
+
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Expected an object")
+            if not isinstance(item.get("text"), str) or not item["text"]:
+                raise ValueError("Missing text")
+            if not isinstance(item.get("author") or "", str):
+                raise ValueError(f"Invalid author: {item['author']!r}")
+            if not isinstance(item.get("active", False), bool):
+                raise ValueError(f"Invalid active: {item['active']!r}")
+            if not isinstance(item.get("date_created") or "", str):
+                raise ValueError(
+                    f"Invalid date_created: {item['date_created']!r}"
+                )
+            parse_date(item.get("date_created"))
+        except ValueError as error:
+            raise ValueError(f"Item {index}: {error}") from error
+        yield item
+
+
+class ImportStats:  # pylint: disable=R0902
+    """What was imported, how fast and with how much memory."""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        # how long readers waited for a reload (see apps.quotes.reloading)
+        self.swap_seconds = None
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.peak_memory_mib = None
+        self._tracing = resource is None and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    @property
+    def changed(self):
+        """Whether anything was (or would be) written."""
+
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def finish(self):
+        """Stop the clock and take the peak memory."""
+
+        self.seconds = time.perf_counter() - self.started
+
+        if resource is not None:
+            # ru_maxrss is the peak resident set size, in KiB on Linux
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_memory_mib = usage / 1024
+        else:
+            # no resource module (Windows) - python allocations only
+            self.peak_memory_mib = tracemalloc.get_traced_memory()[1] / 2**20
+            if self._tracing:
+                tracemalloc.stop()
+
+    @property
+    def rows_per_second(self):
+        """The import throughput."""
+
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        swap = ""
+        if self.swap_seconds is not None:
+            swap = f", swapped in {self.swap_seconds:.3f}s"
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, "
+            f"{self.deleted} deleted, {self.unchanged} unchanged, "
+            f"{self.duplicates} duplicates - "
+            f"{self.rows} rows in {self.seconds:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s), "
+            f"peak memory {self.peak_memory_mib:.1f} MiB{swap}"
+        )
+
+
+def import_items(
+    items, batch_size=DEFAULT_BATCH_SIZE, delete=False, dry_run=False
+):
+    """
+    Sync the quote items into the database: insert the new quotes, update
+    the changed ones and (optionally) delete the ones that are not in the
+    items any more.
+
+    Args:
+        items (iterable): Dicts with "text" and (optionally) "author",
+            "active" and "date_created".
+        batch_size (int): How many items to sync per transaction.
+        delete (bool): Delete the quotes that are not in the items.
+        dry_run (bool): Only count what would change, write nothing.
+
+    Returns:
+        ImportStats: What was (or would be) changed and how fast.
+
+    Raises:
+        ValueError: If an item is malformed (see validated). The batches
+            before it are imported.
+    """
+
+    stats = ImportStats()
+    authors = AuthorResolver()
+    # content hashes of the items synced so far
+    seen = set()
+
+    for batch in batched(validated(items), batch_size):
+        with transaction.atomic():
+            _sync_batch(batch, authors, seen, stats, dry_run)
+        stats.rows += len(batch)
+
+    if delete:
+        _delete_missing(seen, batch_size, stats, dry_run)
+
+    if stats.changed and not dry_run:
+        # bulk_create and friends skip the signals that keep derived data in
+        # sync
+        quotes_bulk_changed.send(sender=Quote)
+
+    stats.finish()
+    return stats
+
+
+def _sync_batch(batch, authors, seen, stats, dry_run):
+    """Insert and update the quotes of a batch of items."""
+
+    # content hash -> item, the first of the duplicates wins
+    new_items = {}
+    for item in batch:
+        # the author is the one of this full name (see AuthorResolver), so
+        # it's the hash Quote.save gives the quote
+        content_hash = content_hash_of(item["text"], item.get("author"))
+        if content_hash in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(content_hash)
+        new_items[content_hash] = item
+
+    to_update = []
+    # the quotes with new texts, for the trigram index
+    to_index = []
+    for quote in Quote.objects.filter(content_hash__in=new_items).only(
+        "text", "active", "date_created", "content_hash"
+    ):
+        item = new_items.pop(quote.content_hash)
+        text = quote.text
+        if _apply_item(quote, item):
+            to_update.append(quote)
+            if quote.text != text:
+                to_index.append(quote.pk)
+        else:
+            stats.unchanged += 1
+    stats.updated += len(to_update)
+    stats.inserted += len(new_items)
+
+    if dry_run:
+        return
+
+    if to_update:
+        # bulk_update doesn't apply auto_now
+        now = timezone.now()
+        for quote in to_update:
+            quote.date_modified = now
+        Quote.objects.bulk_update(
+            to_update, ["text", "active", "date_created", "date_modified"]
+        )
+
+    if new_items:
+        quotes = _insert_items(new_items, authors)
+        to_index += [quote.pk for quote in quotes]
+
+    if to_index and fuzzy.enabled():
+        # quotes_bulk_changed leaves the trigram index to the writer
+        fuzzy.index_quotes(Quote.objects.filter(pk__in=to_index))
+
+
+def _insert_items(new_items, authors):
+    """
+    Insert the quotes of the items (content hash -> item).
+
+    Returns:
+        list: The new quotes.
+    """
+
+    authors.resolve(item.get("author") for item in new_items.values())
+    quotes = Quote.objects.bulk_create(
+        Quote(
+            text=item["text"],
+            author_id=authors.get(item.get("author")),
+            active=item.get("active", False),
+            content_hash=content_hash,
+        )
+        for content_hash, item in new_items.items()
+    )
+    # date_created is set to now on insert (auto_now_add), so the dates
+    # that came with the items are written afterwards
+    dated = []
+    for quote, item in zip(quotes, new_items.values()):
+        date_created = parse_date(item.get("date_created"))
+        if date_created is not None:
+            quote.date_created = date_created
+            dated.append(quote)
+    Quote.objects.bulk_update(dated, ["date_created"])
+    return quotes
+
+
+def _apply_item(quote, item):
+    """Copy the item's values to the quote, return whether any changed."""
+
+    changed = False
+    values = {"text": item["text"]}
+    if "active" in item:
+        values["active"] = item["active"]
+    date_created = parse_date(item.get("date_created"))
+    if date_created is not None:
+        values["date_created"] = date_created
+
+    for name, value in values.items():
+        if getattr(quote, name) != value:
+            setattr(quote, name, value)
+            changed = True
+    return changed
+
+
+def _delete_missing(seen, batch_size, stats, dry_run):
+    """Delete the quotes whose content hash is not among the seen ones."""
+
+    missing = [
+        pk
+        for pk, content_hash in Quote.objects.values_list(
+            "pk", "content_hash"
+        ).iterator(chunk_size=batch_size)
+        if content_hash not in seen
+    ]
+    stats.deleted = len(missing)
+
+    if dry_run:
+        return
+
+    for pks in batched(missing, batch_size):
+        with transaction.atomic():
+            Quote.objects.filter(pk__in=pks).delete()
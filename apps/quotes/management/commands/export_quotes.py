@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.quotes.exporting import (
+    DEFAULT_CHUNK_SIZE,
+    FORMATS,
+    QuoteExport,
+    parse_since,
+)
+
+
+class Command(BaseCommand):
+    help = "Export quotes as NDJSON, CSV or JSON, without loading them all"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default="ndjson",
+            help="the output format (json is the quotes.json schema)",
+        )
+        parser.add_argument(
+            "--since",
+            help="only quotes created on or after this ISO date (and time)",
+        )
+        parser.add_argument(
+            "--output",
+            help="the file to write to, standard output by default",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="gzip the output (needs --output)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="how many quotes to read from the database at once",
+        )
+
+    def handle(self, *args, **kwargs):
+        since = None
+        if kwargs["since"]:
+            try:
+                since = parse_since(kwargs["since"])
+            except ValueError as error:
+                raise CommandError(error) from error
+
+        export = QuoteExport(
+            kwargs["format"], since=since, chunk_size=kwargs["chunk_size"]
+        )
+
+        if not kwargs["output"]:
+            if kwargs["gzip"]:
+                raise CommandError("--gzip needs an --output file")
+            # nothing else goes to standard output, it's the export
+            for piece in export:
+                self.stdout.write(piece, ending="")
+            return
+
+        with open(kwargs["output"], "wb") as file:
+            for piece in export.iter_bytes(compress=kwargs["gzip"]):
+                file.write(piece)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully exported {export.rows} quotes "
+                f"to {kwargs['output']}"
+            )
+        )
@@ -0,0 +1,142 @@
+import argparse
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.quotes import fuzzy
+from apps.quotes.exporting import parse_since
+from apps.quotes.generating import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SINCE,
+    DEFAULT_UNTIL,
+    QuoteGenerator,
+    write_ndjson,
+    write_to_database,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic quotes and authors for scale testing, into the "
+        "database or an NDJSON file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int, help="how many quotes")
+        parser.add_argument(
+            "--authors",
+            type=int,
+            default=1000,
+            help="how many authors to spread the quotes over",
+        )
+        parser.add_argument(
+            "--author-skew",
+            type=float,
+            default=1.1,
+            help="the Zipfian exponent of the authors' popularity, 0 spreads "
+            "the quotes evenly",
+        )
+        parser.add_argument(
+            "--words",
+            type=int,
+            default=14,
+            help="the median length of a quote, in words",
+        )
+        parser.add_argument(
+            "--words-sigma",
+            type=float,
+            default=0.5,
+            help="the spread of the (log-normal) lengths",
+        )
+        parser.add_argument("--min-words", type=int, default=4)
+        parser.add_argument("--max-words", type=int, default=80)
+        parser.add_argument(
+            "--active-ratio",
+            type=float,
+            default=0.5,
+            help="the share of the active quotes",
+        )
+        parser.add_argument(
+            "--since",
+            default=DEFAULT_SINCE.isoformat(),
+            help="the first quote's creation date (ISO)",
+        )
+        parser.add_argument(
+            "--until",
+            default=DEFAULT_UNTIL.isoformat(),
+            help="the last quote's creation date (ISO)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="the same seed generates the same quotes",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="how many quotes to insert per query",
+        )
+        parser.add_argument(
+            "--output",
+            help="write an NDJSON file (for import_quotes) instead",
+        )
+        parser.add_argument(
+            "--skip-trigrams",
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help="don't index the trigrams of the new quotes (ten times "
+            "longer than writing them), rebuild_quote_trigrams does it "
+            "afterwards",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["count"] < 0:
+            raise CommandError("The count can't be negative")
+        try:
+            generator = QuoteGenerator(
+                kwargs["seed"],
+                authors=kwargs["authors"],
+                author_skew=kwargs["author_skew"],
+                words=kwargs["words"],
+                words_sigma=kwargs["words_sigma"],
+                min_words=kwargs["min_words"],
+                max_words=kwargs["max_words"],
+                active_ratio=kwargs["active_ratio"],
+                since=parse_since(kwargs["since"]),
+                until=parse_since(kwargs["until"]),
+            )
+        except ValueError as error:
+            raise CommandError(error) from error
+
+        if kwargs["output"]:
+            with open(kwargs["output"], "w", encoding="utf-8") as file:
+                stats = write_ndjson(generator, kwargs["count"], file)
+            where = kwargs["output"]
+        else:
+            stats = write_to_database(
+                generator,
+                kwargs["count"],
+                kwargs["batch_size"],
+                index_trigrams=not kwargs["skip_trigrams"],
+            )
+            where = "the database"
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully generated {stats.inserted} quotes into "
+                f"{where} ({stats.duplicates} duplicates skipped) - "
+                f"{stats.rows} rows in {stats.seconds:.2f}s "
+                f"({stats.rows_per_second:.0f} rows/s), "
+                f"peak memory {stats.peak_memory_mib:.1f} MiB"
+            )
+        )
+        if (
+            not kwargs["output"]
+            and kwargs["skip_trigrams"]
+            and fuzzy.enabled()
+        ):
+            self.stdout.write(
+                "Their trigrams are not indexed, the fuzzy search finds them "
+                "after: python manage.py rebuild_quote_trigrams"
+            )
@@ -1,38 +1,79 @@
 import os
-import json
-from django.core.management.base import BaseCommand
-from apps.quotes.models import Quote
-from apps.authors.models import Author
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.quotes.importing import DEFAULT_BATCH_SIZE, import_items, iter_items
+from apps.quotes.reloading import ReloadError, reload_items
 
 
 class Command(BaseCommand):
-    help = "Import quotes from a JSON file"
+    help = "Import quotes from a JSON (or NDJSON) file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "file_path",
+            nargs="?",
+            # the JSON file next to this command
+            default=os.path.join(os.path.dirname(__file__), "quotes.json"),
+            help="a JSON array or a .ndjson file with the quotes",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="how many quotes to sync per transaction",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="delete the quotes that are not in the file",
+        )
+        parser.add_argument(
+            "--reload",
+            action="store_true",
+            help=(
+                "replace all the quotes with the file's, swapped in with a "
+                "single transaction"
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="only show what would change",
+        )
 
     def handle(self, *args, **kwargs):
-        # First, delete all existing quotes and authors
-        Quote.objects.all().delete()
-        Author.objects.all().delete()
-
-        # Get the directory of the current file
-        current_dir = os.path.dirname(__file__)
-        # Construct the path to the JSON file
-        file_path = os.path.join(current_dir, "quotes.json")
-
-        # Open and read the JSON file
-        with open(file_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            for item in data:
-                author_name = item.get("author")
-                if author_name:
-                    author, created = Author.objects.get_or_create(
-                        name=author_name
-                    )
-                else:
-                    author = None
-
-                Quote.objects.create(
-                    text=item["text"],
-                    author=author,
-                    date_created=item["date_created"],
+        items = iter_items(kwargs["file_path"])
+
+        if kwargs["reload"]:
+            # Staged first, the site keeps serving the old quotes meanwhile
+            try:
+                stats = reload_items(
+                    items,
+                    batch_size=kwargs["batch_size"],
+                    dry_run=kwargs["dry_run"],
                 )
-        self.stdout.write(self.style.SUCCESS("Successfully imported quotes"))
+            except ReloadError as error:
+                raise CommandError(f"Reload failed: {error}") from error
+            except ValueError as error:
+                raise CommandError(f"Invalid file: {error}") from error
+        else:
+            # The file is read item by item, only what changed is written
+            try:
+                stats = import_items(
+                    items,
+                    batch_size=kwargs["batch_size"],
+                    delete=kwargs["delete"],
+                    dry_run=kwargs["dry_run"],
+                )
+            except ValueError as error:
+                # the batches before the malformed item stay imported
+                raise CommandError(f"Invalid file: {error}") from error
+
+        if kwargs["dry_run"]:
+            self.stdout.write(f"Dry run, nothing was written: {stats}")
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully imported quotes: {stats}")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.quotes.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full text search index of quotes"
+
+    def handle(self, *args, **kwargs):
+        try:
+            indexed = rebuild_index()
+        except RuntimeError as error:
+            raise CommandError(error) from error
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully indexed {indexed} quotes")
+        )
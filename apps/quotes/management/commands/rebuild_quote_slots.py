@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.quotes.sampling import rebuild_slots
+
+
+class Command(BaseCommand):
+    help = "Rebuild the slots used for picking a random quote"
+
+    def handle(self, *args, **kwargs):
+        created = rebuild_slots()
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully rebuilt {created} quote slots")
+        )
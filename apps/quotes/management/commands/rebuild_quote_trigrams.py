@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.quotes.fuzzy import rebuild_trigrams
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trigram index of the fuzzy quote search"
+
+    def handle(self, *args, **kwargs):
+        rows = rebuild_trigrams()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully indexed {rows} trigrams")
+        )
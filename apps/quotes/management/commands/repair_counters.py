@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.quotes.counters import repair, repair_authors
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the quotes (and every author's quotes) from scratch and fix "
+        "the maintained counts"
+    )
+
+    def handle(self, *args, **kwargs):
+        counts = repair()
+        authors = repair_authors()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully repaired quote counts: {counts['total']} "
+                f"total, {counts['active']} active, of {authors} authors"
+            )
+        )
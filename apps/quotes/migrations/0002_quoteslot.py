@@ -0,0 +1,63 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_slots(apps, schema_editor):
+    """Give every existing quote a slot, in id order."""
+    Quote = apps.get_model("quotes", "Quote")
+    QuoteSlot = apps.get_model("quotes", "QuoteSlot")
+    quote_ids = Quote.objects.order_by("pk").values_list("pk", flat=True)
+    QuoteSlot.objects.bulk_create(
+        (
+            QuoteSlot(slot=slot, quote_id=quote_id)
+            for slot, quote_id in enumerate(quote_ids.iterator())
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0001_initial"),
+        ("quotes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="quote",
+            name="author",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="quotes",
+                to="authors.author",
+            ),
+        ),
+        migrations.CreateModel(
+            name="QuoteSlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("slot", models.PositiveIntegerField(unique=True)),
+                (
+                    "quote",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sample_slot",
+                        to="quotes.quote",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(populate_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:45
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counter(apps, schema_editor):
+    """Count the quotes that already exist."""
+    Quote = apps.get_model("quotes", "Quote")
+    QuoteCounter = apps.get_model("quotes", "QuoteCounter")
+    counts = Quote.objects.aggregate(
+        total=Count("pk"), active=Count("pk", filter=Q(active=True))
+    )
+    QuoteCounter.objects.create(pk=1, **counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quotes", "0002_quoteslot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuoteCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("active", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,122 @@
+# Full text search index for quotes (SQLite FTS5), see apps.quotes.search
+
+from django.db import migrations
+
+FTS_TABLE = "quotes_quote_fts"
+
+CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, author_name, author_lastname,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_quote_insert AFTER INSERT ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, author_name, author_lastname)
+        VALUES (
+            new.id,
+            new.text,
+            COALESCE(
+                (SELECT name FROM authors_author WHERE id = new.author_id),
+                ''
+            ),
+            COALESCE(
+                (SELECT lastname FROM authors_author
+                 WHERE id = new.author_id),
+                ''
+            )
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_quote_update
+    AFTER UPDATE OF text, author_id ON quotes_quote
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, text, author_name, author_lastname)
+        VALUES (
+            new.id,
+            new.text,
+            COALESCE(
+                (SELECT name FROM authors_author WHERE id = new.author_id),
+                ''
+            ),
+            COALESCE(
+                (SELECT lastname FROM authors_author
+                 WHERE id = new.author_id),
+                ''
+            )
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_quote_delete AFTER DELETE ON quotes_quote
+    BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_author_update
+    AFTER UPDATE OF name, lastname ON authors_author
+    BEGIN
+        UPDATE {FTS_TABLE}
+        SET author_name = new.name, author_lastname = new.lastname
+        WHERE rowid IN (SELECT id FROM quotes_quote WHERE author_id = new.id);
+    END
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, text, author_name, author_lastname)
+    SELECT quote.id, quote.text,
+           COALESCE(author.name, ''), COALESCE(author.lastname, '')
+    FROM quotes_quote AS quote
+    LEFT JOIN authors_author AS author ON author.id = quote.author_id
+    """,
+]
+
+DROP_STATEMENTS = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_quote_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_quote_update",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_quote_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_author_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def fts5_available(schema_editor):
+    """FTS5 is SQLite only, and even SQLite can be compiled without it."""
+    if schema_editor.connection.vendor != "sqlite":
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        options = {row[0] for row in cursor.fetchall()}
+    return "ENABLE_FTS5" in options
+
+
+def create_fts(apps, schema_editor):
+    """Create and fill the index, if the database can have one."""
+    if not fts5_available(schema_editor):
+        return
+    for statement in CREATE_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    """Remove the index (and its triggers), if there is one."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0001_initial"),
+        ("quotes", "0003_quotecounter"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
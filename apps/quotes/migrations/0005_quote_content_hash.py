@@ -0,0 +1,69 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:54
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_text(text):
+    """Same as apps.quotes.models.normalize_text, frozen for the migration."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def populate_content_hashes(apps, schema_editor):
+    """
+    Hash the existing quotes. Duplicates (same text and author) keep no hash,
+    the first of them wins it.
+    """
+    Quote = apps.get_model("quotes", "Quote")
+    seen = set()
+    quotes = Quote.objects.select_related("author").order_by("pk")
+    changed = []
+    for quote in quotes.iterator():
+        author_name = ""
+        if quote.author is not None:
+            author_name = " ".join(
+                part
+                for part in (quote.author.name, quote.author.lastname)
+                if part
+            )
+        content = (
+            f"{normalize_text(quote.text)}\x1f{normalize_text(author_name)}"
+        )
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if content_hash in seen:
+            continue
+        seen.add(content_hash)
+        quote.content_hash = content_hash
+        changed.append(quote)
+    Quote.objects.bulk_update(changed, ["content_hash"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0001_initial"),
+        ("quotes", "0004_quote_fts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quote",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.RunPython(
+            populate_content_hashes, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="quote",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("content_hash__isnull", False)),
+                fields=("content_hash",),
+                name="quotes_quote_content_hash_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:18
+
+import itertools
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def trigrams_of(text):
+    """Same as apps.quotes.fuzzy.trigrams_of, frozen for the migration."""
+    trigrams = set()
+    normalized = "".join(
+        character
+        for character in unicodedata.normalize("NFKD", text.lower())
+        if not unicodedata.combining(character)
+    )
+    for word in re.findall(r"\w+", normalized):
+        if len(word) >= 3 and not word.isdigit():
+            padded = f"  {word} "
+            trigrams.update(
+                padded[start : start + 3] for start in range(len(padded) - 2)
+            )
+    return trigrams
+
+
+def fill_trigrams(apps, schema_editor):
+    """Index the quotes there are, a batch of them at a time."""
+    Quote = apps.get_model("quotes", "Quote")
+    QuoteTrigram = apps.get_model("quotes", "QuoteTrigram")
+    quotes = Quote.objects.values_list("pk", "text").iterator(
+        chunk_size=BATCH_SIZE
+    )
+    while batch := list(itertools.islice(quotes, BATCH_SIZE)):
+        QuoteTrigram.objects.bulk_create(
+            [
+                QuoteTrigram(trigram=trigram, quote_id=pk)
+                for pk, text in batch
+                for trigram in trigrams_of(text)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quotes", "0006_quote_date_modified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuoteTrigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trigram", models.CharField(max_length=3)),
+                (
+                    "quote",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trigrams",
+                        to="quotes.quote",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="quotetrigram",
+            constraint=models.UniqueConstraint(
+                fields=("trigram", "quote"), name="quotes_quotetrigram_unique"
+            ),
+        ),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
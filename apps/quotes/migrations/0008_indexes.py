@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0003_indexes"),
+        ("quotes", "0007_quotetrigram"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="quote",
+            index=models.Index(
+                fields=["date_created", "id"], name="quotes_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quote",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["date_created", "id"],
+                name="quotes_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quote",
+            index=models.Index(
+                condition=models.Q(("active", False)),
+                fields=["date_created", "id"],
+                name="quotes_inactive_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="quote",
+            index=models.Index(
+                fields=["author", "date_created", "id"],
+                name="quotes_author_created_idx",
+            ),
+        ),
+    ]
@@ -1,10 +1,30 @@
 """A module to register quotes app models to django admin."""
 
-from django.db import models
+import hashlib
+import unicodedata
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import DEFERRED
 
 from apps.authors.models import Author
 
 
+def normalize_text(text):
+    """Unicode-normalized, case-folded, with whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def content_hash_of(text, author_name):
+    """
+    The identity of a quote's content: the normalized text plus the author
+    (see Author.full_name). Used to tell if a quote is already in the
+    database (see apps.quotes.importing).
+    """
+    content = f"{normalize_text(text)}\x1f{normalize_text(author_name or '')}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
 class Quote(models.Model):
     """Quote model."""
 
@@ -17,6 +37,166 @@ class Quote(models.Model):
     )
     active = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    # changes on every save, a version of the quote (see quotes.fragments)
+    date_modified = models.DateTimeField(auto_now=True)
+    # see content_hash_of, kept up to date by save() and the author signals
+    content_hash = models.CharField(
+        max_length=64, null=True, blank=True, editable=False
+    )
+
+    # fields the signal receivers need to compare before and after a save
+    TRACKED_FIELDS = ("text", "author_id", "active")
+
+    class Meta:
+        """The quote table's indexes and constraints."""
+
+        # pylint: disable=too-few-public-methods
+
+        indexes = [
+            # the quote list (keyset pagination, see AgKeysetPaginationMixin)
+            # and the date filters
+            models.Index(
+                fields=["date_created", "id"], name="quotes_created_idx"
+            ),
+            # active:true/false searches, in list order - partial indexes,
+            # as the filter is WHERE "active" (or NOT "active"), which an
+            # index on (active, ...) can't be searched by
+            models.Index(
+                fields=["date_created", "id"],
+                condition=models.Q(active=True),
+                name="quotes_active_created_idx",
+            ),
+            models.Index(
+                fields=["date_created", "id"],
+                condition=models.Q(active=False),
+                name="quotes_inactive_created_idx",
+            ),
+            # the quotes of an author (author pages, author: searches), in
+            # list order
+            models.Index(
+                fields=["author", "date_created", "id"],
+                name="quotes_author_created_idx",
+            ),
+        ]
+        constraints = [
+            # a partial unique index - unlike unique=True it can be added
+            # without SQLite rebuilding the whole quote table
+            models.UniqueConstraint(
+                fields=["content_hash"],
+                condition=models.Q(content_hash__isnull=False),
+                name="quotes_quote_content_hash_unique",
+            ),
+        ]
 
     def __str__(self):
         return str(self.text)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded values, so signals can tell what changed."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS and value is not DEFERRED
+        }
+        return instance
+
+    def clean(self):
+        """The same quote by the same author can't be added twice."""
+        content_hash = content_hash_of(
+            self.text, self.author.full_name if self.author_id else ""
+        )
+        if (
+            Quote.objects.filter(content_hash=content_hash)
+            .exclude(pk=self.pk)
+            .exists()
+        ):
+            raise ValidationError("This quote by this author already exists.")
+
+    def save(self, *args, **kwargs):
+        """
+        Save the quote together with everything the signal receivers change
+        (slots, counters) - either all of it is saved or none of it.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"text", "author", "author_id"} & set(
+            update_fields
+        ):
+            self.content_hash = content_hash_of(
+                self.text, self.author.full_name if self.author_id else ""
+            )
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "content_hash"}
+        if kwargs.get("update_fields") is not None:
+            # auto_now only applies to the saved fields
+            kwargs["update_fields"] = {
+                *kwargs["update_fields"],
+                "date_modified",
+            }
+
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+        # pylint: disable=attribute-defined-outside-init
+        self._loaded_values = {
+            name: getattr(self, name) for name in self.TRACKED_FIELDS
+        }
+
+
+class QuoteSlot(models.Model):
+    """
+    A dense (gap free) numbering of quotes: every quote owns exactly one slot
+    in the range 0..n-1. Lets apps.quotes.sampling pick a random quote with an
+    index lookup, instead of loading the whole quote table.
+    """
+
+    slot = models.PositiveIntegerField(unique=True)
+    quote = models.OneToOneField(
+        Quote,
+        on_delete=models.CASCADE,
+        related_name="sample_slot",
+    )
+
+    def __str__(self):
+        return f"{self.slot} -> {self.quote_id}"
+
+
+class QuoteTrigram(models.Model):
+    """
+    The distinct trigrams of a quote's words, for the fuzzy search (see
+    apps.quotes.fuzzy). Only filled when QUOTES_TRIGRAM_INDEX is on.
+    """
+
+    trigram = models.CharField(max_length=3)
+    quote = models.ForeignKey(
+        Quote, on_delete=models.CASCADE, related_name="trigrams"
+    )
+
+    class Meta:
+        """One row per trigram of a quote."""
+
+        # pylint: disable=too-few-public-methods
+
+        constraints = [
+            # also the index the candidates are looked up with
+            models.UniqueConstraint(
+                fields=["trigram", "quote"],
+                name="quotes_quotetrigram_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram!r} of quote {self.quote_id}"
+
+
+class QuoteCounter(models.Model):
+    """
+    Maintained quote counts, so pages don't have to count the quote table.
+    There is a single row of it (see apps.quotes.counters).
+    """
+
+    total = models.PositiveIntegerField(default=0)
+    active = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.total} quotes, {self.active} active"
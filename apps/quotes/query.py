@@ -0,0 +1,446 @@
+"""
+A module for the structured search queries, like:
+
+    author:Huxley active:true before:2024-01-01 "exact phrase" words
+
+Fields:
+    author: quotes by an author, matched by name, lastname or full name
+        (case insensitive). Given more than once - by any of them.
+    active: true or false (also yes/no, 1/0).
+    before: quotes created before an ISO date (and time).
+    after: quotes created on or after an ISO date (and time).
+
+Everything else is text: "quoted phrases" match as they are, the other
+words as prefixes (see apps.quotes.search). A query that is only words is
+an ordinary search, through search_quote_ids.
+
+The query is planned before it runs (see QueryPlan): one of its indexed
+predicates drives the lookup - the full text index, when there is text -
+and the others only filter what it finds. The plan is logged at DEBUG
+level, explain_query adds the database's own EXPLAIN QUERY PLAN to it.
+"""
+
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+
+from apps.authors.models import Author
+from apps.quotes.exporting import parse_since
+from apps.quotes.models import Quote
+from apps.quotes.search import (
+    BM25_WEIGHTS,
+    FTS_TABLE,
+    WORD_RE,
+    cached_search,
+    fts_available,
+    match_expression,
+    search_limit,
+    search_quote_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+# field:value, field:"quoted value", "a phrase" or a word
+TOKEN_RE = re.compile(r'(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+FIELDS = ("author", "active", "before", "after")
+
+BOOLEANS = {
+    "true": True,
+    "yes": True,
+    "1": True,
+    "false": False,
+    "no": False,
+    "0": False,
+}
+
+
+class QueryError(ValueError):
+    """The query has a field with a value that makes no sense."""
+
+
+class ParsedQuery:
+    """The parts of a search query."""
+
+    def __init__(self, query):
+        self.query = query
+        self.terms = []
+        self.phrases = []
+        self.authors = []
+        self.active = None
+        self.before = None
+        self.after = None
+
+    def add_field(self, field, value):
+        """
+        Set a field (one of FIELDS) to a value.
+
+        Raises:
+            QueryError: If the value is wrong for the field.
+        """
+
+        if not value:
+            raise QueryError(f"{field}: needs a value")
+        if field == "author":
+            self.authors.append(value)
+        elif field == "active":
+            if value.lower() not in BOOLEANS:
+                raise QueryError(f"active: must be true or false, not {value}")
+            self.active = BOOLEANS[value.lower()]
+        else:
+            try:
+                setattr(self, field, parse_since(value))
+            except ValueError as error:
+                raise QueryError(
+                    f"{field}: must be a date, not {value}"
+                ) from (error)
+
+    @property
+    def has_text(self):
+        """Whether there's anything to look up in the full text index."""
+
+        return bool(self.terms or self.phrases)
+
+    @property
+    def is_plain(self):
+        """Whether it's just words - an ordinary search."""
+
+        return not (
+            self.phrases
+            or self.authors
+            or self.active is not None
+            or self.before is not None
+            or self.after is not None
+        )
+
+    @property
+    def key(self):
+        """What decides the results, for the search result cache."""
+
+        return "|".join(
+            [
+                " ".join(word.lower() for word in self.terms),
+                ";".join(phrase.lower() for phrase in self.phrases),
+                ";".join(sorted(author.lower() for author in self.authors)),
+                str(self.active),
+                self.before.isoformat() if self.before else "",
+                self.after.isoformat() if self.after else "",
+            ]
+        )
+
+
+def parse_query(query):
+    """
+    Split a search query into its text and its fields.
+
+    Returns:
+        ParsedQuery: The parts.
+
+    Raises:
+        QueryError: If a field's value is wrong (not a date, ...).
+    """
+
+    parsed = ParsedQuery(query)
+    for match in TOKEN_RE.finditer(query):
+        field, quoted, bare = match.groups()
+        value = quoted if quoted is not None else bare
+        field = field.lower() if field else None
+
+        if field not in FIELDS:
+            if field is not None:
+                # "note:this" is just text
+                parsed.terms.extend(WORD_RE.findall(f"{field} {value}"))
+            elif quoted is not None:
+                words = WORD_RE.findall(quoted)
+                if len(words) > 1:
+                    parsed.phrases.append(" ".join(words))
+                else:
+                    parsed.terms.extend(words)
+            else:
+                parsed.terms.extend(WORD_RE.findall(value))
+            continue
+
+        parsed.add_field(field, value.strip())
+
+    return parsed
+
+
+def is_indexed(model, field_name):
+    """
+    Whether the field's column leads an index of the model's table, or is
+    the condition of a partial one (so a lookup by it is a search, not a
+    scan).
+    """
+    # pylint: disable=protected-access
+
+    field = model._meta.get_field(field_name)
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    leading = [
+        index.fields[0] for index in model._meta.indexes if index.fields
+    ]
+    leading += [
+        child[0]
+        for index in model._meta.indexes
+        if index.condition is not None
+        for child in index.condition.children
+        if isinstance(child, tuple)
+    ]
+    leading += [
+        constraint.fields[0]
+        for constraint in model._meta.constraints
+        if getattr(constraint, "fields", None)
+        and getattr(constraint, "condition", None) is None
+    ]
+    return any(name.lstrip("-") == field_name for name in leading)
+
+
+class QueryPlan:
+    """
+    How a parsed query is run: the predicate that drives the lookup and
+    the ones that filter what it finds.
+
+    The driver is the first indexed one of: the text (the full text
+    index), the author, the dates, active. Only a query without any
+    indexed predicate scans the quote table.
+    """
+
+    def __init__(self, parsed):
+        self.parsed = parsed
+        self.author_ids = None
+        self.sql = None
+        self.params = None
+
+        present = [
+            ("text", parsed.has_text, fts_available()),
+            ("author", bool(parsed.authors), is_indexed(Quote, "author")),
+            (
+                "date_created",
+                parsed.before is not None or parsed.after is not None,
+                is_indexed(Quote, "date_created"),
+            ),
+            ("active", parsed.active is not None, is_indexed(Quote, "active")),
+        ]
+        self.driver = next(
+            (name for name, used, indexed in present if used and indexed),
+            "scan",
+        )
+
+    @property
+    def uses_fts(self):
+        """Whether the lookup goes through the full text index."""
+
+        return self.driver == "text"
+
+    def predicates(self):
+        """The predicates, as readable strings, the driving one first."""
+
+        parsed = self.parsed
+        predicates = {"text": [], "author": [], "date_created": []}
+        if parsed.has_text:
+            if self.uses_fts:
+                predicates["text"].append(
+                    f"{FTS_TABLE} MATCH {self.expression()!r}"
+                )
+            else:
+                predicates["text"].extend(
+                    f"text ICONTAINS {text!r}"
+                    for text in parsed.terms + parsed.phrases
+                )
+        if parsed.authors:
+            predicates["author"].append(
+                f"author_id IN {tuple(self.author_ids)}"
+                if self.author_ids is not None
+                else f"author IN {tuple(parsed.authors)}"
+            )
+        if parsed.after is not None:
+            predicates["date_created"].append(
+                f"date_created >= {parsed.after.isoformat()}"
+            )
+        if parsed.before is not None:
+            predicates["date_created"].append(
+                f"date_created < {parsed.before.isoformat()}"
+            )
+        if parsed.active is not None:
+            predicates["active"] = [f"active = {parsed.active}"]
+
+        ordered = predicates.pop(self.driver, [])
+        for rest in predicates.values():
+            ordered.extend(rest)
+        return ordered
+
+    def __str__(self):
+        order = "bm25" if self.uses_fts else "date_created, id"
+        return (
+            f"driver {self.driver}: {' AND '.join(self.predicates())} "
+            f"ORDER BY {order}"
+        )
+
+    def expression(self):
+        """The MATCH expression of the terms and phrases."""
+
+        phrases = " ".join(f'"{phrase}"' for phrase in self.parsed.phrases)
+        return " ".join(
+            part
+            for part in (
+                match_expression(" ".join(self.parsed.terms)),
+                phrases,
+            )
+            if part
+        )
+
+    def resolve_authors(self):
+        """
+        Turn the author values into author ids.
+
+        Returns:
+            list: The ids, empty if no author is like any of the values.
+        """
+
+        # compared lowercased, not with iexact (a LIKE), so the lookups use
+        # the Lower("name") and Lower("lastname") indexes
+        condition = Q()
+        for value in self.parsed.authors:
+            lower = Lower(Value(value))
+            condition |= Q(lower_name=lower) | Q(lower_lastname=lower)
+            name, _, lastname = value.partition(" ")
+            if lastname:
+                condition |= Q(
+                    lower_name=Lower(Value(name)),
+                    lower_lastname=Lower(Value(lastname)),
+                )
+        authors = Author.objects.alias(
+            lower_name=Lower("name"), lower_lastname=Lower("lastname")
+        )
+        self.author_ids = sorted(
+            authors.filter(condition).values_list("pk", flat=True)
+        )
+        return self.author_ids
+
+    def run(self, limit):
+        """
+        Look the quotes up.
+
+        Returns:
+            list: Ids of the matching quotes, best matches (or oldest) first.
+        """
+
+        if self.parsed.authors and not self.resolve_authors():
+            return []
+
+        if self.uses_fts:
+            self.sql, self.params = self._fts_sql(limit)
+        else:
+            self.sql, self.params = self._queryset()[
+                :limit
+            ].query.sql_with_params()
+        logger.debug("Search plan: %s", self)
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.sql, self.params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def _queryset(self):
+        """The ids of the matching quotes, without the full text index."""
+
+        parsed = self.parsed
+        quotes = Quote.objects.all()
+        for text in parsed.terms + parsed.phrases:
+            quotes = quotes.filter(text__icontains=text)
+        if parsed.authors:
+            quotes = quotes.filter(author_id__in=self.author_ids)
+        if parsed.after is not None:
+            quotes = quotes.filter(date_created__gte=parsed.after)
+        if parsed.before is not None:
+            quotes = quotes.filter(date_created__lt=parsed.before)
+        if parsed.active is not None:
+            quotes = quotes.filter(active=parsed.active)
+        return quotes.order_by("date_created", "id").values_list(
+            "pk", flat=True
+        )
+
+    def _fts_sql(self, limit):
+        """The full text lookup, joined with the quotes to filter them."""
+
+        parsed = self.parsed
+        # pylint: disable=protected-access
+        quotes_table = connection.ops.quote_name(Quote._meta.db_table)
+        where = [f"{FTS_TABLE} MATCH %s"]
+        params = [self.expression()]
+
+        if parsed.authors:
+            placeholders = ", ".join(["%s"] * len(self.author_ids))
+            where.append(f"quote.author_id IN ({placeholders})")
+            params.extend(self.author_ids)
+        for value, operator in ((parsed.after, ">="), (parsed.before, "<")):
+            if value is not None:
+                where.append(f"quote.date_created {operator} %s")
+                params.append(connection.ops.adapt_datetimefield_value(value))
+        if parsed.active is not None:
+            where.append("quote.active = %s")
+            params.append(parsed.active)
+
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        sql = (
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "  # nosec B608
+            f"JOIN {quotes_table} AS quote ON quote.id = {FTS_TABLE}.rowid "
+            f"WHERE {' AND '.join(where)} "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), {FTS_TABLE}.rowid "
+            f"LIMIT %s"
+        )
+        return sql, [*params, limit]
+
+    def explain(self):
+        """
+        The plan, with the database's EXPLAIN QUERY PLAN of the lookup (it
+        has to have run).
+
+        Returns:
+            list: Lines, ours first.
+        """
+
+        lines = [str(self)]
+        if self.sql is not None and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {self.sql}", self.params)
+                lines.extend(row[-1] for row in cursor.fetchall())
+        return lines
+
+
+def query_quote_ids(parsed, limit=None):
+    """
+    Search the quotes with a parsed query (through the search result
+    cache).
+
+    Args:
+        parsed (ParsedQuery): The query (see parse_query).
+        limit (int): How many ids to return at most.
+
+    Returns:
+        list: Ids of the matching quotes - best matches first when there's
+            text, otherwise oldest first.
+    """
+
+    if parsed.is_plain:
+        return search_quote_ids(parsed.query, limit)
+
+    limit = limit or search_limit()
+    return cached_search(
+        f"query.{limit}.{parsed.key}", lambda: QueryPlan(parsed).run(limit)
+    )
+
+
+def explain_query(parsed, limit=None):
+    """
+    Plan and run a parsed query, for debugging (no result cache).
+
+    Returns:
+        list: The plan's lines (see QueryPlan.explain).
+    """
+
+    plan = QueryPlan(parsed)
+    plan.run(limit or search_limit())
+    return plan.explain()
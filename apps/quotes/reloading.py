@@ -0,0 +1,470 @@
+"""
+A module for reloading the whole quote corpus (import_quotes --reload).
+
+Unlike the incremental sync (see apps.quotes.importing), a reload makes the
+database hold exactly the quotes of the file. It is done in two phases, so
+readers never see a half loaded corpus:
+
+1. The file is loaded into staging tables (temporary copies of the author
+   and quote tables), outside of any long transaction. Quotes and authors
+   that already exist keep their ids (matched by content hash and full
+   name), so their URLs stay the same. The new ones get provisional
+   (negative) ids. The staged row counts are validated.
+2. The staging tables are swapped in with a single transaction: rows that
+   are not staged are deleted, the new rows get their ids (after the last
+   one the table gave - a quote saved meanwhile keeps its own), the staged
+   rows are upserted, derived data (slots, counts, ...) is rebuilt and the
+   counts are checked again.
+
+Readers see the old corpus until the swap commits and the new one after.
+The swap is timed and logged. SQLite only (temporary tables, upserts and
+row values comparison).
+"""
+
+import logging
+import time
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from apps.authors.models import Author
+from apps.quotes import fuzzy
+from apps.quotes.importing import (
+    DEFAULT_BATCH_SIZE,
+    ImportStats,
+    batched,
+    parse_date,
+    validated,
+)
+from apps.quotes.models import (
+    Quote,
+    QuoteSlot,
+    QuoteTrigram,
+    content_hash_of,
+)
+from apps.quotes.signals import quotes_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+STAGING_PREFIX = "staging_"
+
+
+class ReloadError(Exception):
+    """The staged corpus is not fit to replace the current one."""
+
+
+def _columns(model):
+    """The table columns of the model, in field order."""
+    # pylint: disable=protected-access
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def _table(model, staging=False):
+    """The quoted table name of the model (or of its staging copy)."""
+    # pylint: disable=protected-access
+    table = model._meta.db_table
+    if staging:
+        table = STAGING_PREFIX + table
+    return connection.ops.quote_name(table)
+
+
+def _compared_columns(model):
+    """
+    The columns that tell if a staged row changes an existing one - all but
+    the id and the auto_now ones (those are now in every staged row).
+    """
+    # pylint: disable=protected-access
+    return [
+        field.column
+        for field in model._meta.concrete_fields
+        if not field.primary_key and not getattr(field, "auto_now", False)
+    ]
+
+
+def _fill_auto_dates(instance):
+    """Set the auto_now(_add) dates that are not set, like an insert would."""
+    # pylint: disable=protected-access
+    for field in instance._meta.concrete_fields:
+        if getattr(field, "auto_now", False) or (
+            getattr(field, "auto_now_add", False)
+            and getattr(instance, field.attname) is None
+        ):
+            field.pre_save(instance, add=True)
+
+
+def _row(instance):
+    """The database values of a model instance, in _columns order."""
+    # pylint: disable=protected-access
+    return [
+        field.get_db_prep_save(getattr(instance, field.attname), connection)
+        for field in instance._meta.concrete_fields
+    ]
+
+
+class Stager:
+    """Loads the quote items into the staging tables."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        # full name -> the authors that exist, the oldest wins
+        self.authors = {
+            author.full_name: author
+            for author in Author.objects.order_by("-pk")
+        }
+        # content hash -> (id, active, date_created) of the existing quotes
+        self.quotes = {
+            content_hash: (pk, active, date_created)
+            for pk, content_hash, active, date_created in (
+                Quote.objects.exclude(content_hash=None)
+                .values_list("pk", "content_hash", "active", "date_created")
+                .iterator()
+            )
+        }
+        # model -> how many new rows were staged (see provisional_id)
+        self.new_rows = {Author: 0, Quote: 0}
+        self.staged_authors = {}
+        self.staged_hashes = set()
+        self.staged_quotes = 0
+
+    def create_tables(self):
+        """(Re)create empty staging copies of the author and quote tables."""
+
+        with connection.cursor() as cursor:
+            for model in (Author, Quote):
+                cursor.execute(
+                    f"DROP TABLE IF EXISTS {_table(model, staging=True)}"
+                )
+                cursor.execute(
+                    f"CREATE TEMP TABLE {_table(model, staging=True)} "
+                    f"AS SELECT * FROM {_table(model)} WHERE 0"  # nosec B608
+                )
+
+    def drop_tables(self):
+        """Drop the staging tables."""
+
+        with connection.cursor() as cursor:
+            for model in (Author, Quote):
+                cursor.execute(
+                    f"DROP TABLE IF EXISTS {_table(model, staging=True)}"
+                )
+
+    def stage(self, batch):
+        """Stage a batch of items (and the authors they need)."""
+
+        authors = []
+        quotes = []
+        for item in batch:
+            author_name = item.get("author") or ""
+            content_hash = content_hash_of(item["text"], author_name)
+            if content_hash in self.staged_hashes:
+                self.stats.duplicates += 1
+                continue
+            self.staged_hashes.add(content_hash)
+
+            author_id = None
+            if author_name:
+                author_id = self.staged_authors.get(author_name)
+                if author_id is None:
+                    authors.append(self._author(author_name))
+                    author_id = authors[-1].pk
+                    self.staged_authors[author_name] = author_id
+
+            quotes.append(self._quote(item, author_id, content_hash))
+
+        self._insert(Author, authors)
+        self._insert(Quote, quotes)
+        self.staged_quotes += len(quotes)
+
+    def provisional_id(self, model):
+        """
+        An id for a new row of the model: negative, no row created in the
+        meantime can have it. The swap gives the row its id (see
+        _assign_ids).
+        """
+
+        self.new_rows[model] += 1
+        return -self.new_rows[model]
+
+    def _author(self, name):
+        """The staged author of the name, the existing one if there is one."""
+
+        author = self.authors.get(name)
+        if author is None:
+            author = Author(pk=self.provisional_id(Author), name=name)
+        _fill_auto_dates(author)
+        return author
+
+    def _quote(self, item, author_id, content_hash):
+        """The staged quote of the item, with its existing id if any."""
+
+        quote = Quote(
+            text=item["text"],
+            author_id=author_id,
+            active=item.get("active", False),
+            content_hash=content_hash,
+        )
+        existing = self.quotes.get(content_hash)
+        if existing is None:
+            quote.pk = self.provisional_id(Quote)
+            self.stats.inserted += 1
+        else:
+            quote.pk, active, quote.date_created = existing
+            quote.active = item.get("active", active)
+        date_created = parse_date(item.get("date_created"))
+        if date_created is not None:
+            quote.date_created = date_created
+        _fill_auto_dates(quote)
+        return quote
+
+    def _insert(self, model, instances):
+        """Write the instances into the model's staging table."""
+
+        if not instances:
+            return
+        columns = _columns(model)
+        placeholders = ", ".join(["%s"] * len(columns))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {_table(model, staging=True)} "  # nosec B608
+                f"({', '.join(columns)}) VALUES ({placeholders})",
+                [_row(instance) for instance in instances],
+            )
+
+    def validate(self):
+        """
+        Check that the staged counts match what was read.
+
+        Raises:
+            ReloadError: If they don't, or if nothing was staged.
+        """
+
+        expected = self.stats.rows - self.stats.duplicates
+        staged = {
+            Author: len(self.staged_authors),
+            Quote: expected,
+        }
+        if not expected:
+            raise ReloadError("Nothing to reload, refusing to empty the site")
+
+        with connection.cursor() as cursor:
+            for model, count in staged.items():
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM "  # nosec B608
+                    f"{_table(model, staging=True)}"
+                )
+                (actual,) = cursor.fetchone()
+                if actual != count:
+                    raise ReloadError(
+                        f"Staged {actual} {model.__name__} rows, "
+                        f"expected {count}"
+                    )
+
+
+def _delete_unstaged(cursor, model, related=()):
+    """Delete the model rows (and related rows) that are not staged."""
+
+    not_staged = (
+        f"NOT IN (SELECT id FROM {_table(model, staging=True)})"  # nosec B608
+    )
+    for related_model, column in related:
+        cursor.execute(
+            f"DELETE FROM {_table(related_model)} "  # nosec B608
+            f"WHERE {column} {not_staged}"
+        )
+    cursor.execute(
+        f"DELETE FROM {_table(model)} WHERE id {not_staged}"  # nosec B608
+    )
+
+
+def _differs(columns, table, other):
+    """SQL condition: the columns of the table's row differ from other's."""
+
+    return (
+        f"({', '.join(f'{table}.{column}' for column in columns)}) "
+        f"IS NOT ({', '.join(f'{other}.{column}' for column in columns)})"
+    )
+
+
+def _count_changed(model):
+    """How many staged rows would change an existing row."""
+
+    table = _table(model)
+    staging = _table(model, staging=True)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {staging} "  # nosec B608
+            f"JOIN {table} ON {table}.id = {staging}.id WHERE "
+            + _differs(_compared_columns(model), table, staging)
+        )
+        return cursor.fetchone()[0]
+
+
+def _last_id(cursor, model):
+    """The last id the model's table gave, deleted rows' too."""
+    # pylint: disable=protected-access
+
+    cursor.execute(f"SELECT MAX(id) FROM {_table(model)}")  # nosec B608
+    (last,) = cursor.fetchone()
+    # AUTOINCREMENT, the ids of deleted rows aren't given again
+    cursor.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = %s",
+        [model._meta.db_table],
+    )
+    sequence = cursor.fetchone()
+    return max(last or 0, sequence[0] if sequence else 0)
+
+
+def _assign_ids(cursor):
+    """
+    Give the staged new rows (see Stager.provisional_id) the ids after the
+    last ones of their tables. To be called in the swap, once it holds the
+    database's write lock - no row can be created in between.
+    """
+
+    last_author = _last_id(cursor, Author)
+    last_quote = _last_id(cursor, Quote)
+    staged_authors = _table(Author, staging=True)
+    staged_quotes = _table(Quote, staging=True)
+    # -1 is the first new row
+    cursor.execute(
+        f"UPDATE {staged_authors} SET id = %s - id WHERE id < 0",  # nosec B608
+        [last_author],
+    )
+    cursor.execute(
+        f"UPDATE {staged_quotes} SET author_id = %s - author_id "  # nosec B608
+        "WHERE author_id < 0",
+        [last_author],
+    )
+    cursor.execute(
+        f"UPDATE {staged_quotes} SET id = %s - id WHERE id < 0",  # nosec B608
+        [last_quote],
+    )
+
+
+def _upsert_staged(cursor, model):
+    """Insert the staged rows, update the existing rows that differ."""
+
+    columns = _columns(model)
+    values = [column for column in columns if column != "id"]
+    table = _table(model)
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) "  # nosec B608
+        f"SELECT {', '.join(columns)} FROM {_table(model, staging=True)} "
+        # WHERE true - so the upsert clause isn't parsed as a join
+        f"WHERE true ON CONFLICT (id) DO UPDATE SET "
+        + ", ".join(f"{column} = excluded.{column}" for column in values)
+        + " WHERE "
+        + _differs(_compared_columns(model), table, "excluded")
+    )
+
+
+def _stage_text_changes(cursor):
+    """
+    Note the staged quotes that are new or change an existing one's text,
+    in a temporary table - their trigrams are indexed after the upsert.
+
+    Returns:
+        str: The table, of quote ids.
+    """
+
+    table = _table(Quote)
+    staging = _table(Quote, staging=True)
+    changes = connection.ops.quote_name(f"{STAGING_PREFIX}text_changes")
+    cursor.execute(f"DROP TABLE IF EXISTS {changes}")
+    cursor.execute(
+        f"CREATE TEMP TABLE {changes} AS "  # nosec B608
+        f"SELECT {staging}.id FROM {staging} "
+        f"LEFT JOIN {table} ON {table}.id = {staging}.id "
+        f"WHERE {table}.text IS NOT {staging}.text"
+    )
+    return changes
+
+
+def _swap(stager):
+    """Replace the live tables' content with the staged one."""
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # the first write takes the write lock, until the commit
+        _delete_unstaged(
+            cursor,
+            Quote,
+            related=[(QuoteSlot, "quote_id"), (QuoteTrigram, "quote_id")],
+        )
+        # quotes of deleted authors are either deleted above or re-pointed
+        # by the upsert below (foreign keys are checked on commit)
+        _delete_unstaged(cursor, Author)
+        _assign_ids(cursor)
+        changes = _stage_text_changes(cursor) if fuzzy.enabled() else None
+        _upsert_staged(cursor, Author)
+        _upsert_staged(cursor, Quote)
+        # explicit ids above the old maximum move sqlite_sequence along,
+        # so new quotes keep getting fresh ids
+
+        if changes:
+            changed = f"SELECT id FROM {changes}"  # nosec B608
+            fuzzy.index_quotes(
+                Quote.objects.filter(pk__in=RawSQL(changed, []))
+            )
+            cursor.execute(f"DROP TABLE {changes}")
+        quotes_bulk_changed.send(sender=Quote)
+
+        quote_count = Quote.objects.count()
+        if quote_count != stager.staged_quotes:
+            raise ReloadError(
+                f"Swapped in {quote_count} quotes, "
+                f"expected {stager.staged_quotes}"
+            )
+
+
+def reload_items(items, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Replace all the quotes (and authors) with the items, atomically.
+
+    Args:
+        items (iterable): Dicts with "text" and (optionally) "author",
+            "active" and "date_created".
+        batch_size (int): How many items to stage at once.
+        dry_run (bool): Stage and validate only, don't swap.
+
+    Returns:
+        ImportStats: What was changed, swap_seconds is how long the swap
+            transaction took.
+
+    Raises:
+        ReloadError: If the staged corpus doesn't validate. Nothing is
+            changed then.
+        ValueError: If an item is malformed (see
+            apps.quotes.importing.validated). Nothing is changed either.
+    """
+
+    stats = ImportStats()
+    stager = Stager(stats)
+    stager.create_tables()
+
+    try:
+        for batch in batched(validated(items), batch_size):
+            with transaction.atomic():
+                stager.stage(batch)
+            stats.rows += len(batch)
+
+        stager.validate()
+
+        kept = stager.staged_quotes - stats.inserted
+        stats.updated = _count_changed(Quote)
+        stats.unchanged = kept - stats.updated
+        stats.deleted = Quote.objects.count() - kept
+
+        if not dry_run:
+            started = time.perf_counter()
+            _swap(stager)
+            stats.swap_seconds = time.perf_counter() - started
+            logger.info(
+                "Swapped in %s quotes in %.3fs",
+                stager.staged_quotes,
+                stats.swap_seconds,
+            )
+    finally:
+        stager.drop_tables()
+
+    stats.finish()
+    return stats
@@ -0,0 +1,131 @@
+"""
+A module for picking a random quote without loading the whole quote table.
+
+Every quote owns a slot - a number in the dense range 0..n-1 (see the
+QuoteSlot model). Picking a random quote then costs two index lookups: the
+highest slot number and the quote sitting in a randomly chosen slot.
+
+Gaps in quote ids don't matter, because slots never have gaps: when a quote
+is deleted, the quote in the last slot is moved into the freed one. So every
+quote has exactly the same chance of being picked.
+"""
+
+import logging
+import secrets
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+
+from apps.quotes.models import Quote, QuoteSlot
+
+logger = logging.getLogger(__name__)
+
+# how many times to retry taking the next slot number, when a concurrent
+# insert took it first
+ASSIGN_SLOT_ATTEMPTS = 3
+
+
+def random_quote():
+    """
+    Pick a uniformly random quote.
+
+    Returns:
+        Quote: The picked quote, or None if there are no quotes at all.
+    """
+
+    last_slot = QuoteSlot.objects.aggregate(last=Max("slot"))["last"]
+
+    if last_slot is None:
+        # slots are empty, but quotes could have been inserted behind the
+        # signals' back (raw sql, bulk_create), so don't lie about it
+        if Quote.objects.exists():
+            logger.warning("Quotes exist, but have no slots. Rebuild them.")
+            return _random_quote_slow()
+        return None
+
+    # using secrets here, because 'bandit' pre-commmit hooks warms me that
+    # 'random' package is not safe (Issue: [B311:blacklist])
+    slot = secrets.randbelow(last_slot + 1)
+
+    try:
+        return QuoteSlot.objects.select_related("quote").get(slot=slot).quote
+    except QuoteSlot.DoesNotExist:
+        logger.warning("Quote slot %s is missing. Rebuild the slots.", slot)
+        return _random_quote_slow()
+
+
+def _random_quote_slow():
+    """The old way - pick from all the quote ids. Used as a fallback only."""
+
+    quote_ids = list(Quote.objects.values_list("pk", flat=True))
+
+    if not quote_ids:
+        return None
+
+    return Quote.objects.get(pk=secrets.choice(quote_ids))
+
+
+def assign_slot(quote):
+    """
+    Put a newly created quote into the next free slot (the end of the range).
+
+    Args:
+        quote (Quote): The quote that doesn't have a slot yet.
+    """
+
+    for attempt in range(1, ASSIGN_SLOT_ATTEMPTS + 1):
+        last_slot = QuoteSlot.objects.aggregate(last=Max("slot"))["last"]
+        next_slot = 0 if last_slot is None else last_slot + 1
+        try:
+            with transaction.atomic():
+                QuoteSlot.objects.create(slot=next_slot, quote=quote)
+            return
+        except IntegrityError:
+            # someone else took this slot meanwhile, try the next one
+            if attempt == ASSIGN_SLOT_ATTEMPTS:
+                raise
+
+
+def fill_slot(slot):
+    """
+    Keep the slot range dense after a slot was freed, by moving the quote
+    from the last slot into the freed one.
+
+    Args:
+        slot (int): The slot number that was freed.
+    """
+
+    last = QuoteSlot.objects.order_by("-slot").first()
+
+    if last is not None and last.slot > slot:
+        # .update() on purpose - it does not send signals
+        QuoteSlot.objects.filter(pk=last.pk).update(slot=slot)
+
+
+def rebuild_slots():
+    """
+    Throw away all the slots and number every quote again, in id order.
+
+    Used after bulk operations that bypass signals (bulk_create, raw sql).
+
+    Returns:
+        int: The number of slots created.
+    """
+    # pylint: disable=protected-access
+
+    slots_table = connection.ops.quote_name(QuoteSlot._meta.db_table)
+    quotes_table = connection.ops.quote_name(Quote._meta.db_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # raw sql, so the post_delete signal doesn't fire for every slot
+        cursor.execute(f"DELETE FROM {slots_table}")  # nosec B608
+        cursor.execute(
+            f"INSERT INTO {slots_table} (slot, quote_id) "  # nosec B608
+            f"SELECT ROW_NUMBER() OVER (ORDER BY id) - 1, id "
+            f"FROM {quotes_table}"
+        )
+        created = cursor.rowcount
+
+    logger.info("Rebuilt %s quote slots", created)
+
+    return created
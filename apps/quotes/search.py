@@ -0,0 +1,470 @@
+"""
+A module for the quote search.
+
+On SQLite with FTS5 the search goes through a full text index
+(quotes_quote_fts, created by migration 0004_quote_fts) over the quote text
+and the author's name and lastname. Triggers keep the index in sync with the
+quote and author tables, so bulk inserts and raw sql are covered too.
+Results are ranked by bm25 and capped to QUOTES_SEARCH_LIMIT.
+
+On any other database (or a SQLite without FTS5) the search falls back to
+the old `text__icontains` filter.
+
+The active search asks for the same popular queries over and over, so the
+results (only the ids) are kept in an in-process LRU cache (see
+SearchResultCache), keyed by the normalized query. It is emptied when the
+versions of the quotes and authors change (see ag_cache_versions), and
+identical searches that miss at the same time run only one query.
+"""
+
+import contextlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from ag_mixins import ag_cache_versions
+from apps.quotes.models import Quote
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "quotes_quote_fts"
+
+# how many search results are returned at most
+DEFAULT_SEARCH_LIMIT = 100
+
+# bm25 weights of the text, author_name and author_lastname columns
+BM25_WEIGHTS = (1.0, 2.0, 2.0)
+
+WORD_RE = re.compile(r"\w+")
+
+# how many searches' results are cached (per process), 0 - no caching
+DEFAULT_SEARCH_CACHE_SIZE = 1000
+
+# how long (in seconds) an identical search waits for the one running
+FLIGHT_TIMEOUT = 10
+
+# database name -> whether it has the full text index
+_fts_available = {}
+
+_AUTHOR_COLUMNS = """
+    COALESCE((SELECT name FROM authors_author WHERE id = new.author_id), ''),
+    COALESCE((SELECT lastname FROM authors_author WHERE id = new.author_id), '')
+"""
+
+# the triggers that keep the index in sync (same as in 0004_quote_fts)
+TRIGGERS = {
+    f"{FTS_TABLE}_quote_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_quote_insert
+        AFTER INSERT ON quotes_quote
+        BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, text, author_name, author_lastname)
+            VALUES (new.id, new.text, {_AUTHOR_COLUMNS});
+        END
+    """,
+    f"{FTS_TABLE}_quote_update": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_quote_update
+        AFTER UPDATE OF text, author_id ON quotes_quote
+        BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE} (rowid, text, author_name, author_lastname)
+            VALUES (new.id, new.text, {_AUTHOR_COLUMNS});
+        END
+    """,
+    f"{FTS_TABLE}_quote_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_quote_delete
+        AFTER DELETE ON quotes_quote
+        BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """,
+    f"{FTS_TABLE}_author_update": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_update
+        AFTER UPDATE OF name, lastname ON authors_author
+        BEGIN
+            UPDATE {FTS_TABLE}
+            SET author_name = new.name, author_lastname = new.lastname
+            WHERE rowid IN (
+                SELECT id FROM quotes_quote WHERE author_id = new.id
+            );
+        END
+    """,
+}
+
+
+def search_limit():
+    """How many search results are returned at most."""
+
+    return getattr(settings, "QUOTES_SEARCH_LIMIT", DEFAULT_SEARCH_LIMIT)
+
+
+class _Flight:  # pylint: disable=R0903
+    """A search that is running, for the identical ones to wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.ids = None
+
+
+class SearchResultCache:
+    """
+    A thread safe LRU cache of search results (lists of quote ids) that
+    runs identical concurrent misses only once (single-flight).
+
+    The entries are only valid for the versions they were searched at -
+    when get_or_search is called with other versions, everything goes.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.versions = None
+        # key -> tuple of ids, least recently used first
+        self.results = OrderedDict()
+        # (versions, key) -> the search running for it
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {"hit": 0, "miss": 0, "coalesced": 0}
+
+    def get_or_search(self, key, versions, search):
+        """
+        The cached results of the key, or search for them.
+
+        Args:
+            key (str): The normalized query.
+            versions (str): The versions of the searched data.
+            search (callable): Returns the ids when there are none cached.
+
+        Returns:
+            list: The quote ids.
+        """
+
+        with self.lock:
+            if versions != self.versions:
+                # quotes or authors changed since these were cached
+                self.results.clear()
+                self.versions = versions
+
+            ids = self.results.get(key)
+            if ids is not None:
+                self.results.move_to_end(key)
+                self.stats["hit"] += 1
+                return list(ids)
+
+            flight = self.flights.get((versions, key))
+            leading = flight is None
+            if leading:
+                flight = self.flights[(versions, key)] = _Flight()
+                self.stats["miss"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leading:
+            if flight.done.wait(FLIGHT_TIMEOUT) and flight.ids is not None:
+                return list(flight.ids)
+            # the search we waited for failed (or hangs), try on our own
+            return search()
+
+        try:
+            flight.ids = tuple(search())
+        finally:
+            flight.done.set()
+            with self.lock:
+                del self.flights[(versions, key)]
+                if flight.ids is not None and versions == self.versions:
+                    self._put(key, flight.ids)
+
+        return list(flight.ids)
+
+    def _put(self, key, ids):
+        """Remember the ids, evicting the least recently used ones."""
+
+        self.results[key] = ids
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def clear(self):
+        """Forget all the results."""
+
+        with self.lock:
+            self.results.clear()
+
+
+_result_cache = SearchResultCache(
+    getattr(settings, "QUOTES_SEARCH_CACHE_SIZE", DEFAULT_SEARCH_CACHE_SIZE)
+)
+
+
+def clear_search_cache():
+    """Forget the cached search results (of this process)."""
+
+    _result_cache.clear()
+
+
+def search_cache_stats():
+    """
+    The search result cache hits, misses and coalesced misses (waits for an
+    identical search) of this process, since it started.
+
+    Returns:
+        dict: {"hit": n, "miss": n, "coalesced": n, "size": n}.
+    """
+
+    with _result_cache.lock:
+        return {**_result_cache.stats, "size": len(_result_cache.results)}
+
+
+def fts_available():
+    """Check (once per database) if the full text index exists."""
+
+    if connection.vendor != "sqlite":
+        return False
+
+    database = connection.settings_dict["NAME"]
+    if database not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s",
+                [FTS_TABLE],
+            )
+            _fts_available[database] = cursor.fetchone() is not None
+
+    return _fts_available[database]
+
+
+def ensure_triggers():
+    """
+    Recreate the index triggers that are missing, and refill the index if
+    any were. SQLite drops a table's triggers when a migration makes Django
+    rebuild the table (e.g. when adding a NOT NULL column).
+
+    Returns:
+        list: Names of the recreated triggers.
+    """
+
+    if not fts_available():
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+
+    if missing:
+        logger.warning("Recreated full text index triggers: %s", missing)
+        rebuild_index()
+
+    return missing
+
+
+def match_expression(query):
+    """
+    Turn what the user typed into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("word"*), so half typed words
+    match too, and FTS5 syntax characters in the query can't break it.
+
+    Returns:
+        str: The expression, or "" when the query has no words at all.
+    """
+
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def normalize_query(query):
+    """
+    What decides the results of a query: its words, in lowercase (the index
+    is case insensitive). "Truth,  be told" and "truth be TOLD" are one.
+    """
+
+    return " ".join(WORD_RE.findall(query.lower()))
+
+
+def search_quote_ids(query, limit=None):
+    """
+    Search the quotes, through the result cache.
+
+    Args:
+        query (str): What the user typed.
+        limit (int): How many ids to return at most.
+
+    Returns:
+        list: Ids of the matching quotes, best matches first.
+    """
+
+    limit = limit or search_limit()
+
+    if fts_available():
+        key = f"fts.{limit}.{normalize_query(query)}"
+    else:
+        # icontains matches the query as it is, punctuation and all
+        key = f"icontains.{limit}.{query.lower()}"
+
+    return cached_search(key, lambda: _search(query, limit))
+
+
+def cached_search(key, search):
+    """
+    The results of a search, from the result cache if it has them.
+
+    Args:
+        key (str): What decides the results (the kind of search, the
+            normalized query, the limit).
+        search (callable): Returns the quote ids when they aren't cached.
+
+    Returns:
+        list: The quote ids.
+    """
+
+    if not _result_cache.max_size:
+        return search()
+
+    return _result_cache.get_or_search(
+        key, ag_cache_versions(("quotes", "authors")), search
+    )
+
+
+def _search(query, limit):
+    """Search the quotes in the database."""
+
+    if fts_available():
+        expression = match_expression(query)
+        if not expression:
+            return []
+        try:
+            return _fts_search(expression, limit)
+        except DatabaseError:
+            logger.exception("Full text search failed for %r", query)
+
+    return list(
+        Quote.objects.filter(text__icontains=query)
+        .order_by("date_created", "id")
+        .values_list("pk", flat=True)[:limit]
+    )
+
+
+def _fts_search(expression, limit):
+    """Run the MATCH query against the full text index."""
+
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+
+    # (a failed statement doesn't break the transaction on SQLite, so no
+    # savepoint is needed around it)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} "  # nosec B608
+            f"WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid "
+            f"LIMIT %s",
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def load_quotes(quote_ids):
+    """
+    Load the quotes by their ids (a page of search results).
+
+    Returns:
+        list: The quotes, in the same order as the ids.
+    """
+
+    quotes = Quote.objects.select_related("author").in_bulk(quote_ids)
+
+    return [quotes[pk] for pk in quote_ids if pk in quotes]
+
+
+def index_quotes_sql(where=""):
+    """The INSERT that indexes the quotes (matching where) in one go."""
+    # pylint: disable=protected-access
+
+    quotes_table = Quote._meta.db_table
+    authors_table = Quote._meta.get_field(
+        "author"
+    ).related_model._meta.db_table
+
+    return (
+        f"INSERT INTO {FTS_TABLE} "  # nosec B608
+        f"(rowid, text, author_name, author_lastname) "
+        f"SELECT quote.id, quote.text, "
+        f"COALESCE(author.name, ''), COALESCE(author.lastname, '') "
+        f"FROM {quotes_table} AS quote "
+        f"LEFT JOIN {authors_table} AS author "
+        f"ON author.id = quote.author_id {where}"
+    )
+
+
+@contextlib.contextmanager
+def deferred_indexing():
+    """
+    Index the quotes inserted in the block when it ends, with one INSERT ...
+    SELECT - not one by one by the insert trigger, which looks the author
+    up twice per quote. Twice as fast for a bulk insert of many quotes.
+
+    The insert trigger is dropped meanwhile, so the quotes other processes
+    insert then are indexed at the end too. If the process dies in the
+    block, the next migrate recreates the trigger and rebuilds the index
+    (see ensure_triggers).
+    """
+    # pylint: disable=protected-access
+
+    if not fts_available():
+        yield
+        return
+
+    trigger = f"{FTS_TABLE}_quote_insert"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COALESCE(MAX(id), 0) "  # nosec B608
+            f"FROM {Quote._meta.db_table}"
+        )
+        last_id = cursor.fetchone()[0]
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    try:
+        yield
+    finally:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(TRIGGERS[trigger])
+            cursor.execute(
+                index_quotes_sql(
+                    # the ones updated meanwhile are indexed already
+                    f"WHERE quote.id > %s AND quote.id NOT IN "
+                    f"(SELECT rowid FROM {FTS_TABLE} WHERE rowid > %s)"
+                ),
+                [last_id, last_id],
+            )
+        clear_search_cache()
+
+
+def rebuild_index():
+    """
+    Fill the full text index from scratch.
+
+    Returns:
+        int: The number of indexed quotes.
+
+    Raises:
+        RuntimeError: If this database has no full text index.
+    """
+
+    _fts_available.pop(connection.settings_dict["NAME"], None)
+    if not fts_available():
+        raise RuntimeError(
+            "This database has no full text index (needs SQLite with FTS5)"
+        )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")  # nosec B608
+        cursor.execute(index_quotes_sql())
+        indexed = cursor.rowcount
+
+    clear_search_cache()
+    logger.info("Full text index rebuilt with %s quotes", indexed)
+
+    return indexed
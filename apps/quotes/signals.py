@@ -0,0 +1,300 @@
+"""
+A module for the quotes app signals and their receivers.
+
+The receivers keep the data derived from quotes (random quote slots, quote
+counts, cached pages, ...) in sync with the quotes themselves. They are
+connected in QuotesConfig.ready().
+
+Bulk operations (bulk_create, queryset.update(), raw sql) don't send the
+model signals, so whoever does them must send quotes_bulk_changed instead:
+
+    quotes_bulk_changed.send(sender=Quote)
+
+It rebuilds what's cheap to rebuild. The trigram index isn't: the bulk
+operation indexes the quotes it inserted or changed itself, with
+fuzzy.index_quotes, when fuzzy.enabled().
+"""
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import Signal, receiver
+
+from ag_mixins import ag_bump_cache_versions
+from apps.authors.models import Author
+from apps.quotes import counters, fuzzy, sampling, search, suggest
+from apps.quotes.models import Quote, QuoteSlot, content_hash_of
+
+# sent after quotes were changed in bulk, behind the model signals' back
+quotes_bulk_changed = Signal()
+
+
+def loaded_value(instance, name, default=None):
+    """
+    The value a tracked quote field (Quote.TRACKED_FIELDS) had before the
+    save that is happening right now.
+    """
+
+    return getattr(instance, "_loaded_values", {}).get(name, default)
+
+
+@receiver(pre_save, sender=Quote)
+def quote_saving(sender, instance, **kwargs):
+    """
+    Make sure an existing quote knows its values as they are in the
+    database, so the post_save receivers can tell what changed.
+
+    Quotes loaded from the database already know them (see Quote.from_db).
+    """
+    # pylint: disable=unused-argument, protected-access
+
+    if instance.pk is None or kwargs.get("raw"):
+        return
+
+    loaded = getattr(instance, "_loaded_values", {})
+    missing = [name for name in Quote.TRACKED_FIELDS if name not in loaded]
+    if missing:
+        values = Quote.objects.filter(pk=instance.pk).values(*missing).first()
+        instance._loaded_values = {**loaded, **(values or {})}
+
+
+@receiver(post_save, sender=Quote)
+def quote_saved(sender, instance, created, **kwargs):
+    """Update the slots and counts after a quote was created or changed."""
+    # pylint: disable=unused-argument
+
+    if kwargs.get("raw"):
+        return
+
+    if created:
+        sampling.assign_slot(instance)
+        counters.change(total=1, active=int(instance.active))
+        counters.change_author(
+            instance.author_id, total=1, active=int(instance.active)
+        )
+        return
+
+    was_active = loaded_value(instance, "active", instance.active)
+    counters.change(active=int(instance.active) - int(was_active))
+
+    was_author_id = loaded_value(instance, "author_id", instance.author_id)
+    if was_author_id != instance.author_id:
+        # the quote moved from one author to another
+        counters.change_author(
+            was_author_id, total=-1, active=-int(was_active)
+        )
+        counters.change_author(
+            instance.author_id, total=1, active=int(instance.active)
+        )
+    else:
+        counters.change_author(
+            instance.author_id,
+            active=int(instance.active) - int(was_active),
+        )
+
+
+@receiver(post_delete, sender=Quote)
+def quote_deleted(sender, instance, **kwargs):
+    """Take a deleted quote out of the counts."""
+    # pylint: disable=unused-argument
+
+    counters.change(total=-1, active=-int(instance.active))
+    counters.change_author(
+        instance.author_id, total=-1, active=-int(instance.active)
+    )
+
+
+@receiver(post_delete, sender=QuoteSlot)
+def quote_slot_deleted(sender, instance, **kwargs):
+    """
+    A slot goes away together with its quote (on_delete=CASCADE), so the hole
+    it leaves behind must be filled.
+    """
+    # pylint: disable=unused-argument
+
+    sampling.fill_slot(instance.slot)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def quote_changed(sender, **kwargs):
+    """Pages showing quotes are out of date (see AgAnonymousCacheMixin)."""
+    # pylint: disable=unused-argument
+
+    ag_bump_cache_versions("quotes")
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def author_changed(sender, **kwargs):
+    """Pages showing authors are out of date (see AgAnonymousCacheMixin)."""
+    # pylint: disable=unused-argument
+
+    ag_bump_cache_versions("authors")
+
+
+@receiver(quotes_bulk_changed)
+def quotes_changed_in_bulk(sender, **kwargs):
+    """
+    Rebuild what's derived from quotes from scratch - but the trigram index
+    (see the module docstring).
+    """
+    # pylint: disable=unused-argument
+
+    sampling.rebuild_slots()
+    counters.repair()
+    counters.repair_authors()
+    transaction.on_commit(suggest.forget_index)
+    # imports create authors as well
+    ag_bump_cache_versions("quotes", "authors")
+
+
+@receiver(post_save, sender=Quote)
+def quote_words_saved(sender, instance, created, **kwargs):
+    """Put the words of a new or changed quote in the suggest index."""
+    # pylint: disable=unused-argument
+
+    if kwargs.get("raw"):
+        return
+
+    old_text = "" if created else loaded_value(instance, "text", "")
+    if old_text != instance.text:
+        removed = suggest.words_of(old_text)
+        added = suggest.words_of(instance.text)
+        transaction.on_commit(lambda: suggest.changed(removed, added))
+
+
+@receiver(post_save, sender=Quote)
+def quote_trigrams_saved(sender, instance, created, **kwargs):
+    """Index the trigrams of a new or changed quote (see quotes.fuzzy)."""
+    # pylint: disable=unused-argument
+
+    if kwargs.get("raw") or not fuzzy.enabled():
+        return
+
+    if created or loaded_value(instance, "text") != instance.text:
+        fuzzy.index_quote(instance)
+
+
+@receiver(post_delete, sender=Quote)
+def quote_words_deleted(sender, instance, **kwargs):
+    """Take the words of a deleted quote out of the suggest index."""
+    # pylint: disable=unused-argument
+
+    removed = suggest.words_of(instance.text)
+    transaction.on_commit(lambda: suggest.changed(removed=removed))
+
+
+@receiver(pre_save, sender=Author)
+def author_saving(sender, instance, **kwargs):
+    """Remember the words of the author's name as it is in the database."""
+    # pylint: disable=unused-argument, protected-access
+
+    instance._loaded_words = set()
+    if instance.pk is not None and not kwargs.get("raw"):
+        names = (
+            Author.objects.filter(pk=instance.pk)
+            .values_list("name", "lastname")
+            .first()
+        )
+        if names is not None:
+            instance._loaded_words = suggest.author_words(*names)
+
+
+@receiver(post_save, sender=Author)
+def author_words_saved(sender, instance, **kwargs):
+    """Put the words of a new or renamed author in the suggest index."""
+    # pylint: disable=unused-argument
+
+    if kwargs.get("raw"):
+        return
+
+    removed = getattr(instance, "_loaded_words", set())
+    added = suggest.author_words(instance.name, instance.lastname)
+    if removed != added:
+        transaction.on_commit(lambda: suggest.changed(removed, added))
+
+
+@receiver(post_delete, sender=Author)
+def author_words_deleted(sender, instance, **kwargs):
+    """Take the words of a deleted author out of the suggest index."""
+    # pylint: disable=unused-argument
+
+    removed = suggest.author_words(instance.name, instance.lastname)
+    transaction.on_commit(lambda: suggest.changed(removed=removed))
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    """A renamed author changes the content hashes of their quotes."""
+    # pylint: disable=unused-argument
+
+    if not created and not kwargs.get("raw"):
+        refresh_content_hashes(instance.quotes.all())
+
+
+@receiver(pre_delete, sender=Author)
+def author_deleting(sender, instance, **kwargs):
+    """Remember the author's quotes, they lose the author (SET_NULL)."""
+    # pylint: disable=unused-argument, protected-access
+
+    instance._quote_ids = list(instance.quotes.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    """The quotes of a deleted author are now quotes without an author."""
+    # pylint: disable=unused-argument
+
+    quote_ids = getattr(instance, "_quote_ids", [])
+    if quote_ids:
+        refresh_content_hashes(Quote.objects.filter(pk__in=quote_ids))
+
+
+def refresh_content_hashes(quotes):
+    """
+    Recompute the content hashes of the quotes (after their author changed).
+
+    A quote that becomes a duplicate of another one is left without a hash,
+    like the duplicates that existed before hashes did.
+    """
+
+    quotes = list(quotes.select_related("author"))
+    taken = set()
+    for quote in quotes:
+        author_name = quote.author.full_name if quote.author else ""
+        quote.content_hash = content_hash_of(quote.text, author_name)
+        if quote.content_hash in taken:
+            quote.content_hash = None
+        taken.add(quote.content_hash)
+
+    duplicates = set(
+        Quote.objects.filter(content_hash__in=taken)
+        .exclude(pk__in=[quote.pk for quote in quotes])
+        .values_list("content_hash", flat=True)
+    )
+    for quote in quotes:
+        if quote.content_hash in duplicates:
+            quote.content_hash = None
+
+    # clear the hashes first, so swapping hashes between quotes can't break
+    # the unique constraint half way through
+    Quote.objects.filter(pk__in=[quote.pk for quote in quotes]).update(
+        content_hash=None
+    )
+    Quote.objects.bulk_update(quotes, ["content_hash"], batch_size=1000)
+
+
+def quotes_migrated(sender, using, **kwargs):
+    """
+    Migrations may have rebuilt the quote or author table, dropping the full
+    text index triggers with it. Connected in QuotesConfig.ready().
+    """
+    # pylint: disable=unused-argument
+
+    if using == DEFAULT_DB_ALIAS:
+        search.ensure_triggers()
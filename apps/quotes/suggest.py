@@ -0,0 +1,332 @@
+"""
+A module for the search box autocomplete (see QuoteSuggestView).
+
+The words of all the quotes and the author names and lastnames are kept in
+memory, in a prefix index (see PrefixIndex): a sorted list of the words, so
+the words with a prefix are a slice of it found with two binary searches,
+and how many quotes (and authors) have each word. A completion is the most
+common words of the prefix's slice - the short prefixes (with the longest
+slices) have theirs remembered.
+
+The index is built on the first suggestion (a pass over the quote and author
+tables) and then kept up to date by the quote and author signals, once the
+changes are committed. Bulk changes (imports) make it build again, and so
+does its age (QUOTES_SUGGEST_MAX_AGE) - other processes' changes only reach
+this one's index that way.
+
+Words are lowercased and stripped of diacritics, like the full text index
+does. The index holds at most QUOTES_SUGGEST_MAX_WORDS words (the most
+common ones), its size is logged when it's built (see suggest_index_stats).
+"""
+
+import bisect
+import heapq
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+
+from apps.authors.models import Author
+from apps.quotes.models import Quote
+from apps.quotes.search import WORD_RE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+
+# the most completions ever returned (and remembered) for a prefix
+MAX_LIMIT = 20
+
+# shorter words are not worth suggesting
+MIN_WORD_LENGTH = 3
+
+# the completions of prefixes up to this long are remembered
+SHORT_PREFIX_LENGTH = 2
+
+DEFAULT_MAX_WORDS = 100_000
+
+# how old (in seconds) the index gets before it is built again
+DEFAULT_MAX_AGE = 60 * 60
+
+
+def normalize(text):
+    """The text in lowercase, without diacritics ("Ilusión" -> "ilusion")."""
+
+    return "".join(
+        character
+        for character in unicodedata.normalize("NFKD", text.lower())
+        if not unicodedata.combining(character)
+    )
+
+
+def words_of(text):
+    """
+    The distinct words of a text worth suggesting, as they are indexed.
+
+    Returns:
+        set: The normalized words.
+    """
+
+    if not text:
+        return set()
+    return {
+        word
+        for word in WORD_RE.findall(normalize(text))
+        if len(word) >= MIN_WORD_LENGTH and not word.isdigit()
+    }
+
+
+def author_words(name, lastname):
+    """The words of an author's name and lastname."""
+
+    return words_of(name) | words_of(lastname)
+
+
+class PrefixIndex:
+    """
+    Words and how many times they occur, sorted, for prefix completion.
+
+    Thread safe: the changes and the completions take the lock.
+    """
+
+    def __init__(self, counts, max_words=DEFAULT_MAX_WORDS):
+        self.max_words = max_words
+        if len(counts) > max_words:
+            counts = dict(Counter(counts).most_common(max_words))
+        self.counts = dict(counts)
+        self.words = sorted(self.counts)
+        # short prefix -> its completions
+        self.completions = {}
+        self.lock = threading.Lock()
+
+    def add(self, words):
+        """Count the words once more."""
+
+        with self.lock:
+            for word in words:
+                if word in self.counts:
+                    self.counts[word] += 1
+                elif len(self.words) < self.max_words:
+                    self.counts[word] = 1
+                    bisect.insort(self.words, word)
+                else:
+                    continue
+                self._forget_completions(word)
+
+    def remove(self, words):
+        """Count the words once less, dropping the ones gone for good."""
+
+        with self.lock:
+            for word in words:
+                count = self.counts.get(word)
+                if count is None:
+                    continue
+                if count > 1:
+                    self.counts[word] = count - 1
+                else:
+                    del self.counts[word]
+                    del self.words[bisect.bisect_left(self.words, word)]
+                self._forget_completions(word)
+
+    def _forget_completions(self, word):
+        """The remembered completions of the word's prefixes are outdated."""
+
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            self.completions.pop(word[:length], None)
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        The most common words that start with the prefix.
+
+        Args:
+            prefix (str): A normalized prefix (see words_of).
+            limit (int): How many words to return, at most MAX_LIMIT.
+
+        Returns:
+            list: The words, most common first (then alphabetically).
+        """
+
+        if not prefix:
+            return []
+
+        with self.lock:
+            completions = self.completions.get(prefix)
+            if completions is None:
+                start = bisect.bisect_left(self.words, prefix)
+                # every word with the prefix sorts before prefix + U+10FFFF
+                end = bisect.bisect_left(
+                    self.words, prefix + chr(sys.maxunicode), start
+                )
+                completions = heapq.nsmallest(
+                    MAX_LIMIT,
+                    self.words[start:end],
+                    key=lambda word: (-self.counts[word], word),
+                )
+                if len(prefix) <= SHORT_PREFIX_LENGTH:
+                    self.completions[prefix] = completions
+
+        return completions[:limit]
+
+    def memory_bytes(self):
+        """About how much memory the index takes (words, counts, lists)."""
+
+        with self.lock:
+            # the words are shared by the list and the dict keys, and
+            # the counts are mostly small ints python caches anyway
+            return (
+                sys.getsizeof(self.words)
+                + sys.getsizeof(self.counts)
+                + sum(sys.getsizeof(word) for word in self.words)
+                + sum(
+                    sys.getsizeof(words) for words in self.completions.values()
+                )
+            )
+
+
+_index = {"index": None, "built": 0.0, "seconds": 0.0}
+_index_lock = threading.Lock()
+# held by the thread that builds the index (see get_index)
+_build_lock = threading.Lock()
+
+
+def build_index():
+    """
+    Build the prefix index from the quotes and authors in the database.
+
+    Returns:
+        PrefixIndex: The new index (also the one used from now on).
+    """
+
+    started = time.perf_counter()
+    counts = Counter()
+    for text in Quote.objects.values_list("text", flat=True).iterator(
+        chunk_size=2000
+    ):
+        counts.update(words_of(text))
+    for name, lastname in Author.objects.values_list("name", "lastname"):
+        counts.update(author_words(name, lastname))
+
+    index = PrefixIndex(
+        counts,
+        max_words=getattr(
+            settings, "QUOTES_SUGGEST_MAX_WORDS", DEFAULT_MAX_WORDS
+        ),
+    )
+
+    with _index_lock:
+        _index["index"] = index
+        _index["built"] = time.monotonic()
+        _index["seconds"] = time.perf_counter() - started
+
+    logger.info(
+        "Suggest index built: %s words (of %s), %.1f MiB in %.2fs",
+        len(index.words),
+        len(counts),
+        index.memory_bytes() / 2**20,
+        _index["seconds"],
+    )
+    return index
+
+
+def get_index():
+    """
+    The prefix index, built if there is none or it got too old.
+
+    Only one thread builds it at a time: while there is none, the others
+    wait for it, and while it's only too old, they keep using the old one.
+    """
+
+    max_age = getattr(settings, "QUOTES_SUGGEST_MAX_AGE", DEFAULT_MAX_AGE)
+    with _index_lock:
+        index = _index["index"]
+        if index is not None and time.monotonic() - _index["built"] < max_age:
+            return index
+
+    # without an index, wait for the thread that builds it
+    if not _build_lock.acquire(  # pylint: disable=consider-using-with
+        blocking=index is None
+    ):
+        # another thread is building the new one
+        return index
+    try:
+        with _index_lock:
+            index = _index["index"]
+            if (
+                index is not None
+                and time.monotonic() - _index["built"] < max_age
+            ):
+                # built by the thread this one waited for
+                return index
+        return build_index()
+    finally:
+        _build_lock.release()
+
+
+def forget_index():
+    """Drop the index, the next suggestion builds it again."""
+
+    with _index_lock:
+        _index["index"] = None
+
+
+def changed(removed=(), added=()):
+    """
+    Apply a committed change of words to the index (if there is one yet -
+    otherwise it will be built with them).
+
+    Args:
+        removed (iterable): The words that are gone (the old text).
+        added (iterable): The words that came (the new text).
+    """
+
+    with _index_lock:
+        index = _index["index"]
+    if index is None:
+        return
+    # a word in both didn't change
+    removed, added = set(removed), set(added)
+    index.remove(removed - added)
+    index.add(added - removed)
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    """
+    Complete the last word of what the user typed.
+
+    Args:
+        prefix (str): What the user typed.
+        limit (int): How many completions to return at most.
+
+    Returns:
+        list: The completions of the last (started) word, most common first.
+    """
+
+    started = WORD_RE.findall(normalize(prefix))
+    if not started:
+        return []
+    return get_index().complete(started[-1], limit)
+
+
+def suggest_index_stats():
+    """
+    The size of this process's index.
+
+    Returns:
+        dict: "words", "memory_bytes", "build_seconds" (None for all when
+        the index isn't built).
+    """
+
+    with _index_lock:
+        index = _index["index"]
+        build_seconds = _index["seconds"]
+    if index is None:
+        return {"words": None, "memory_bytes": None, "build_seconds": None}
+    return {
+        "words": len(index.words),
+        "memory_bytes": index.memory_bytes(),
+        "build_seconds": build_seconds,
+    }
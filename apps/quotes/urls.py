@@ -6,12 +6,16 @@ from apps.quotes.views import (
     QuoteCreateView,
     QuoteDeleteView,
     QuoteDetailView,
+    QuoteExportView,
+    QuoteListPageView,
     QuoteListView,
+    QuoteSuggestView,
     QuoteUpdateView,
 )
 
 urlpatterns = [
     path("list", QuoteListView.as_view(), name="quote-list"),
+    path("list/page", QuoteListPageView.as_view(), name="quote-list-page"),
     path("detail/<int:pk>", QuoteDetailView.as_view(), name="quote-detail"),
     path("create/", QuoteCreateView.as_view(), name="quote-create"),
     path(
@@ -24,4 +28,6 @@ urlpatterns = [
         QuoteUpdateView.as_view(),
         name="quote-update",
     ),
+    path("export", QuoteExportView.as_view(), name="quote-export"),
+    path("suggest", QuoteSuggestView.as_view(), name="quote-suggest"),
 ]
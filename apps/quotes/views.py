@@ -3,35 +3,64 @@
 import logging
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import HttpResponseRedirect
+from django.core.exceptions import BadRequest
+from django.http import (
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.views import View
 
-from ag_mixins import AgObjectRetrievalMixin
+from ag_mixins import (
+    AgAnonymousCacheMixin,
+    AgKeysetPaginationMixin,
+    AgObjectRetrievalMixin,
+    AgQueryBudgetMixin,
+)
+from apps.quotes.exporting import QuoteExport, parse_since
 from apps.quotes.forms import QuoteForm
+from apps.quotes.fragments import render_items
+from apps.quotes.fuzzy import fuzzy_quote_ids
 from apps.quotes.models import Quote
+from apps.quotes.query import QueryError, parse_query, query_quote_ids
+from apps.quotes.search import load_quotes
+from apps.quotes.suggest import DEFAULT_LIMIT, MAX_LIMIT, suggest
 
 
 logger = logging.getLogger(__name__)
 
 
-class QuoteListView(View):
+class QuoteListView(
+    AgAnonymousCacheMixin, AgQueryBudgetMixin, AgKeysetPaginationMixin, View
+):
     """
     gCVB example:
 
     class QuoteListView(ListView):
         model = Quote
         template_name = "quotes/quote_list.html" # default
+
+    Only the first page of quotes is rendered, the next ones are appended by
+    HTMX (from QuoteListPageView) when the last list item is scrolled into
+    view.
     """
 
     template_name = "quotes/quote_list.html"
     partial_template_name = "quotes/partials/quote_list_partial.html"
+    # session + user + search (+ the authors of author:, or the 2 of the
+    # fuzzy search when nothing matched) + the page of quotes (with authors)
+    query_budget = 6
+    # the quotes and their authors' names
+    cache_namespaces = ("quotes", "authors")
 
     def get(self, request):
         """What happens to this view when get request knocks on the door.
 
-        On get request - no parameters are being passed, render all quotes
+        On get request - no parameters are being passed, render the first
+        page of quotes
 
         """
 
@@ -41,33 +70,108 @@ class QuoteListView(View):
             request.user.username,
         )
 
-        quotes = Quote.objects.all()
-
-        return render(request, self.template_name, {"object_list": quotes})
+        return render(request, self.template_name, self.get_page_context())
 
     def post(self, request):
         """What happens to this view when POST request knocks on the door.
 
-        On post request (HTMX requires for search to have a POST request), we
-        check if the query parameter q was passed, if yes - render a partial
-        template that contains the quotes that match the query.
+        On post request, we check if the query parameter q was passed, if
+        yes - render a partial template that contains the quotes that match
+        the query. The search box now GETs QuoteListPageView instead (GETs
+        can be cached), this stays for the clients that still POST.
+
+        The search itself is done by apps.quotes.search (a full text index,
+        best matches first), the query can have fields like author:Huxley
+        (see apps.quotes.query). When a plain query finds nothing, the
+        quotes with words like the query's are shown instead (see
+        apps.quotes.fuzzy).
         """
 
         query = request.POST.get("q")
 
+        return render(
+            request,
+            self.partial_template_name,
+            self.get_page_context(query=query),
+        )
+
+    def get_page_context(self, cursor=None, query=None):
+        """
+        Get one page of quotes - of all of them (ordered by date_created, id)
+        or of the search results (best matches first), if there is a query.
+
+        Args:
+            cursor (str): The token of the page, None for the first page.
+            query (str): The search query, if searching.
+
+        Returns:
+            dict: Context with the quotes and the url of the next page.
+        """
+
+        close_matches = False
+        query_error = None
         if query:
-            # If there's a search query, filter quotes accordingly
-            quotes = Quote.objects.filter(text__icontains=query)
+            # If there's a search query, page through the matching quotes
+            try:
+                parsed = parse_query(query)
+                quote_ids = query_quote_ids(parsed)
+            except QueryError as error:
+                parsed = None
+                quote_ids = []
+                query_error = str(error)
+            if not quote_ids and parsed is not None and parsed.is_plain:
+                # nothing matches exactly, maybe it's a typo
+                quote_ids = fuzzy_quote_ids(query)
+                close_matches = bool(quote_ids)
+            quote_ids, next_cursor = self.ag_get_list_page(quote_ids, cursor)
+            quotes = load_quotes(quote_ids)
         else:
-            # If no search query, list all quotes
-            quotes = Quote.objects.all()
+            # If no search query, page through all quotes
+            quotes, next_cursor = self.ag_get_keyset_page(
+                Quote.objects.select_related("author"), cursor
+            )
 
-        return render(
-            request, self.partial_template_name, {"object_list": quotes}
+        next_page_url = None
+        if next_cursor:
+            parameters = {"cursor": next_cursor}
+            if query:
+                parameters["q"] = query
+            next_page_url = (
+                f"{reverse('quote-list-page')}?{urlencode(parameters)}"
+            )
+
+        return {
+            "object_list": quotes,
+            # the rendered list items, mostly from the cache
+            "quote_items": render_items(quotes),
+            "next_page_url": next_page_url,
+            # say so above the first page of fuzzy results
+            "close_matches": close_matches and not cursor,
+            "query_error": query_error,
+        }
+
+
+class QuoteListPageView(QuoteListView):
+    """
+    The next page of quote list items, for the HTMX infinite scroll of
+    QuoteListView (both the full list and the search results).
+    """
+
+    http_method_names = ["get"]
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        context = self.get_page_context(
+            cursor=request.GET.get("cursor"), query=request.GET.get("q")
         )
 
+        return render(request, self.partial_template_name, context)
+
 
-class QuoteDetailView(AgObjectRetrievalMixin, View):
+class QuoteDetailView(
+    AgAnonymousCacheMixin, AgQueryBudgetMixin, AgObjectRetrievalMixin, View
+):
     """
     gCVB example:
 
@@ -77,11 +181,16 @@ class QuoteDetailView(AgObjectRetrievalMixin, View):
     """
 
     template_name = "quotes/quote_detail.html"
+    # session + user + the quote (with its author)
+    query_budget = 3
+    cache_namespaces = ("quotes", "authors")
 
     def get(self, request, pk):
         """What happens to this view when get request knocks on the door."""
 
-        quote = self.ag_get_object_by_id(Quote, pk)
+        quote = self.ag_get_object_by_id(
+            Quote.objects.select_related("author"), pk
+        )
 
         logger.info(
             "%s view of quote (ID: %s) accessed by user: %s",
@@ -244,7 +353,7 @@ class QuoteUpdateView(
     def post(self, request, pk):
         """What happens to this view when post request knocks on the door."""
         quote = self.ag_get_object_by_id(Quote, pk)
-        form = self.form_class(request.POST)
+        form = self.form_class(request.POST, instance_pk=quote.pk)
 
         if form.is_valid():
             quote.text = form.cleaned_data["text"]
@@ -259,3 +368,79 @@ class QuoteUpdateView(
             return HttpResponseRedirect(self.success_url)
 
         return render(request, self.template_name, {"form": form})
+
+
+class QuoteExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Download all the quotes (see apps.quotes.exporting), streamed - the
+    response is written while the quotes are read, never held in memory.
+
+    GET parameters:
+        format: ndjson (default), csv or json.
+        since: only the quotes created on or after this ISO date (and time).
+        gzip: 1 to download a gzipped file.
+    """
+
+    def test_func(self):
+        """Checks if the user is a superuser."""
+        return self.request.user.is_superuser
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        since = request.GET.get("since")
+        try:
+            export = QuoteExport(
+                request.GET.get("format", "ndjson"),
+                since=parse_since(since) if since else None,
+            )
+        except ValueError as error:
+            raise BadRequest(error) from error
+        compress = request.GET.get("gzip") == "1"
+
+        logger.info(
+            "Quotes exported as %s by user: %s",
+            export.format,
+            request.user.username,
+        )
+
+        filename = export.filename
+        content_type = export.content_type
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+
+        response = StreamingHttpResponse(
+            export.iter_bytes(compress=compress), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class QuoteSuggestView(AgQueryBudgetMixin, View):
+    """
+    Completions of the word being typed in the search box, from the words
+    of the quotes and the author names (see apps.quotes.suggest).
+
+    GET parameters:
+        prefix: what was typed so far, the last word is completed.
+        limit: how many completions (10 by default, 20 at most).
+    """
+
+    # none - suggestions come from memory, but the (rare) index builds read
+    # the whole quote and author tables
+    query_budget = None
+
+    def get(self, request):
+        """What happens to this view when get request knocks on the door."""
+
+        prefix = request.GET.get("prefix", "")
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+        except ValueError as error:
+            raise BadRequest("limit must be a number") from error
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        return JsonResponse(
+            {"prefix": prefix, "suggestions": suggest(prefix, limit)}
+        )
@@ -0,0 +1,127 @@
+"""
+Benchmarks for the quotes project.
+
+Run them as modules from the project root, e.g.:
+
+    python -m benchmarks.random_quote --sizes 10000 100000 1000000
+
+Every benchmark works on a throwaway test database (see bench_database), so
+the real db.sqlite3 is never touched.
+"""
+
+# pylint: disable=import-outside-toplevel
+# (django can only be imported after setup_django() was called)
+
+import contextlib
+import os
+import statistics
+import time
+
+
+def setup_django():
+    """Configure django, so the benchmarks can use the ORM."""
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    # settings.py reads it from .env, which may not exist on this machine
+    os.environ.setdefault("SECRET_KEY", "benchmarks-only-secret-key")
+
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def bench_database():
+    """
+    Create a fresh, migrated test database for the duration of the block and
+    destroy it afterwards.
+
+    Yields:
+        DatabaseWrapper: The connection pointing to the test database.
+    """
+
+    from django.db import connection
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed_quotes(count, authors=1000, batch_size=5000):
+    """
+    Add synthetic quotes (and the authors for them) to the database, see
+    apps.quotes.generating. Their trigrams are not indexed (it takes ten
+    times longer), the fuzzy search doesn't find them.
+
+    Args:
+        count (int): How many quotes to add.
+        authors (int): How many authors to spread the quotes over.
+        batch_size (int): How many rows to insert per query.
+    """
+
+    from apps.authors.models import Author
+    from apps.quotes.generating import QuoteGenerator, write_to_database
+    from apps.quotes.models import Quote
+
+    # seeded by the quotes already there: the benchmarks seed in steps, and
+    # the same seed would generate the same (duplicate) quotes again
+    generator = QuoteGenerator(Quote.objects.count(), authors=authors)
+
+    author_ids = list(
+        Author.objects.order_by("pk").values_list("pk", flat=True)[:authors]
+    )
+    if len(author_ids) < authors:
+        author_ids += [
+            author.pk
+            for author in Author.objects.bulk_create(
+                Author(name=name, lastname=lastname)
+                for name, lastname in generator.author_names()[
+                    len(author_ids) :
+                ]
+            )
+        ]
+
+    write_to_database(
+        generator, count, batch_size, author_ids, index_trigrams=False
+    )
+
+
+def seeded_sizes(sizes):
+    """
+    Seed the database up to each of the sizes in turn, smallest first (see
+    seed_quotes).
+
+    Yields:
+        int: The number of quotes it was just seeded to.
+    """
+
+    seeded = 0
+    for size in sorted(sizes):
+        seed_quotes(size - seeded)
+        seeded = size
+        yield size
+
+
+def measure(func, repeat):
+    """
+    Call func repeat times.
+
+    Returns:
+        dict: The median, mean and max call duration, in milliseconds.
+    """
+
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "median_ms": statistics.median(durations),
+        "mean_ms": statistics.mean(durations),
+        "max_ms": max(durations),
+    }
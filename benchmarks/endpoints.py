@@ -0,0 +1,521 @@
+"""
+Load and latency of the public endpoints - the index, the random quote,
+the quote list (its page, a search GET and the search POST), a quote, the
+author list and an author - at every database size, driven:
+
+- inprocess: through django.test.Client (the whole middleware stack, no
+  server),
+- wsgi: over HTTP, from a threaded wsgiref server running
+  project.wsgi.application,
+- asgi: by calling project.asgi.application with the ASGI protocol's
+  messages, from asyncio tasks.
+
+with every --concurrency (threads, or tasks for asgi). Reported are the
+p50/p95/p99 latency, the throughput, the database queries per request (the
+request metrics count them, see apps.metrics) and the process's peak RSS.
+
+    python -m benchmarks.endpoints --sizes 1000 100000 1000000 \\
+        --concurrency 1 8 --baseline bench_results/before.json
+
+The results are saved as JSON (--output, bench_results/ by default). With
+--baseline they're compared to an earlier run's: a p95 or a throughput
+worse by more than --tolerance percent is a regression, and the run exits
+with 1.
+
+The requests are drawn from --seed, so two runs send the same ones. The
+database is a file (like sqlite_concurrency's), seeded up to every size in
+turn. Anonymous pages are cached (see AgAnonymousCacheMixin) - the quotes,
+authors and searches are picked at random, so the cache sees a mix of hits
+and misses.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+import asyncio
+import datetime
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import socketserver
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from benchmarks import bench_database, seeded_sizes, setup_django
+
+MODES = ("inprocess", "wsgi", "asgi")
+
+ENDPOINTS = (
+    "index",
+    "random-quote",
+    "quote-list",
+    "quote-search",
+    "quote-search-post",
+    "quote-detail",
+    "author-list",
+    "author-detail",
+)
+
+# an unmasked CSRF secret, sent as the cookie and the header, so the search
+# POST passes the CSRF check in every mode
+CSRF_TOKEN = "b" * 32
+
+HEADERS = {
+    "Host": "testserver",
+    "Cookie": f"csrftoken={CSRF_TOKEN}",
+    "X-CSRFToken": CSRF_TOKEN,
+}
+
+
+def main():
+    """Seed up to every size, drive every endpoint in every mode."""
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument(
+        "--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="the JSON file to save to")
+    parser.add_argument("--baseline", help="a JSON file to compare to")
+    parser.add_argument("--tolerance", type=float, default=10.0)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection
+
+    # no query logging (DEBUG), the metrics of this process only
+    settings.DEBUG = False
+    settings.METRICS_DIR = None
+    settings.ALLOWED_HOSTS = ["testserver", "localhost", "127.0.0.1"]
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            directory, "bench.sqlite3"
+        )
+        with bench_database():
+            for size in seeded_sizes(args.sizes):
+                connection.close()
+                results.extend(run_size(size, args))
+
+    output = save(results, args)
+    print(f"Saved to {output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+def run_size(size, args):
+    """Drive every endpoint, in every mode and concurrency, at a size."""
+
+    print(
+        f"\n{size} quotes\n{'mode':>10} {'endpoint':>18} {'conc':>5} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} "
+        f"{'queries':>8} {'errors':>7} {'RSS MiB':>8}"
+    )
+    pick = picker(random.Random(f"{args.seed}.{size}"))
+    results = []
+    for mode in args.modes:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                requests = [pick(endpoint) for _ in range(args.requests)]
+                warmup = [pick(endpoint) for _ in range(args.warmup)]
+                result = {
+                    "size": size,
+                    "mode": mode,
+                    "endpoint": endpoint,
+                    "concurrency": concurrency,
+                    **drive(mode, requests, warmup, concurrency),
+                }
+                results.append(result)
+                print(
+                    f"{mode:>10} {endpoint:>18} {concurrency:>5} "
+                    f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                    f"{result['p99_ms']:>8.2f} "
+                    f"{result['throughput_rps']:>8.0f} "
+                    f"{result['queries_per_request']:>8.2f} "
+                    f"{result['errors']:>7} {result['peak_rss_mib']:>8.0f}"
+                )
+    return results
+
+
+def picker(rng):
+    """
+    A function that picks a request to an endpoint (the same ones for the
+    same rng seed).
+
+    Returns:
+        function: endpoint -> (method, path, query string, form body).
+    """
+
+    from django.db.models import Max, Min
+    from django.urls import reverse
+
+    from apps.authors.models import Author
+    from apps.quotes.models import Quote
+    from apps.quotes.suggest import words_of
+
+    # the seeded ids have no gaps, and a list of a million of them would
+    # count in the peak RSS
+    quote_ids = Quote.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    author_ids = Author.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    words = sorted(
+        {
+            word
+            for text in Quote.objects.filter(
+                pk__in=[
+                    rng.randint(quote_ids["low"], quote_ids["high"])
+                    for _ in range(200)
+                ]
+            ).values_list("text", flat=True)
+            for word in words_of(text)
+        }
+    )
+
+    def pick(endpoint):
+        if endpoint == "quote-detail":
+            pk = rng.randint(quote_ids["low"], quote_ids["high"])
+            return "GET", reverse(endpoint, args=[pk]), "", ""
+        if endpoint == "author-detail":
+            pk = rng.randint(author_ids["low"], author_ids["high"])
+            return "GET", reverse(endpoint, args=[pk]), "", ""
+        if endpoint == "quote-search":
+            query = urlencode({"q": rng.choice(words)})
+            return "GET", reverse("quote-list-page"), query, ""
+        if endpoint == "quote-search-post":
+            body = urlencode({"q": rng.choice(words)})
+            return "POST", reverse("quote-list"), "", body
+        return "GET", reverse(endpoint), "", ""
+
+    return pick
+
+
+def drive(mode, requests, warmup, concurrency):
+    """
+    Send the requests (after the warmup ones) in a mode.
+
+    Returns:
+        dict: The latency percentiles, the throughput, the queries per
+            request, the errors and the peak RSS.
+    """
+
+    from django.db import connections
+
+    from apps.metrics import collector
+
+    send = {"inprocess": inprocess, "wsgi": over_wsgi, "asgi": over_asgi}[mode]
+    send(warmup, concurrency)
+    collector.reset()
+
+    started = time.perf_counter()
+    timings = send(requests, concurrency)
+    seconds = time.perf_counter() - started
+    connections.close_all()
+
+    totals = [totals for _, _, totals in collector.collect()["requests"]]
+    counted = sum(total[collector.COUNT] for total in totals)
+    queries = sum(total[collector.QUERIES] for total in totals)
+
+    latencies = sorted(latency for latency, _ in timings)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(timings),
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": len(timings) / seconds,
+        "queries_per_request": queries / counted if counted else 0.0,
+        "errors": sum(1 for _, status in timings if status >= 400),
+        # KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / 1024,
+    }
+
+
+def in_threads(requests, concurrency, worker):
+    """
+    Split the requests between threads, each sending its share with the
+    worker.
+
+    Returns:
+        list: (seconds, status) of every request.
+    """
+
+    from django.db import connection
+
+    timings = []
+    lock = threading.Lock()
+
+    def run(share):
+        done = worker(share)
+        connection.close()
+        with lock:
+            timings.extend(done)
+
+    threads = [
+        threading.Thread(target=run, args=(requests[number::concurrency],))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings
+
+
+def inprocess(requests, concurrency):
+    """Send the requests through django.test.Client, from threads."""
+
+    from django.test import Client
+
+    def worker(share):
+        client = Client()
+        client.cookies["csrftoken"] = CSRF_TOKEN
+        done = []
+        for method, path, query, body in share:
+            started = time.perf_counter()
+            response = client.generic(
+                method,
+                f"{path}?{query}" if query else path,
+                body,
+                content_type="application/x-www-form-urlencoded",
+                headers={"X-CSRFToken": CSRF_TOKEN},
+            )
+            done.append((time.perf_counter() - started, response.status_code))
+        return done
+
+    return in_threads(requests, concurrency, worker)
+
+
+class QuietHandler(WSGIRequestHandler):
+    """A request handler that doesn't print every request."""
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        pass
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """A wsgiref server with a thread per request."""
+
+    daemon_threads = True
+
+
+def over_wsgi(requests, concurrency):
+    """Send the requests over HTTP to a wsgiref server, from threads."""
+
+    from project.wsgi import application
+
+    server = make_server(
+        "127.0.0.1",
+        0,
+        application,
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietHandler,
+    )
+    server.request_queue_size = 128
+    port = server.server_address[1]
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+
+    def worker(share):
+        done = []
+        for method, path, query, body in share:
+            started = time.perf_counter()
+            # wsgiref speaks HTTP/1.0, a connection per request
+            http_connection = http.client.HTTPConnection("127.0.0.1", port)
+            http_connection.request(
+                method,
+                f"{path}?{query}" if query else path,
+                body=body or None,
+                headers={
+                    **HEADERS,
+                    "Content-Type": "application/x-www-form-urlencoded",
+                },
+            )
+            response = http_connection.getresponse()
+            response.read()
+            http_connection.close()
+            done.append((time.perf_counter() - started, response.status))
+        return done
+
+    try:
+        return in_threads(requests, concurrency, worker)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def over_asgi(requests, concurrency):
+    """Call the ASGI application with the requests, from asyncio tasks."""
+
+    from project.asgi import application
+
+    headers = [
+        (name.lower().encode(), value.encode())
+        for name, value in {
+            **HEADERS,
+            "Content-Type": "application/x-www-form-urlencoded",
+        }.items()
+    ]
+
+    async def send_one(method, path, query, body):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        messages = [
+            {"type": "http.request", "body": body.encode(), "more_body": False}
+        ]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # no disconnect, django stops waiting when it has responded
+            await asyncio.Event().wait()
+            return None
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await application(scope, receive, send)
+        return status[0]
+
+    async def worker(share, done):
+        for request in share:
+            started = time.perf_counter()
+            status = await send_one(*request)
+            done.append((time.perf_counter() - started, status))
+
+    async def run_all():
+        done = []
+        await asyncio.gather(
+            *(
+                worker(requests[number::concurrency], done)
+                for number in range(concurrency)
+            )
+        )
+        return done
+
+    return asyncio.run(run_all())
+
+
+def save(results, args):
+    """
+    Save the results, with what they ran on.
+
+    Returns:
+        Path: The file.
+    """
+
+    import django
+
+    output = Path(
+        args.output
+        or f"bench_results/endpoints-"
+        f"{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "meta": {
+                    "time": datetime.datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "args": vars(args),
+                },
+                "results": results,
+            },
+            indent=2,
+        ),
+        "utf-8",
+    )
+    return output
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print how the results changed since the baseline's.
+
+    Returns:
+        bool: Whether anything regressed more than tolerance percent.
+    """
+
+    def key(result):
+        return (
+            result["size"],
+            result["mode"],
+            result["endpoint"],
+            result["concurrency"],
+        )
+
+    before = {key(result): result for result in baseline}
+    regressed = False
+    print(
+        f"\nAgainst the baseline\n{'size':>8} {'mode':>10} "
+        f"{'endpoint':>18} {'conc':>5} {'p95':>9} {'req/s':>9}"
+    )
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        p95 = change(old["p95_ms"], result["p95_ms"])
+        throughput = change(old["throughput_rps"], result["throughput_rps"])
+        worse = p95 > tolerance or throughput < -tolerance
+        regressed |= worse
+        print(
+            f"{result['size']:>8} {result['mode']:>10} "
+            f"{result['endpoint']:>18} {result['concurrency']:>5} "
+            f"{p95:>+8.1f}% {throughput:>+8.1f}%"
+            f"{'  regressed' if worse else ''}"
+        )
+    return regressed
+
+
+def change(old, new):
+    """The change from old to new, in percent."""
+
+    return (new - old) / old * 100 if old else 0.0
+
+
+if __name__ == "__main__":
+    main()
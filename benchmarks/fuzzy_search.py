@@ -0,0 +1,112 @@
+"""
+Time the fuzzy (typo tolerant) search of apps.quotes.fuzzy, next to the
+full text search that finds nothing for the same misspelt queries, on
+quotes made of the bundled quotes.json's words.
+
+    python -m benchmarks.fuzzy_search --sizes 10000 100000
+"""
+
+# pylint: disable=import-outside-toplevel, protected-access
+
+import argparse
+import json
+import random
+import re
+
+from benchmarks import bench_database, measure, setup_django
+
+QUOTES_FILE = "apps/quotes/management/commands/quotes.json"
+
+QUERIES = ("ilusoin", "truht", "simplicty", "greatnes where", "xylophone")
+
+
+def seed_texts(count, batch_size=5000):
+    """Add quotes of 6-20 random words of the bundled quotes."""
+
+    from apps.quotes import fuzzy
+    from apps.quotes.models import Quote
+    from apps.quotes.signals import quotes_bulk_changed
+
+    with open(QUOTES_FILE, encoding="utf-8") as file:
+        words = sorted(
+            {
+                word
+                for item in json.load(file)
+                for word in re.findall(r"\w+", item["text"])
+            }
+        )
+
+    # not for security, just a repeatable corpus
+    generator = random.Random(count)  # nosec B311
+    start = Quote.objects.count()
+    for offset in range(start, start + count, batch_size):
+        quotes = Quote.objects.bulk_create(
+            Quote(
+                text=" ".join(
+                    generator.choices(words, k=generator.randint(6, 20))
+                ),
+                content_hash=f"fuzzy-benchmark-{number}",
+            )
+            for number in range(
+                offset, min(offset + batch_size, start + count)
+            )
+        )
+        fuzzy.index_quotes(
+            Quote.objects.filter(pk__in=[quote.pk for quote in quotes])
+        )
+
+    quotes_bulk_changed.send(sender=Quote)
+
+
+def main():
+    """Seed the database up to every size and time both searches at each."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.test import override_settings
+
+    from apps.quotes import fuzzy, search
+    from apps.quotes.models import QuoteTrigram
+
+    print(
+        f"{'quotes':>8} {'query':>16} {'way':>6} {'results':>8} "
+        f"{'median ms':>10} {'max ms':>10}"
+    )
+
+    def uncached_search(query):
+        search.clear_search_cache()
+        return search.search_quote_ids(query)
+
+    with override_settings(QUOTES_TRIGRAM_INDEX=True), bench_database():
+        seeded = 0
+        for size in sorted(args.sizes):
+            seed_texts(size - seeded)
+            seeded = size
+            print(f"{QuoteTrigram.objects.count():>8} trigram rows")
+
+            for query in QUERIES:
+                ways = {
+                    "fts": lambda query=query: uncached_search(query),
+                    # around the result cache
+                    "fuzzy": lambda query=query: fuzzy._search(
+                        sorted(fuzzy.words_of(query)), search.search_limit()
+                    ),
+                }
+                for way, func in ways.items():
+                    result = measure(func, args.repeat)
+                    print(
+                        f"{size:>8} {query:>16} {way:>6} {len(func()):>8} "
+                        f"{result['median_ms']:>10.3f} "
+                        f"{result['max_ms']:>10.3f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
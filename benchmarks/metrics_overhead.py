@@ -0,0 +1,69 @@
+"""
+What the request metrics (apps.metrics) cost a request: a view that does
+nothing, called directly and through MetricsMiddleware - the difference is
+the middleware's timing, query counting wrapper and observe.
+
+    python -m benchmarks.metrics_overhead --requests 100000
+
+It's about 2us per request - a wrapper around every request's queries
+(connection.execute_wrapper, see apps.metrics.middleware) took 14us.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+import time
+
+from benchmarks import setup_django
+
+
+def main():
+    """Time the bare view and the measured one, print the difference."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from apps.metrics.middleware import MetricsMiddleware
+
+    request = RequestFactory().get("/quotes/list")
+    request.resolver_match = resolve("/quotes/list")
+    response = HttpResponse(b"x" * 10_000)
+
+    def view(_request):
+        return response
+
+    ways = {"bare": view, "measured": MetricsMiddleware(view)}
+    # the best of the rounds, the others had more noise
+    best = {
+        way: min(
+            per_request(func, request, args.requests)
+            for _ in range(args.rounds)
+        )
+        for way, func in ways.items()
+    }
+
+    print(f"{'way':>10} {'us/request':>11}")
+    for way, seconds in best.items():
+        print(f"{way:>10} {seconds * 1e6:>11.2f}")
+    print(f"{'overhead':>10} {(best['measured'] - best['bare']) * 1e6:>11.2f}")
+
+
+def per_request(func, request, requests):
+    """How long (in seconds) a call took, on average."""
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        func(request)
+    return (time.perf_counter() - started) / requests
+
+
+if __name__ == "__main__":
+    main()
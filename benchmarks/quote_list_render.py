@@ -0,0 +1,86 @@
+"""
+Compare rendering the quote list partial the old way (every <li> rendered by
+the template engine on every request) to assembling it from cached list
+items (apps.quotes.fragments), cold (nothing cached yet) and warm.
+
+    python -m benchmarks.quote_list_render --rows 1000 5000
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+
+from benchmarks import bench_database, measure, seed_quotes, setup_django
+
+# quotes/partials/quote_list_partial.html before the items were cached
+OLD_PARTIAL = """
+{% for quote in object_list %}
+<li>
+    {{quote.date_created|date:"Y-m-d"}} - <a href="{% url "quote-detail" pk=quote.id %}">"{{ quote.text }}"</a> -
+    {% if quote.author %}
+    <a href="{% url "author-detail" pk=quote.author.id %}">{{ quote.author.name }}</a>
+    {% else %}
+	Unknown Author
+    {% endif %}
+</li>
+{% empty %}
+    <li>No quotes yet.</li>
+{% endfor %}
+"""  # noqa: E501, pylint: disable=C0301
+
+
+def ways(quotes):
+    """The three ways of rendering the quotes' list, by name."""
+
+    from django.core.cache import cache
+    from django.template import Context, Template
+    from django.template.loader import render_to_string
+
+    from apps.quotes.fragments import render_items
+
+    old_template = Template(OLD_PARTIAL)
+
+    def old():
+        old_template.render(Context({"object_list": quotes}))
+
+    def warm():
+        render_to_string(
+            "quotes/partials/quote_list_partial.html",
+            {"object_list": quotes, "quote_items": render_items(quotes)},
+        )
+
+    def cold():
+        cache.clear()
+        warm()
+
+    return {"old": old, "cold": cold, "warm": warm}
+
+
+def main():
+    """Render lists of every size the three ways, print ms per 1k rows."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from apps.quotes.models import Quote
+
+    print(f"{'rows':>8} {'way':>8} {'ms per 1k rows':>15}")
+
+    with bench_database():
+        seed_quotes(max(args.rows))
+
+        for rows in sorted(args.rows):
+            quotes = list(Quote.objects.select_related("author")[:rows])
+            # cold first, so the cache is warm for the last one
+            for way, func in ways(quotes).items():
+                result = measure(func, args.repeat)
+                per_thousand = result["median_ms"] * 1000 / rows
+                print(f"{rows:>8} {way:>8} {per_thousand:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare the old way of picking a random quote (load every quote, then
+secrets.choice) to the slot based sampler in apps.quotes.sampling.
+
+    python -m benchmarks.random_quote --sizes 10000 100000 1000000
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+import secrets
+
+from benchmarks import bench_database, measure, seeded_sizes, setup_django
+
+
+def main():
+    """Seed the database up to every size and time both ways at each."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--repeat-old",
+        type=int,
+        default=3,
+        help="the old way is slow on big tables, so run it fewer times",
+    )
+    args = parser.parse_args()
+
+    setup_django()
+
+    from apps.quotes import sampling
+    from apps.quotes.models import Quote
+
+    def old_random_quote():
+        return secrets.choice(Quote.objects.all())
+
+    print(f"{'quotes':>10} {'way':>8} {'median ms':>10} {'max ms':>10}")
+
+    with bench_database():
+        for size in seeded_sizes(args.sizes):
+            results = {
+                "old": measure(old_random_quote, args.repeat_old),
+                "sampler": measure(sampling.random_quote, args.repeat),
+            }
+            for way, result in results.items():
+                print(
+                    f"{size:>10} {way:>8} {result['median_ms']:>10.3f} "
+                    f"{result['max_ms']:>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
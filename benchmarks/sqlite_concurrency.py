@@ -0,0 +1,159 @@
+"""
+Readers and a writer at the same time, on SQLite's defaults and with the
+SQLite performance profile (see apps.quotes.database): N reader threads
+read pages of quotes while one writer thread saves quotes, like the admin
+does. Reported are the reads and writes per second and how many of them
+failed with "database is locked".
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --seconds 10
+
+On the defaults every read opens a connection (no CONN_MAX_AGE), like a
+request does. The database is a file (the test database is in memory
+otherwise), so the journal behaves like the real one's.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks import bench_database, seed_quotes, setup_django
+
+
+def main():
+    """Seed a file database and run the workload without and with profile."""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument(
+        "--busy-timeout",
+        type=float,
+        default=0.1,
+        help="how long (in seconds) a connection waits for a lock, "
+        "python's default is 5 - lower shows the locking sooner",
+    )
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.db import connection
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(
+            directory, "bench.sqlite3"
+        )
+        connection.settings_dict.setdefault("OPTIONS", {})[
+            "timeout"
+        ] = args.busy_timeout
+        settings.SQLITE_PRAGMAS = {
+            "busy_timeout": int(args.busy_timeout * 1000)
+        }
+
+        with bench_database():
+            seed_quotes(args.quotes)
+            connection.close()
+
+            print(
+                f"{'profile':>8} {'reads/s':>10} {'locked reads':>13} "
+                f"{'writes/s':>10} {'locked writes':>14}"
+            )
+            for profile in (False, True):
+                result = run(profile, args.readers, args.seconds)
+                print(
+                    f"{'on' if profile else 'off':>8} "
+                    f"{result['reads'] / args.seconds:>10.0f} "
+                    f"{rate(result['locked_reads'], result['reads']):>13} "
+                    f"{result['writes'] / args.seconds:>10.0f} "
+                    f"{rate(result['locked_writes'], result['writes']):>14}"
+                )
+
+
+def rate(failed, succeeded):
+    """Failed ones as a share of all, like "12 (3.4%)"."""
+
+    total = failed + succeeded
+    share = failed / total * 100 if total else 0.0
+    return f"{failed} ({share:.1f}%)"
+
+
+def run(profile, readers, seconds):
+    """
+    Run the readers and the writer for a while.
+
+    Returns:
+        dict: How many "reads" and "writes" succeeded, and how many of
+            them failed because the database was locked.
+    """
+    # pylint: disable=too-many-locals
+
+    from django.conf import settings
+    from django.db import (
+        OperationalError,
+        close_old_connections,
+        connection,
+        transaction,
+    )
+
+    from apps.quotes.models import Quote
+
+    settings.SQLITE_PROFILE = profile
+    connection.settings_dict["CONN_MAX_AGE"] = 600 if profile else 0
+    if not profile:
+        # WAL stays on in the file once a profiled connection turned it on
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = DELETE")
+    connection.close()
+
+    ids = list(Quote.objects.values_list("pk", flat=True)[:1000])
+    connection.close()
+    counts = {"reads": 0, "locked_reads": 0, "writes": 0, "locked_writes": 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def read():
+        while time.monotonic() < stop:
+            try:
+                list(Quote.objects.select_related("author")[:50])
+                count("reads")
+            except OperationalError:
+                count("locked_reads")
+            # the end of a "request"
+            close_old_connections()
+        connection.close()
+
+    def write():
+        number = 0
+        while time.monotonic() < stop:
+            number += 1
+            try:
+                with transaction.atomic():
+                    quote = Quote.objects.get(pk=ids[number % len(ids)])
+                    quote.text = f"Changed quote number {number}"
+                    quote.save()
+                count("writes")
+            except OperationalError:
+                count("locked_writes")
+            close_old_connections()
+        connection.close()
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+if __name__ == "__main__":
+    main()
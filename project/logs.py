@@ -0,0 +1,315 @@
+"""
+A module for the project's logging pipeline (see LOGGING in settings.py).
+
+The views log every request (logger.info(..., request.user.username)), so
+a handler that formats and writes the record right away puts that work -
+and the file's rotation - on the request. QueueLogHandler doesn't: it only
+puts the record on a bounded queue, and a listener thread formats it (as
+JSON, see JsonFormatter) and writes it to the rotating file (and the
+console).
+
+When the queue is full - the disk can't keep up - the handler either:
+
+- "drop": drops the record right away (the default, a request never waits
+  for its log), or
+- "block": waits up to block_timeout seconds for room, and drops it if
+  there's none by then.
+
+The dropped records are counted (see log_queue_stats, also in /metrics).
+The listener writes what's left in the queue when the process exits.
+
+Every process rotates the file it writes on its own, so processes can't
+share one - they'd rotate it from under each other, losing records. A
+"{pid}" in the filename is replaced with the process's id (a forked worker
+gets a file, a queue and a listener of its own). The files of the gone
+processes are pruned when a handler starts, like rotated files: the
+newest backup_count of them are kept (see prune_logs).
+"""
+
+import atexit
+import copy
+import datetime
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import weakref
+from pathlib import Path
+
+import ujson
+
+POLICIES = ("drop", "block")
+
+# replaced with the process's id in the filename of a QueueLogHandler
+PID_PLACEHOLDER = "{pid}"
+
+# the attributes every LogRecord has, the others came with extra={...}
+RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+# every QueueLogHandler, for log_queue_stats
+_handlers = weakref.WeakSet()
+
+
+def process_filename(filename, pid=None):
+    """The filename, with PID_PLACEHOLDER replaced by the process's id."""
+
+    return filename.replace(PID_PLACEHOLDER, str(pid or os.getpid()))
+
+
+def process_alive(pid):
+    """Whether a process runs with the id (True when it can't be told)."""
+
+    if os.name != "posix":
+        # os.kill would end the process
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # someone else's
+        return True
+    return True
+
+
+def prune_logs(filename, keep):
+    """
+    Delete the files (rotated ones too) of the gone processes' logs, but
+    the newest keep of them.
+
+    Args:
+        filename (str): The logs, see PID_PLACEHOLDER.
+        keep (int): How many gone processes' logs are kept.
+    """
+
+    path = Path(filename)
+    prefix, _, suffix = path.name.partition(PID_PLACEHOLDER)
+    name_re = re.compile(
+        rf"{re.escape(prefix)}(\d+){re.escape(suffix)}(?:\.\d+)?"
+    )
+    # pid -> its files
+    logs = {}
+    for log_path in path.parent.glob(f"{prefix}*{suffix}*"):
+        match = name_re.fullmatch(log_path.name)
+        if match:
+            logs.setdefault(int(match.group(1)), []).append(log_path)
+
+    gone = []
+    for pid, paths in logs.items():
+        if not process_alive(pid):
+            try:
+                written = max(log_path.stat().st_mtime for log_path in paths)
+            except OSError:
+                # pruned by another process meanwhile
+                continue
+            gone.append((written, paths))
+    gone.sort(reverse=True)
+    for _, paths in gone[keep:]:
+        for log_path in paths:
+            try:
+                log_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format a record as one line of JSON: its time, level, logger, where it
+    was logged from, the message, the exception (if any) and the extra
+    fields it was logged with.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and name not in entry:
+                entry[name] = value
+        # what json can't take (a user, a request) is logged as its str
+        return ujson.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that can be stopped while its queue is full."""
+
+    def enqueue_sentinel(self):
+        # put_nowait would fail on a full queue, the listener makes room
+        self.queue.put(self._sentinel)
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    A handler that only puts the records on a bounded queue - its listener
+    thread writes them to a rotating JSON lines file (and the console, if
+    console_level is given).
+
+    Args:
+        filename (str): The log file, see PID_PLACEHOLDER.
+        max_bytes (int): The size the file is rotated at.
+        backup_count (int): How many rotated files are kept.
+        maxsize (int): How many records the queue holds.
+        policy (str): What happens to a record when the queue is full, see
+            POLICIES.
+        block_timeout (float): How long (in seconds) the "block" policy
+            waits for room.
+        console_level (str): Also write the records of this level and up
+            to the console (in a readable format, not JSON).
+    """
+
+    def __init__(
+        self,
+        filename,
+        *,
+        max_bytes=10 * 2**20,
+        backup_count=5,
+        maxsize=10000,
+        policy="drop",
+        block_timeout=0.1,
+        console_level=None,
+    ):  # pylint: disable=too-many-arguments
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy}")
+        super().__init__(queue.Queue(maxsize))
+        self.filename = filename
+        if PID_PLACEHOLDER in filename:
+            prune_logs(filename, backup_count)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            process_filename(filename),
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            # the file is opened by the listener, when it writes first
+            delay=True,
+        )
+        file_handler.setFormatter(JsonFormatter())
+        targets = [file_handler]
+        if console_level:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(console_level)
+            console_handler.setFormatter(
+                logging.Formatter(
+                    "{asctime}: {levelname} - {name} {module}.py "
+                    "(line {lineno:d}) :: {message}",
+                    style="{",
+                )
+            )
+            targets.append(console_handler)
+
+        self.listener = BoundedQueueListener(
+            self.queue, *targets, respect_handler_level=True
+        )
+        self.listener.start()
+        # write what's still queued before the process exits
+        atexit.register(self.stop_listener)
+        _handlers.add(self)
+
+    def restart_in_child(self):
+        """
+        Start over in a forked process: the listener thread didn't come
+        along, and the file is the parent's (unless it's a file per
+        process). What the parent had queued is the parent's to write.
+        """
+
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        file_handler = self.listener.handlers[0]
+        # not closed, the parent's buffered records aren't written twice
+        file_handler.stream = None
+        file_handler.baseFilename = os.path.abspath(
+            process_filename(self.filename)
+        )
+        self.listener = BoundedQueueListener(
+            self.queue, *self.listener.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def prepare(self, record):
+        """
+        Make the record safe to hand over to another thread: merge the
+        message with its arguments (they may change after the call) and
+        turn the exception into text (the traceback keeps frames alive).
+        The formatting is left to the listener.
+        """
+
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        """Queue the record, or count it as dropped (see policy)."""
+
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stop_listener(self):
+        """Stop the listener, once it wrote what's queued."""
+
+        # closed by dictConfig and then at exit, it can only stop once
+        if self.listener._thread is not None:  # pylint: disable=W0212
+            self.listener.stop()
+
+    def close(self):
+        self.stop_listener()
+        super().close()
+
+
+def _restart_handlers_in_child():
+    for handler in list(_handlers):
+        handler.restart_in_child()
+
+
+os.register_at_fork(after_in_child=_restart_handlers_in_child)
+
+
+def log_queue_stats():
+    """
+    The records of this process's log queues.
+
+    Returns:
+        dict: "queued" (waiting to be written) and "dropped" (since the
+            process started, the queue was full).
+    """
+
+    handlers = list(_handlers)
+    return {
+        "queued": sum(handler.queue.qsize() for handler in handlers),
+        "dropped": sum(handler.dropped for handler in handlers),
+    }
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -50,14 +51,20 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # the built-in widget templates, for the TemplatesSetting renderer
+    "django.forms",
     "apps.authors",
     "apps.quotes",
     "apps.dashboard",
+    "apps.api",
+    "apps.metrics",
     "crispy_forms",
     "crispy_bootstrap5",
 ]
 
 MIDDLEWARE = [
+    # first, so the request metrics time the whole request
+    "apps.metrics.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -86,6 +93,11 @@ TEMPLATES = [
     },
 ]
 
+# Render form widgets with the templates above, so the widgets of the
+# project can have their templates in templates/ (see
+# apps.authors.widgets)
+FORM_RENDERER = "django.forms.renderers.TemplatesSetting"
+
 WSGI_APPLICATION = "project.wsgi.application"
 
 
@@ -121,77 +133,135 @@ DATABASES = {
     # },
 }
 
+# The SQLite performance profile: the WAL journal (a save doesn't lock the
+# readers out), faster pragmas and connections kept open between requests
+# (see apps.quotes.database). Opt-in, with SQLITE_PROFILE=True.
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE") == "True"
+if SQLITE_PROFILE:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.getenv("CONN_MAX_AGE", "600")
+    )
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# The local memory cache lives in one process. With several server
+# processes (or to let management commands, like import_quotes, invalidate
+# the pages the server cached) point it to a shared cache, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "quotes"),
+    }
+}
+if CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+    # the default 300 entries would not even hold a long quote list's
+    # rendered items (see apps.quotes.fragments)
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": 20000}
+
+# How long (in seconds) anonymous pages are cached (see
+# AgAnonymousCacheMixin). Changes made through the models invalidate them
+# right away, this only bounds how stale a page can get otherwise.
+PAGE_CACHE_TIMEOUT = 300
+
+# Keep the trigram index of the quotes, for the typo tolerant search the
+# quote list falls back to when nothing matches (see apps.quotes.fuzzy).
+# After turning it on, fill it with: python manage.py rebuild_quote_trigrams
+QUOTES_TRIGRAM_INDEX = os.getenv("QUOTES_TRIGRAM_INDEX", "True") == "True"
+
+# The request metrics, in the Prometheus text format at /metrics (see
+# apps.metrics). A scraper sends METRICS_TOKEN as "Authorization: Bearer
+# <token>", superusers see them without. With several server processes set
+# METRICS_DIR to a directory they all can write to - every process writes
+# its totals there every METRICS_FLUSH_INTERVAL seconds (15 by default) and
+# /metrics adds them up. The files of gone processes (not written for 4
+# intervals) are deleted, their counters are kept in retired.json.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_DIR = os.getenv("METRICS_DIR")
+
 # LOGGING START
 
-# LOGS_DIR = os.path.join(BASE_DIR, "logs")
-
-# if not os.path.exists(LOGS_DIR):
-#     os.makedirs(LOGS_DIR)
-
-# LOGGING = {
-#     "version": 1,
-#     "disable_existing_loggers": False,
-#     "handlers": {
-#         "rotating_file_handler": {
-#             "class": "logging.handlers.RotatingFileHandler",
-#             "filename": os.path.join(LOGS_DIR, "logs.log"),
-#             "mode": "a",
-#             "encoding": "utf-8",
-#             "formatter": "verbose",
-#             "backupCount": 5,
-#             "maxBytes": 10485760,
-#         },
-#         "console_handler": {
-#             "class": "logging.StreamHandler",
-#             "level": "DEBUG",
-#             "formatter": "colored",
-#         },
-#     },
-#     "loggers": {
-#         # unmapped aka root logger, catch logs from ALL modules (files)
-#         # this would show all of my written logs, like logger.error("hello!")
-#         "": {
-#             "level": "DEBUG",
-#             "handlers": [
-#                 "console_handler",
-#                 "rotating_file_handler",
-#             ],
-#         },
-#         # catch logs from django (make this DEBUG to get loads of info)
-#         "django": {
-#             "level": "INFO",
-#             "handlers": [
-#                 "console_handler",
-#                 "rotating_file_handler",
-#             ],
-#             "propagate": False,
-#         },
-#         # catch all the SQL that is generated by django's ORM
-#         "django.db.backends": {
-#             "level": "INFO",
-#             "handlers": [
-#                 "console_handler",
-#                 "rotating_file_handler",
-#             ],
-#         },
-#     },
-#     "formatters": {
-#         "simple": {
-#             "format": "{asctime}: {levelname} :: {message}",
-#             "style": "{",
-#         },
-#         "verbose": {
-#             "format": "{asctime}: {levelname} - {name} {module}.py "
-#             "(line {lineno:d}) :: {message}",
-#             "style": "{",
-#         },
-#         "colored": {
-#             "()": "colorlog.ColoredFormatter",
-#             "format": "%(log_color)s %(asctime)s: [%(levelname)s] - %(name)s"
-#             "%(module)s.py (line %(lineno)s). :: %(message)s",
-#         },
-#     },
-# }
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+
+# manage.py test
+TESTING = sys.argv[1:2] == ["test"]
+
+if not TESTING and not os.path.exists(LOGS_DIR):
+    os.makedirs(LOGS_DIR)
+
+# Log the database queries that take at least this many seconds, with how
+# the database runs them, to SLOW_QUERY_LOG (see apps.metrics.slow_queries
+# and the slow_queries command). Empty turns it off.
+SLOW_QUERY_THRESHOLD = (
+    float(os.getenv("SLOW_QUERY_THRESHOLD", "0.1"))
+    if os.getenv("SLOW_QUERY_THRESHOLD", "0.1")
+    else None
+)
+SLOW_QUERY_LOG = os.path.join(LOGS_DIR, "slow_queries.{pid}.jsonl")
+
+# The records are only queued on the request, a listener thread writes them
+# to logs/quotes.<pid>.jsonl (JSON lines, rotated at 10 MiB) and the console
+# (see project.logs). Every server process writes (and rotates) a file of
+# its own, of the files of the gone processes the newest backup_count are
+# kept. When the queue is full the records are dropped (and counted), or
+# with LOG_QUEUE_POLICY=block the request waits a bit first. The tests
+# write no log files, only the warnings to the console.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "queue_handler": {
+            "()": "project.logs.QueueLogHandler",
+            "filename": os.path.join(LOGS_DIR, "quotes.{pid}.jsonl"),
+            "max_bytes": 10485760,
+            "backup_count": 5,
+            "maxsize": int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            "policy": os.getenv("LOG_QUEUE_POLICY", "drop"),
+            "console_level": "DEBUG" if DEBUG else "WARNING",
+        },
+        "slow_query_handler": {
+            "()": "project.logs.QueueLogHandler",
+            "filename": SLOW_QUERY_LOG,
+            "max_bytes": 10485760,
+            "backup_count": 2,
+            "maxsize": 1000,
+        },
+    },
+    "loggers": {
+        # unmapped aka root logger, catch logs from ALL modules (files)
+        # this would show all of my written logs, like logger.error("hello!")
+        "": {
+            "level": "INFO",
+            "handlers": ["queue_handler"],
+        },
+        # catch logs from django (make this DEBUG to get loads of info)
+        "django": {
+            "level": "INFO",
+            "handlers": ["queue_handler"],
+            "propagate": False,
+        },
+        # the slow queries, only to their own log
+        "apps.metrics.slow_queries": {
+            "level": "WARNING",
+            "handlers": ["slow_query_handler"],
+            "propagate": False,
+        },
+    },
+}
+
+if TESTING:
+    LOGGING["handlers"] = {
+        "queue_handler": {
+            "class": "logging.StreamHandler",
+            "level": "WARNING",
+        },
+        "slow_query_handler": {"class": "logging.NullHandler"},
+    }
 
 # LOGGING END
 
@@ -18,4 +18,6 @@ urlpatterns = [
     path("random-quote", RandomQuote.as_view(), name="random-quote"),
     path("quotes/", include("apps.quotes.urls")),
     path("authors/", include("apps.authors.urls")),
+    path("api/v1/", include("apps.api.urls")),
+    path("", include("apps.metrics.urls")),
 ]
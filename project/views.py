@@ -1,32 +1,38 @@
 """A module for project views. Currently have only index."""
 
 import logging
-import secrets
 
 from django.shortcuts import render
 from django.views import View
 
-from apps.quotes.models import Quote
+from ag_mixins import AgQueryBudgetMixin
+from apps.quotes import counters, sampling
 
 logger = logging.getLogger(__name__)
 
 
-class Index(View):
+class Index(AgQueryBudgetMixin, View):
     """
     Renders an index page.
     """
 
+    # session + user + the quote counter (when it's not cached)
+    query_budget = 3
+
     def get(self, request):
         """
         What happens when GET method knocks on this view's door.
+
+        The counts come from the maintained counter (apps.quotes.counters),
+        so the quote table itself is not touched.
         """
 
         logger.info("Index view accessed by user: %s", request.user.username)
 
         show_random_quote_generator = False
 
-        all_quotes = Quote.objects.all()
-        all_quotes_count = len(all_quotes)
+        quote_counts = counters.get_counts()
+        all_quotes_count = quote_counts["total"]
 
         if all_quotes_count >= 3:
             show_random_quote_generator = True
@@ -36,14 +42,18 @@ class Index(View):
             "project/index.html",
             {
                 "all_quotes_count": all_quotes_count,
+                "active_quotes_count": quote_counts["active"],
                 "show_random_quote_generator": show_random_quote_generator,
             },
         )
 
 
-class RandomQuote(View):
+class RandomQuote(AgQueryBudgetMixin, View):
     """A view for generating a random quote"""
 
+    # session + user + the last slot + the quote in the picked slot
+    query_budget = 4
+
     def get(self, request):
         """What happens when GET method knocks on this view's door.
         What happens in this case, we take a random quote and pass it to the
@@ -51,6 +61,9 @@ class RandomQuote(View):
         about the chosen quote.
 
         This info about the quote is later rendered with htmx in a template.
+
+        The quote is picked by apps.quotes.sampling, which does it with two
+        index lookups, instead of loading every quote from the database.
         """
 
         logger.info(
@@ -58,16 +71,12 @@ class RandomQuote(View):
             request.user.username,
         )
 
-        all_quotes = Quote.objects.all()
+        random_quote = sampling.random_quote()
 
-        if not all_quotes:
+        if random_quote is None:
             # Handle the case when there are no quotes in the database
             return render(request, "project/partials/no_quotes.html")
 
-        # using secrets here, because 'bandit' pre-commmit hooks warms me that
-        # 'random' package is not safe (Issue: [B311:blacklist])
-        random_quote = secrets.choice(all_quotes)
-
         return render(
             request,
             "project/partials/random_quote.html",
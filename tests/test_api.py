@@ -0,0 +1,161 @@
+"""File that contains the tests for the JSON API"""
+
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ag_mixins import AgQueryBudgetTestMixin
+from apps.api.views import ApiListView
+from apps.authors.models import Author
+from apps.quotes.models import Quote
+
+
+@mock.patch.object(ApiListView, "page_size", 2)
+class TestApi(AgQueryBudgetTestMixin, TestCase):
+    """Class for the read-only API tests"""
+
+    def setUp(self):
+        """A few quotes, some with an author"""
+
+        self.author = Author.objects.create(name="Aldous", lastname="Huxley")
+        self.quotes = [
+            Quote.objects.create(text=f"Api quote {number}", author=author)
+            for number, author in enumerate([self.author, None, self.author])
+        ]
+
+    def collect_pages(self, url):
+        """Follow the next urls, return all the results"""
+
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            results.extend(response.json()["results"])
+            url = response.json()["next"]
+        return results
+
+    def test_quote_list(self):
+        """All the quotes, page by page, oldest first"""
+
+        results = self.collect_pages(reverse("api-quote-list"))
+
+        self.assertEqual(
+            [quote["id"] for quote in results],
+            [quote.pk for quote in self.quotes],
+        )
+        self.assertEqual(
+            results[0]["author"],
+            {"id": self.author.pk, "name": "Aldous", "lastname": "Huxley"},
+        )
+        self.assertIsNone(results[1]["author"])
+
+    def test_quote_list_by_author(self):
+        """?author= filters, and is kept in the next page urls"""
+
+        url = f"{reverse('api-quote-list')}?author={self.author.pk}"
+
+        self.assertEqual(
+            [quote["id"] for quote in self.collect_pages(url)],
+            [self.quotes[0].pk, self.quotes[2].pk],
+        )
+
+    def test_quote_detail(self):
+        """A single quote, 404 as JSON if there is none"""
+
+        response = self.client.get(
+            reverse("api-quote-detail", kwargs={"pk": self.quotes[0].pk})
+        )
+        missing = self.client.get(
+            reverse("api-quote-detail", kwargs={"pk": 0})
+        )
+
+        self.assertEqual(response.json()["text"], "Api quote 0")
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json(), {"detail": "Not found"})
+
+    def test_quote_search(self):
+        """Matching quotes, paginated"""
+
+        results = self.collect_pages(f"{reverse('api-quote-search')}?q=huxley")
+
+        self.assertEqual(
+            sorted(quote["id"] for quote in results),
+            [self.quotes[0].pk, self.quotes[2].pk],
+        )
+
+    def test_quote_search_needs_query(self):
+        """Searching for nothing is a bad request"""
+
+        response = self.client.get(reverse("api-quote-search"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": "q is required"})
+
+    def test_random_quote(self):
+        """A random quote, never cached"""
+
+        response = self.client.get(reverse("api-quote-random"))
+
+        self.assertIn(
+            response.json()["id"], [quote.pk for quote in self.quotes]
+        )
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_authors(self):
+        """Author list and detail, with the url of their quotes"""
+
+        results = self.collect_pages(reverse("api-author-list"))
+        response = self.client.get(
+            reverse("api-author-detail", kwargs={"pk": self.author.pk})
+        )
+
+        self.assertEqual(results[0]["lastname"], "Huxley")
+        self.assertEqual(len(self.collect_pages(response.json()["quotes"])), 2)
+
+    def test_not_modified(self):
+        """A client with the current ETag gets a 304, until data changes"""
+
+        url = reverse("api-quote-list")
+        etag = self.client.get(url)["ETag"]
+
+        unchanged = self.client.get(url, headers={"if-none-match": etag})
+        self.quotes[0].text = "Changed"
+        self.quotes[0].save()
+        changed = self.client.get(url, headers={"if-none-match": etag})
+
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b"")
+        self.assertEqual(unchanged["ETag"], etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["results"][0]["text"], "Changed")
+
+    def test_invalid_cursor(self):
+        """A damaged cursor is a JSON bad request"""
+
+        response = self.client.get(
+            reverse("api-quote-list"), {"cursor": "nope"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_read_only(self):
+        """The API doesn't take writes"""
+
+        response = self.client.post(reverse("api-quote-list"))
+
+        self.assertEqual(response.status_code, 405)
+
+    def test_query_budgets(self):
+        """The API views stay within their budgets"""
+
+        for url in (
+            reverse("api-quote-list"),
+            f"{reverse('api-quote-search')}?q=quote",
+            reverse("api-quote-random"),
+            reverse("api-quote-detail", kwargs={"pk": self.quotes[0].pk}),
+            reverse("api-author-list"),
+            reverse("api-author-detail", kwargs={"pk": self.author.pk}),
+        ):
+            self.assert_within_query_budget(url)
@@ -0,0 +1,84 @@
+"""File that contains the tests for the author picker's author search"""
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ag_mixins import AgQueryBudgetTestMixin
+from apps.authors.models import Author
+from apps.authors.search import MAX_LIMIT, search_authors
+from apps.quotes.models import Quote
+
+
+class TestAuthorSearch(AgQueryBudgetTestMixin, TestCase):
+    """Class for the author search and the author options tests"""
+
+    def setUp(self):
+        """A few authors, alike and not"""
+
+        self.huxley = Author.objects.create(name="Aldous", lastname="Huxley")
+        self.hugo = Author.objects.create(name="Victor", lastname="Hugo")
+        self.buddha = Author.objects.create(name="Buddha")
+        Quote.objects.create(text="The truth is simple", author=self.buddha)
+
+    def test_prefix_of_name_or_lastname(self):
+        """Names and lastnames match by prefix, case insensitively"""
+
+        self.assertEqual(search_authors("HU"), [self.huxley, self.hugo])
+        self.assertEqual(search_authors("ald"), [self.huxley])
+        self.assertEqual(search_authors("aldous hux"), [self.huxley])
+        self.assertEqual(search_authors("victor hux"), [])
+        self.assertEqual(len(search_authors("hu", limit=1)), 1)
+
+    def test_non_ascii_name(self):
+        """Names with non-ASCII letters match, lowercased like SQLite does"""
+
+        zola = Author.objects.create(name="Émile", lastname="Zola")
+
+        self.assertEqual(search_authors("Émile"), [zola])
+        self.assertEqual(search_authors("ÉMILE zo"), [zola])
+
+    def test_no_query(self):
+        """Without a query the most popular authors come first"""
+
+        self.assertEqual(search_authors(" ")[0], self.buddha)
+
+    def test_lookups_search_indexes(self):
+        """The lookups are index range searches, however many authors"""
+
+        with CaptureQueriesContext(connection) as queries:
+            search_authors("hu")
+
+        for query in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            self.assertIn("SEARCH authors_author USING INDEX", plan[0])
+            self.assertFalse(any("TEMP B-TREE" in line for line in plan))
+
+    def test_options_view(self):
+        """The options of the matching authors, the limit capped"""
+
+        url = reverse("author-options")
+
+        response = self.client.get(url, {"q": "hux"})
+        self.assertContains(
+            response, f'<option value="{self.huxley.pk}">Aldous Huxley'
+        )
+        self.assertNotContains(response, "Hugo")
+
+        self.assertContains(
+            self.client.get(url, {"q": "nobody"}), "No authors match"
+        )
+        self.assertEqual(
+            self.client.get(url, {"limit": "many"}).status_code, 400
+        )
+
+        Author.objects.bulk_create(
+            Author(name=f"Many {number}") for number in range(MAX_LIMIT + 5)
+        )
+        response = self.client.get(url, {"q": "many", "limit": 1000})
+        self.assertEqual(response.content.count(b"<option"), MAX_LIMIT)
+
+        self.assert_within_query_budget(f"{url}?q=hu")
@@ -0,0 +1,176 @@
+"""File that contains the tests for the maintained quote counts"""
+
+import io
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.quotes import counters
+from apps.quotes.models import Quote, QuoteCounter
+from apps.quotes.signals import quotes_bulk_changed
+
+
+class TestCounters(TestCase):
+    """Class for quote counter tests"""
+
+    def setUp(self):
+        """Create an active and an inactive quote"""
+
+        self.active_quote = Quote.objects.create(text="Active", active=True)
+        self.inactive_quote = Quote.objects.create(text="Inactive")
+
+    def test_counts_follow_creates(self):
+        """Both quotes are counted, one of them as active"""
+
+        self.assertEqual(counters.get_counts(), {"total": 2, "active": 1})
+
+    def test_counts_follow_deletes(self):
+        """Deleted quotes are no longer counted"""
+
+        self.active_quote.delete()
+
+        self.assertEqual(counters.get_counts(), {"total": 1, "active": 0})
+
+    def test_counts_follow_active_changes(self):
+        """Activating and deactivating a quote changes the active count"""
+
+        self.inactive_quote.active = True
+        self.inactive_quote.save()
+        self.assertEqual(counters.get_counts()["active"], 2)
+
+        quote = Quote.objects.get(pk=self.active_quote.pk)
+        quote.active = False
+        quote.save()
+        self.assertEqual(counters.get_counts()["active"], 1)
+
+    def test_counts_follow_unloaded_instance_changes(self):
+        """A quote that was not loaded from the database is compared too"""
+
+        Quote(
+            pk=self.active_quote.pk,
+            text="Now inactive",
+            date_created=self.active_quote.date_created,
+        ).save()
+
+        self.assertEqual(counters.get_counts(), {"total": 2, "active": 0})
+
+    def test_counts_repaired_after_bulk_changes(self):
+        """Bulk changes bypass the signals, the bulk signal repairs it"""
+
+        Quote.objects.update(active=True)
+        quotes_bulk_changed.send(sender=Quote)
+
+        self.assertEqual(counters.get_counts(), {"total": 2, "active": 2})
+
+    def test_missing_counter_row_is_recreated(self):
+        """Losing the counter row is not fatal"""
+
+        QuoteCounter.objects.all().delete()
+        counters.invalidate()
+
+        self.assertEqual(counters.get_counts(), {"total": 2, "active": 1})
+
+    def test_index_does_not_touch_quote_table(self):
+        """The index page reads the counts from the counter only"""
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("index"))
+
+        self.assertEqual(response.context["all_quotes_count"], 2)
+        self.assertEqual(response.context["active_quotes_count"], 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('"quotes_quote"', query["sql"])
+
+
+class TestAuthorCounts(TestCase):
+    """Class for the maintained per-author quote count tests"""
+
+    def setUp(self):
+        """Two authors, one with an active and an inactive quote"""
+
+        self.author = Author.objects.create(name="Buddha")
+        self.other = Author.objects.create(name="Huxley")
+        self.quote = Quote.objects.create(
+            text="Active", author=self.author, active=True
+        )
+        Quote.objects.create(text="Inactive", author=self.author)
+
+    def counts(self, author):
+        """The author's counts, as they are in the database"""
+
+        author.refresh_from_db()
+        return author.quote_count, author.active_quote_count
+
+    def test_counts_follow_creates_and_deletes(self):
+        """Quotes are counted for their author"""
+
+        self.assertEqual(self.counts(self.author), (2, 1))
+        self.assertEqual(self.counts(self.other), (0, 0))
+
+        self.quote.delete()
+
+        self.assertEqual(self.counts(self.author), (1, 0))
+
+    def test_counts_follow_author_changes(self):
+        """A quote moved to another author is counted for the new one"""
+
+        quote = Quote.objects.get(pk=self.quote.pk)
+        quote.author = self.other
+        quote.active = False
+        quote.save()
+
+        self.assertEqual(self.counts(self.author), (1, 0))
+        self.assertEqual(self.counts(self.other), (1, 0))
+
+    def test_author_save_keeps_counts(self):
+        """Saving an author loaded before a quote was added keeps the count"""
+
+        author = Author.objects.get(pk=self.other.pk)
+        Quote.objects.create(text="New", author=self.other)
+
+        author.name = "Aldous"
+        author.save()
+
+        self.assertEqual(self.counts(self.other), (1, 0))
+
+    def test_counts_repaired(self):
+        """Bulk changes and the repair_counters command count again"""
+
+        Quote.objects.update(author=self.other, active=True)
+        quotes_bulk_changed.send(sender=Quote)
+
+        self.assertEqual(self.counts(self.author), (0, 0))
+        self.assertEqual(self.counts(self.other), (2, 2))
+
+        Author.objects.update(quote_count=10)
+        output = io.StringIO()
+        call_command("repair_counters", stdout=output)
+
+        self.assertIn("of 2 authors", output.getvalue())
+        self.assertEqual(self.counts(self.other), (2, 2))
+
+    def test_popular_authors_first(self):
+        """The author list sorts by the counts, with one query"""
+
+        url = reverse("author-list")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(
+            list(response.context["author_list"]), [self.author, self.other]
+        )
+        self.assertEqual(
+            len([q for q in queries if '"authors_author"' in q["sql"]]), 1
+        )
+        self.assertEqual(
+            list(
+                self.client.get(url, {"sort": "date"}).context["author_list"]
+            ),
+            [self.author, self.other],
+        )
+        self.assertEqual(self.client.get(url, {"sort": "x"}).status_code, 400)
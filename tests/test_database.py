@@ -0,0 +1,112 @@
+"""File that contains the tests for the SQLite performance profile"""
+
+# pylint: disable=protected-access
+
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.quotes import database
+
+
+class TestSqliteProfile(TestCase):
+    """Class for the SQLite performance profile tests"""
+
+    def setUp(self):
+        """A database file of its own, connections to it are new ones"""
+
+        # pylint: disable=consider-using-with
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {
+            **connection.settings_dict,
+            "NAME": os.path.join(directory.name, "db.sqlite3"),
+        }
+
+    def pragmas(self, *names):
+        """Open a new connection, read the pragmas from it"""
+
+        new_connection = DatabaseWrapper(self.settings_dict, alias="profile")
+        try:
+            with new_connection.cursor() as cursor:
+                values = {}
+                for name in names:
+                    cursor.execute(f"PRAGMA {name}")
+                    values[name] = cursor.fetchone()[0]
+                return values
+        finally:
+            new_connection.close()
+
+    @override_settings(SQLITE_PROFILE=True)
+    def test_profile(self):
+        """New connections get the profile's pragmas"""
+
+        self.assertEqual(
+            self.pragmas(
+                "journal_mode", "synchronous", "busy_timeout", "cache_size"
+            ),
+            {
+                "journal_mode": "wal",
+                # NORMAL
+                "synchronous": 1,
+                "busy_timeout": 5000,
+                "cache_size": -65536,
+            },
+        )
+
+    @override_settings(
+        SQLITE_PROFILE=True, SQLITE_PRAGMAS={"busy_timeout": 50}
+    )
+    def test_pragmas_setting(self):
+        """SQLITE_PRAGMAS changes the profile's pragmas"""
+
+        values = self.pragmas("journal_mode", "busy_timeout")
+
+        self.assertEqual(values, {"journal_mode": "wal", "busy_timeout": 50})
+
+    def test_profile_is_opt_in(self):
+        """Without SQLITE_PROFILE the connections are left as they are"""
+
+        self.assertEqual(
+            self.pragmas("journal_mode")["journal_mode"], "delete"
+        )
+
+    @override_settings(SQLITE_PROFILE=True, SQLITE_OPTIMIZE_INTERVAL=3600)
+    def test_periodic_optimize(self):
+        """PRAGMA optimize runs after a request, once per interval"""
+
+        database._optimized["last"] = None
+        self.addCleanup(database._optimized.update, last=None)
+
+        optimized = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("quote-list"))
+            optimized.append(
+                [
+                    query["sql"]
+                    for query in queries.captured_queries
+                    if query["sql"] == "PRAGMA optimize"
+                ]
+            )
+
+        self.assertEqual(optimized, [["PRAGMA optimize"], []])
+
+    def test_bulk_write_cache(self):
+        """The page cache is bigger for the block, then back to its size"""
+
+        def cache_size():
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size")
+                return cursor.fetchone()[0]
+
+        before = cache_size()
+        with database.bulk_write_cache(connection, -4096):
+            self.assertEqual(cache_size(), -4096)
+
+        self.assertEqual(cache_size(), before)
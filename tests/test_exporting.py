@@ -0,0 +1,183 @@
+"""File that contains the tests for exporting quotes"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.authors.models import Author
+from apps.quotes.exporting import QuoteExport, parse_since
+from apps.quotes.importing import iter_json_array
+from apps.quotes.models import Quote
+
+
+class TestExport(TestCase):
+    """Class for the quote export tests"""
+
+    def setUp(self):
+        """Quotes with and without an author"""
+
+        self.author = Author.objects.create(name="Aldous", lastname="Huxley")
+        self.first = Quote.objects.create(
+            text='Words, "quoted"', author=self.author, active=True
+        )
+        self.second = Quote.objects.create(text="Ąžuolas")
+
+    def test_ndjson(self):
+        """A JSON object per line, with the author's full name"""
+
+        lines = "".join(QuoteExport("ndjson", chunk_size=1)).splitlines()
+
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [self.first.pk, self.second.pk],
+        )
+        self.assertEqual(json.loads(lines[0])["author"], "Aldous Huxley")
+        self.assertEqual(json.loads(lines[1])["text"], "Ąžuolas")
+
+    def test_csv(self):
+        """A header row and a row per quote"""
+
+        rows = list(csv.DictReader(io.StringIO("".join(QuoteExport("csv")))))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["text"], 'Words, "quoted"')
+        self.assertEqual(rows[1]["author"], "")
+
+    def test_json_schema(self):
+        """The json format is the quotes.json schema"""
+
+        export = "".join(QuoteExport("json"))
+        items = list(iter_json_array(io.StringIO(export)))
+
+        self.assertEqual(items, json.loads(export))
+        self.assertEqual(set(items[0]), {"text", "author", "date_created"})
+
+    def test_json_empty(self):
+        """No quotes is still a valid JSON array"""
+
+        Quote.objects.all().delete()
+
+        self.assertEqual(json.loads("".join(QuoteExport("json"))), [])
+
+    def test_since(self):
+        """Only the quotes created since the date are exported"""
+
+        Quote.objects.filter(pk=self.first.pk).update(
+            date_created=timezone.now() - timezone.timedelta(days=10)
+        )
+        since = timezone.now() - timezone.timedelta(days=1)
+
+        export = QuoteExport("ndjson", since=since)
+
+        self.assertEqual(len("".join(export).splitlines()), 1)
+        self.assertEqual(export.rows, 1)
+
+    def test_parse_since(self):
+        """A date or a date and time, anything else is an error"""
+
+        self.assertEqual(parse_since("2024-05-01").day, 1)
+        self.assertEqual(parse_since("2024-05-01T10:30").hour, 10)
+        with self.assertRaises(ValueError):
+            parse_since("yesterday")
+
+    def test_gzip(self):
+        """The gzipped output unpacks to the plain one"""
+
+        export = QuoteExport("csv")
+        compressed = b"".join(export.iter_bytes(compress=True))
+
+        self.assertEqual(
+            gzip.decompress(compressed).decode("utf-8"),
+            "".join(QuoteExport("csv")),
+        )
+
+    def test_command_round_trip(self):
+        """An exported file imports back without changes"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "quotes.ndjson")
+            output = io.StringIO()
+            call_command("export_quotes", output=file_path, stdout=output)
+            call_command("import_quotes", file_path, stdout=output)
+
+        self.assertIn("Successfully exported 2 quotes", output.getvalue())
+        self.assertIn("0 inserted, 0 updated", output.getvalue())
+
+    def test_command_stdout(self):
+        """Without --output the export goes to standard output"""
+
+        output = io.StringIO()
+        call_command("export_quotes", format="json", stdout=output)
+
+        self.assertEqual(len(json.loads(output.getvalue())), 2)
+
+    def test_command_gzip_needs_output(self):
+        """Gzipped bytes are not written to the terminal"""
+
+        with self.assertRaises(CommandError):
+            call_command("export_quotes", gzip=True, stdout=io.StringIO())
+
+
+class TestExportView(TestCase):
+    """Class for the export endpoint tests"""
+
+    def setUp(self):
+        """A quote and a superuser"""
+
+        Quote.objects.create(text="Exported")
+        User.objects.create_user(
+            username="test", password="password", is_superuser=True
+        )
+
+    def test_superuser_only(self):
+        """Other users can't export"""
+
+        User.objects.create_user(username="other", password="password")
+        self.client.login(username="other", password="password")
+
+        response = self.client.get(reverse("quote-export"))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_streamed(self):
+        """The export is streamed as an attachment"""
+
+        self.client.login(username="test", password="password")
+
+        response = self.client.get(reverse("quote-export"), {"format": "csv"})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("quotes.csv", response["Content-Disposition"])
+        self.assertIn(
+            "Exported", b"".join(response.streaming_content).decode()
+        )
+
+    def test_gzip(self):
+        """gzip=1 downloads a .gz file"""
+
+        self.client.login(username="test", password="password")
+
+        response = self.client.get(reverse("quote-export"), {"gzip": "1"})
+
+        self.assertIn("quotes.ndjson.gz", response["Content-Disposition"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(json.loads(content)["text"], "Exported")
+
+    def test_bad_parameters(self):
+        """An unknown format or date is a bad request"""
+
+        self.client.login(username="test", password="password")
+
+        for params in ({"format": "xml"}, {"since": "soon"}):
+            response = self.client.get(reverse("quote-export"), params)
+            self.assertEqual(response.status_code, 400)
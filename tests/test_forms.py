@@ -1,6 +1,8 @@
 """File that contains the tests for Django forms"""
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from apps.authors.models import Author
 from apps.quotes.forms import QuoteForm
@@ -39,3 +41,35 @@ class TestForms(TestCase):
         self.assertEqual(
             len(form.errors), 2
         )  # one error per field? but why not 3? ;)
+
+    def test_author_picker_renders_only_the_selected_author(self):
+        """The author select doesn't list every author"""
+
+        Author.objects.bulk_create(
+            Author(name=f"Other {number}") for number in range(10)
+        )
+
+        html = str(QuoteForm(initial={"author": self.author1})["author"])
+
+        self.assertIn(
+            f'<option value="{self.author1.pk}" selected>Test Author 1', html
+        )
+        self.assertNotIn("Other", html)
+        self.assertIn('hx-get="/authors/options"', html)
+        self.assertEqual(html.count("<option"), 2)
+
+    def test_author_validated_by_its_id(self):
+        """Validation looks up only the submitted author"""
+
+        with CaptureQueriesContext(connection) as queries:
+            form = QuoteForm(data={"text": "hello", "author": self.author1.pk})
+            form.is_valid()
+
+        self.assertEqual(form.cleaned_data["author"], self.author1)
+        author_queries = [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"authors_author"' in query["sql"]
+        ]
+        self.assertEqual(len(author_queries), 1)
+        self.assertIn('"authors_author"."id" = ', author_queries[0])
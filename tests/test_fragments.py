@@ -0,0 +1,84 @@
+"""File that contains the tests for the cached quote list items"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.quotes import fragments
+from apps.quotes.models import Quote
+
+
+class TestQuoteListItems(TestCase):
+    """Class for the cached quote list item tests"""
+
+    def setUp(self):
+        """A quote with an author and one without"""
+
+        cache.clear()
+        self.author = Author.objects.create(name="Buddha")
+        self.quote = Quote.objects.create(text="Be kind", author=self.author)
+        self.lonely = Quote.objects.create(text="Nobody said it")
+
+    def render(self):
+        """Render the items of all the quotes, oldest first"""
+
+        return fragments.render_items(
+            Quote.objects.select_related("author").order_by("pk")
+        )
+
+    def test_items_are_rendered_once(self):
+        """The second time the items come from the cache"""
+
+        with mock.patch(
+            "apps.quotes.fragments.render_to_string",
+            wraps=fragments.render_to_string,
+        ) as render_to_string:
+            first = self.render()
+            second = self.render()
+
+        self.assertEqual(render_to_string.call_count, 2)
+        self.assertEqual(first, second)
+        self.assertIn("Be kind", first[0])
+        self.assertIn("Buddha", first[0])
+
+    def test_item_without_author(self):
+        """A quote without an author is rendered as such"""
+
+        self.assertIn("Unknown Author", self.render()[1])
+
+    def test_quote_change_renders_again(self):
+        """A saved quote gets a new key, so the old item isn't served"""
+
+        self.render()
+        key = fragments.item_key(self.quote)
+
+        self.quote.text = "Be kinder"
+        self.quote.save()
+
+        self.assertNotEqual(fragments.item_key(self.quote), key)
+        self.assertIn("Be kinder", self.render()[0])
+
+    def test_author_change_renders_again(self):
+        """Renaming the author changes the items of their quotes"""
+
+        self.render()
+
+        self.author.name = "Gautama"
+        self.author.save()
+
+        self.assertIn("Gautama", self.render()[0])
+        self.assertIn("Unknown Author", self.render()[1])
+
+    def test_list_pages_use_the_items(self):
+        """The list page and its search partial show the items"""
+
+        response = self.client.get(reverse("quote-list"))
+        self.assertContains(response, "Be kind")
+        self.assertContains(response, "Unknown Author")
+
+        response = self.client.get(reverse("quote-list-page"), {"q": "kind"})
+        self.assertContains(response, "Be kind")
+        self.assertNotContains(response, "Nobody said it")
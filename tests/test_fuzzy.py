@@ -0,0 +1,196 @@
+"""File that contains the tests for the fuzzy quote search"""
+
+import io
+import random
+import string
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.quotes import fuzzy, search
+from apps.quotes.importing import import_items
+from apps.quotes.models import Quote, QuoteTrigram
+from apps.quotes.reloading import reload_items
+
+
+class TestTrigrams(TestCase):
+    """Class for the trigram tests"""
+
+    def test_word_trigrams(self):
+        """Words are padded like pg_trgm does"""
+
+        self.assertEqual(
+            fuzzy.word_trigrams("word"),
+            {"  w", " wo", "wor", "ord", "rd "},
+        )
+
+    def test_similarity(self):
+        """A typo keeps a word alike, another word is not"""
+
+        ilusion = fuzzy.word_trigrams("ilusion")
+
+        self.assertEqual(fuzzy.similarity(ilusion, ilusion), 1.0)
+        self.assertGreaterEqual(
+            fuzzy.similarity(ilusion, fuzzy.word_trigrams("ilusoin")), 0.3
+        )
+        self.assertLess(
+            fuzzy.similarity(ilusion, fuzzy.word_trigrams("truth")), 0.1
+        )
+
+
+@override_settings(QUOTES_TRIGRAM_INDEX=True)
+class TestFuzzySearch(TestCase):
+    """Class for the fuzzy quote search tests"""
+
+    def setUp(self):
+        """Quotes with words to misspell"""
+
+        search.clear_search_cache()
+        self.illusion = Quote.objects.create(
+            text="The hard truth is better than the ilusión of everything"
+        )
+        self.words = Quote.objects.create(text="Words can be like X-rays")
+
+    def test_typos_are_found(self):
+        """Misspelt words find the quotes with the right ones"""
+
+        self.assertEqual(fuzzy.fuzzy_quote_ids("ilusoin"), [self.illusion.pk])
+        self.assertEqual(fuzzy.fuzzy_quote_ids("wrds"), [self.words.pk])
+        self.assertEqual(fuzzy.fuzzy_quote_ids("zebra"), [])
+
+    def test_best_match_first(self):
+        """The quote more like the query comes first"""
+
+        close = Quote.objects.create(text="Ilusoin")
+
+        self.assertEqual(
+            fuzzy.fuzzy_quote_ids("ilusoin"), [close.pk, self.illusion.pk]
+        )
+
+    def test_common_trigrams_are_skipped(self):
+        """Trigrams in too many quotes are not used, unless all are"""
+
+        with self.settings(QUOTES_FUZZY_POSTINGS=1):
+            Quote.objects.create(text="The truth")
+            search.clear_search_cache()
+
+            self.assertEqual(
+                fuzzy.fuzzy_quote_ids("ilusoin"), [self.illusion.pk]
+            )
+            # all of its trigrams are in 2 quotes, so only one quote of
+            # each is read
+            self.assertEqual(len(fuzzy.fuzzy_quote_ids("trutj")), 1)
+
+    def test_very_long_query(self):
+        """A query of hundreds of indexed words still gets its results"""
+
+        generator = random.Random(1)
+        words = {
+            "".join(generator.choices(string.ascii_lowercase, k=6))
+            for _ in range(400)
+        }
+        many = Quote.objects.create(text=" ".join(sorted(words)))
+
+        self.assertEqual(
+            fuzzy.fuzzy_quote_ids(" ".join([*words, "ilusoin"])), [many.pk]
+        )
+
+    def test_database_errors(self):
+        """A failing search finds nothing, instead of failing the page"""
+
+        with mock.patch(
+            "apps.quotes.fuzzy._candidates",
+            side_effect=DatabaseError("too many terms"),
+        ), self.assertLogs("apps.quotes.fuzzy", "ERROR"):
+            self.assertEqual(fuzzy.fuzzy_quote_ids("ilusoin"), [])
+
+    def test_index_follows_quote_changes(self):
+        """Saved quotes are reindexed, deleted ones leave the index"""
+
+        self.words.text = "Completely different now"
+        self.words.save()
+
+        self.assertEqual(fuzzy.fuzzy_quote_ids("wrds"), [])
+        self.assertEqual(fuzzy.fuzzy_quote_ids("diferent"), [self.words.pk])
+
+        self.words.delete()
+
+        self.assertFalse(
+            QuoteTrigram.objects.filter(quote_id=self.words.pk).exists()
+        )
+
+    def test_bulk_writes_index_their_quotes(self):
+        """Imports and reloads index the quotes they write, only those"""
+
+        def trigram_ids(quote):
+            return set(
+                QuoteTrigram.objects.filter(quote=quote).values_list(
+                    "pk", flat=True
+                )
+            )
+
+        kept = trigram_ids(self.illusion)
+        import_items(
+            [
+                {"text": self.illusion.text},
+                {"text": "Brave new wrold"},
+            ]
+        )
+
+        self.assertEqual(trigram_ids(self.illusion), kept)
+        self.assertEqual(len(fuzzy.fuzzy_quote_ids("world")), 1)
+
+        with self.assertLogs("apps.quotes.reloading", "INFO"):
+            reload_items(
+                [
+                    {"text": self.illusion.text},
+                    {"text": "Shiny wrods"},
+                ]
+            )
+
+        self.assertEqual(trigram_ids(self.illusion), kept)
+        self.assertEqual(fuzzy.fuzzy_quote_ids("world"), [])
+        self.assertEqual(
+            fuzzy.fuzzy_quote_ids("shiny"),
+            [Quote.objects.get(text="Shiny wrods").pk],
+        )
+
+    def test_rebuild_command(self):
+        """The command indexes all the quotes from scratch"""
+
+        QuoteTrigram.objects.all().delete()
+
+        call_command("rebuild_quote_trigrams", stdout=io.StringIO())
+
+        self.assertEqual(
+            set(QuoteTrigram.objects.values_list("quote_id", flat=True)),
+            {self.illusion.pk, self.words.pk},
+        )
+        self.assertEqual(fuzzy.fuzzy_quote_ids("ilusoin"), [self.illusion.pk])
+
+    def test_list_falls_back_to_fuzzy(self):
+        """The quote list shows close matches when nothing matches exactly"""
+
+        response = self.client.get(reverse("quote-list-page"), {"q": "truht"})
+
+        self.assertContains(response, "these come close")
+        self.assertContains(response, "ilusión")
+
+        response = self.client.get(reverse("quote-list-page"), {"q": "truth"})
+
+        self.assertNotContains(response, "these come close")
+        self.assertContains(response, "ilusión")
+
+    @override_settings(QUOTES_TRIGRAM_INDEX=False)
+    def test_off(self):
+        """Without the index nothing is indexed and nothing found"""
+
+        Quote.objects.create(text="Not indexed")
+
+        self.assertFalse(
+            QuoteTrigram.objects.filter(quote__text="Not indexed").exists()
+        )
+        self.assertEqual(fuzzy.fuzzy_quote_ids("ilusoin"), [])
@@ -0,0 +1,292 @@
+"""File that contains the tests for generating synthetic quotes"""
+
+import datetime
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from apps.authors.models import Author
+from apps.quotes import counters, search
+from apps.quotes.generating import (
+    WORDS,
+    QuoteGenerator,
+    vocabulary,
+    write_to_database,
+    zipf_table,
+)
+from apps.quotes.models import (
+    Quote,
+    QuoteSlot,
+    QuoteTrigram,
+    content_hash_of,
+)
+
+UTC = datetime.timezone.utc
+
+
+class TestQuoteGenerator(TestCase):
+    """Class for the synthetic quote generator tests"""
+
+    def test_same_seed_same_quotes(self):
+        """The seed decides the quotes, nothing else"""
+
+        def generate(seed):
+            return list(QuoteGenerator(seed).quotes(50, list(range(10))))
+
+        self.assertEqual(generate(1), generate(1))
+        self.assertNotEqual(generate(1), generate(2))
+
+    def test_popular_authors(self):
+        """The first author has the most quotes, the last one the fewest"""
+
+        authors = list(range(20))
+        quotes = list(QuoteGenerator(author_skew=1.5).quotes(2000, authors))
+        counts = [0] * len(authors)
+        for _, author, _, _ in quotes:
+            counts[author] += 1
+
+        self.assertEqual(max(counts), counts[0])
+        self.assertGreater(counts[0], 10 * counts[-1])
+
+    def test_even_authors(self):
+        """Without a skew every author gets about as many quotes"""
+
+        quotes = QuoteGenerator(author_skew=0).quotes(2000, [0, 1])
+        first = sum(author == 0 for _, author, _, _ in quotes)
+
+        self.assertAlmostEqual(first / 2000, 0.5, delta=0.05)
+
+    def test_active_ratio(self):
+        """About active_ratio of the quotes are active"""
+
+        quotes = QuoteGenerator(active_ratio=0.2).quotes(2000, [0])
+        active = sum(active for _, _, active, _ in quotes)
+
+        self.assertAlmostEqual(active / 2000, 0.2, delta=0.05)
+
+    def test_dates(self):
+        """The dates grow from since to until"""
+
+        since = datetime.datetime(2020, 1, 1, tzinfo=UTC)
+        until = datetime.datetime(2021, 1, 1, tzinfo=UTC)
+        dates = [
+            date
+            for _, _, _, date in QuoteGenerator(
+                since=since, until=until
+            ).quotes(500, [0])
+        ]
+
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreaterEqual(dates[0], since)
+        self.assertLessEqual(dates[-1], until)
+        self.assertLess(dates[249], datetime.datetime(2020, 7, 2, tzinfo=UTC))
+
+    def test_lengths(self):
+        """The texts are sentences of min_words to max_words words"""
+
+        texts = QuoteGenerator(words=6, min_words=3, max_words=9).texts(500)
+        lengths = {len(text.split()) for text in texts}
+
+        self.assertEqual(min(lengths), 3)
+        self.assertEqual(max(lengths), 9)
+        self.assertTrue(all(text[0].isupper() for text in texts))
+        self.assertTrue(all(text.endswith(".") for text in texts))
+
+    def test_author_names_are_unique(self):
+        """Every author gets a name of their own"""
+
+        names = QuoteGenerator(authors=10000).author_names()
+
+        self.assertEqual(len(set(names)), 10000)
+
+    def test_vocabulary(self):
+        """The real words come first, no word twice"""
+
+        words = vocabulary(1000)
+
+        self.assertEqual(words[: len(WORDS)], WORDS)
+        self.assertEqual(len(set(words)), 1000)
+
+    def test_zipf_table(self):
+        """Every item gets a slot, the first ones most of them"""
+
+        table = zipf_table(["a", "b", "c"], 1.0, 1100)
+
+        self.assertEqual(
+            [table.count(item) for item in "abc"], [600, 300, 200]
+        )
+
+    def test_invalid_options(self):
+        """Options that can't generate anything are rejected"""
+
+        for options in (
+            {"authors": 0},
+            {"min_words": 10, "words": 5},
+            {"active_ratio": 2},
+            {"since": datetime.datetime(2030, 1, 1, tzinfo=UTC)},
+        ):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    QuoteGenerator(**options)
+
+
+class TestWriteToDatabase(TestCase):
+    """Class for the tests of writing generated quotes to the database"""
+
+    def test_write(self):
+        """The quotes and their authors are inserted"""
+
+        stats = write_to_database(QuoteGenerator(authors=5), 120, 50)
+
+        self.assertEqual((stats.rows, stats.inserted), (120, 120))
+        self.assertEqual(Author.objects.count(), 5)
+        quote = Quote.objects.select_related("author").first()
+        self.assertEqual(
+            quote.content_hash,
+            content_hash_of(quote.text, quote.author.full_name),
+        )
+        self.assertEqual(quote.date_created, quote.date_modified)
+
+    def test_derived_data_in_sync(self):
+        """The counters, the slots and the search see the new quotes"""
+
+        there = Quote.objects.create(text="Already there")
+        write_to_database(QuoteGenerator(active_ratio=1), 100, 30)
+
+        self.assertEqual(counters.get_counts(), {"total": 101, "active": 100})
+        self.assertEqual(QuoteSlot.objects.count(), 101)
+        self.assertEqual(
+            sum(Author.objects.values_list("quote_count", flat=True)), 100
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {search.FTS_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 101)
+        quote = Quote.objects.select_related("author").last()
+        self.assertIn(
+            quote.pk, search.search_quote_ids(quote.author.lastname, 500)
+        )
+        self.assertEqual(search.search_quote_ids("already"), [there.pk])
+        self.assertEqual(search.ensure_triggers(), [])
+
+    @override_settings(QUOTES_TRIGRAM_INDEX=True)
+    def test_trigrams_of_the_new_quotes(self):
+        """The new quotes' trigrams are indexed, the others are left be"""
+
+        there = Quote.objects.create(text="Already there")
+        trigram_ids = set(there.trigrams.values_list("pk", flat=True))
+
+        write_to_database(QuoteGenerator(authors=3), 40, 15)
+
+        self.assertEqual(
+            set(there.trigrams.values_list("pk", flat=True)), trigram_ids
+        )
+        self.assertEqual(
+            QuoteTrigram.objects.values("quote").distinct().count(), 41
+        )
+
+    def test_duplicates_are_skipped(self):
+        """The same quotes by the same authors are inserted once"""
+
+        author_ids = list(
+            Author.objects.bulk_create(
+                Author(name=f"Author {number}") for number in range(3)
+            )
+        )
+        author_ids = [author.pk for author in author_ids]
+        write_to_database(QuoteGenerator(7), 50, author_ids=author_ids)
+
+        stats = write_to_database(QuoteGenerator(7), 50, author_ids=author_ids)
+
+        self.assertEqual((stats.inserted, stats.duplicates), (0, 50))
+        self.assertEqual(Quote.objects.count(), 50)
+
+
+class TestGenerateQuotesCommand(TestCase):
+    """Class for the generate_quotes command tests"""
+
+    def test_generate(self):
+        """The quotes are generated into the database"""
+
+        output = io.StringIO()
+        call_command("generate_quotes", "30", authors=4, stdout=output)
+
+        self.assertIn("Successfully generated 30 quotes", output.getvalue())
+        self.assertEqual(Quote.objects.count(), 30)
+        self.assertEqual(Author.objects.count(), 4)
+
+    @override_settings(QUOTES_TRIGRAM_INDEX=True)
+    def test_trigrams_are_skipped(self):
+        """The trigrams are indexed only with --no-skip-trigrams"""
+
+        output = io.StringIO()
+        call_command("generate_quotes", "20", seed=1, stdout=output)
+
+        self.assertIn("rebuild_quote_trigrams", output.getvalue())
+        self.assertFalse(QuoteTrigram.objects.exists())
+
+        output = io.StringIO()
+        call_command(
+            "generate_quotes",
+            "20",
+            seed=2,
+            skip_trigrams=False,
+            stdout=output,
+        )
+
+        self.assertNotIn("rebuild_quote_trigrams", output.getvalue())
+        self.assertEqual(
+            QuoteTrigram.objects.values("quote").distinct().count(), 20
+        )
+
+    def test_ndjson_imports(self):
+        """The NDJSON file imports as the same quotes"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "quotes.ndjson")
+            call_command(
+                "generate_quotes",
+                "25",
+                authors=3,
+                since="2020-01-01",
+                output=file_path,
+                stdout=io.StringIO(),
+            )
+            with open(file_path, encoding="utf-8") as file:
+                items = [json.loads(line) for line in file]
+            call_command("import_quotes", file_path, stdout=io.StringIO())
+
+        self.assertEqual(len(items), 25)
+        self.assertEqual(Quote.objects.count(), 25)
+        self.assertLessEqual(Author.objects.count(), 3)
+        self.assertEqual(
+            Quote.objects.filter(active=True).count(),
+            sum(item["active"] for item in items),
+        )
+        self.assertGreaterEqual(
+            Quote.objects.earliest("date_created").date_created,
+            datetime.datetime(2020, 1, 1, tzinfo=UTC),
+        )
+
+    def test_invalid_options(self):
+        """Invalid options are command errors"""
+
+        for options in (
+            {"since": "yesterday"},
+            {"min_words": 20},
+            {"authors": 0},
+        ):
+            with self.subTest(options=options):
+                with self.assertRaises(CommandError):
+                    call_command(
+                        "generate_quotes",
+                        "10",
+                        stdout=io.StringIO(),
+                        **options,
+                    )
+        with self.assertRaises(CommandError):
+            call_command("generate_quotes", "-1", stdout=io.StringIO())
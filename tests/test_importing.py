@@ -0,0 +1,445 @@
+"""File that contains the tests for importing quotes"""
+
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.authors.models import Author
+from apps.quotes import counters, reloading, search
+from apps.quotes.forms import QuoteForm
+from apps.quotes.importing import AuthorResolver, iter_json_array
+from apps.quotes.models import Quote, QuoteSlot, content_hash_of
+
+
+class TestJsonStreaming(TestCase):
+    """Class for the incremental JSON reader tests"""
+
+    def test_items_split_between_reads(self):
+        """Items are found even when every read returns a few characters"""
+
+        data = [{"text": "a, [b]", "author": ""}, 12345, "x", [1, {"y": 2}]]
+        file = io.StringIO(json.dumps(data, indent=4))
+
+        self.assertEqual(list(iter_json_array(file, read_size=3)), data)
+
+    def test_empty_array(self):
+        """An empty array has no items"""
+
+        self.assertEqual(list(iter_json_array(io.StringIO(" [ ] "))), [])
+
+    def test_not_an_array(self):
+        """Anything else than an array is an error"""
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"text": "a"}')))
+
+    def test_trailing_comma(self):
+        """A trailing comma is an error, just like for json.load"""
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"text": "a"}, ]')))
+
+    def test_truncated_array(self):
+        """A file that ends in the middle of the array is an error"""
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"text": "a"}, ')))
+
+
+class TestImportQuotes(TestCase):
+    """Class for the import_quotes command tests"""
+
+    def import_file(self, items, suffix=".json", **options):
+        """Write the items to a temporary file and import it"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, f"quotes{suffix}")
+            with open(file_path, "w", encoding="utf-8") as file:
+                if suffix == ".ndjson":
+                    file.writelines(json.dumps(item) + "\n" for item in items)
+                else:
+                    json.dump(items, file)
+            output = io.StringIO()
+            call_command(
+                "import_quotes",
+                file_path,
+                batch_size=2,
+                stdout=output,
+                **options,
+            )
+        return output.getvalue()
+
+    def test_import(self):
+        """Quotes and their authors are imported, authors only once"""
+
+        output = self.import_file(
+            [
+                {"text": "One", "author": "Buddha", "date_created": ""},
+                {"text": "Two", "author": "", "date_created": ""},
+                {"text": "Three", "author": "Buddha", "date_created": ""},
+            ]
+        )
+
+        self.assertIn("rows/s", output)
+        self.assertEqual(Quote.objects.count(), 3)
+        self.assertEqual(Author.objects.get().name, "Buddha")
+        self.assertEqual(
+            Quote.objects.filter(author__name="Buddha").count(), 2
+        )
+        self.assertIsNone(Quote.objects.get(text="Two").author)
+
+    def test_import_ndjson(self):
+        """Newline delimited JSON files are read too"""
+
+        self.import_file([{"text": "One", "author": "Buddha"}], ".ndjson")
+
+        self.assertEqual(Quote.objects.get().author.name, "Buddha")
+
+    def test_import_keeps_derived_data_in_sync(self):
+        """Slots and counts are rebuilt after the bulk insert"""
+
+        self.import_file([{"text": f"Quote {n}"} for n in range(5)])
+
+        self.assertEqual(QuoteSlot.objects.count(), 5)
+        self.assertEqual(counters.get_counts()["total"], 5)
+
+    def test_import_bundled_file(self):
+        """The quotes.json that comes with the command imports"""
+
+        call_command("import_quotes", stdout=io.StringIO())
+
+        self.assertGreater(Quote.objects.count(), 100)
+
+    def test_reimport_writes_nothing(self):
+        """Importing the same file again doesn't touch the database"""
+
+        items = [
+            {"text": f"Quote {n}", "author": "Buddha", "date_created": ""}
+            for n in range(5)
+        ]
+        self.import_file(items)
+        ids = set(Quote.objects.values_list("pk", flat=True))
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.import_file(items)
+
+        writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+        self.assertIn("5 unchanged", output)
+        self.assertEqual(set(Quote.objects.values_list("pk", flat=True)), ids)
+
+    def test_sync_changes(self):
+        """Only new and changed quotes are written, existing ids are kept"""
+
+        self.import_file([{"text": "One"}, {"text": "Two", "active": False}])
+        two = Quote.objects.get(text="Two")
+
+        output = self.import_file(
+            [
+                {"text": "Two", "active": True},
+                {"text": "Three"},
+                # the same quote, only spelled differently
+                {"text": "  three "},
+            ]
+        )
+
+        self.assertIn("1 inserted, 1 updated, 0 deleted", output)
+        self.assertIn("1 duplicates", output)
+        self.assertTrue(Quote.objects.get(pk=two.pk).active)
+        self.assertGreater(
+            Quote.objects.get(pk=two.pk).date_modified, two.date_modified
+        )
+        self.assertEqual(Quote.objects.count(), 3)
+
+    def test_sync_delete(self):
+        """With --delete the quotes that are not in the file are deleted"""
+
+        self.import_file([{"text": "One"}, {"text": "Two"}])
+
+        self.import_file([{"text": "Two"}], delete=True)
+
+        self.assertEqual(Quote.objects.get().text, "Two")
+        self.assertEqual(QuoteSlot.objects.count(), 1)
+        self.assertEqual(counters.get_counts()["total"], 1)
+
+    def test_dry_run(self):
+        """A dry run reports the changes, but makes none"""
+
+        Quote.objects.create(text="Old")
+
+        output = self.import_file(
+            [{"text": "New", "author": "Buddha"}], delete=True, dry_run=True
+        )
+
+        self.assertIn("1 inserted, 0 updated, 1 deleted", output)
+        self.assertEqual(Quote.objects.get().text, "Old")
+        self.assertFalse(Author.objects.exists())
+
+    def test_dates_are_imported(self):
+        """The date_created of the file is kept"""
+
+        self.import_file([{"text": "One", "date_created": "2020-01-02"}])
+
+        self.assertEqual(Quote.objects.get().date_created.year, 2020)
+
+    def test_malformed_items(self):
+        """A malformed item stops the import, named by its index"""
+
+        for item, error in (
+            ({"author": "Buddha"}, "Item 2: Missing text"),
+            ({"text": "Three", "date_created": "nope"}, "Item 2: Invalid"),
+            ({"text": "Three", "active": "yes"}, "Item 2: Invalid active"),
+            ("Three", "Item 2: Expected an object"),
+        ):
+            with self.subTest(item=item):
+                with self.assertRaisesMessage(CommandError, error):
+                    self.import_file(
+                        [{"text": "One"}, {"text": "Two"}, item],
+                        suffix=".ndjson",
+                    )
+
+        # the batch before the malformed item is imported
+        self.assertEqual(Quote.objects.count(), 2)
+
+    def test_author_resolver_reuses_existing_authors(self):
+        """Authors already in the database are not created again"""
+
+        existing = Author.objects.create(name="Buddha")
+        resolver = AuthorResolver()
+
+        resolver.resolve(["Buddha", "Huxley", "Huxley", ""])
+
+        self.assertEqual(resolver.get("Buddha"), existing.pk)
+        self.assertEqual(Author.objects.filter(name="Huxley").count(), 1)
+        self.assertIsNone(resolver.get(""))
+
+    def test_authors_with_a_lastname(self):
+        """An author is matched by their full name, the import repeats"""
+
+        author = Author.objects.create(name="Zed", lastname="Zedson")
+        quote = Quote.objects.create(text="Unique test line.", author=author)
+
+        output = self.import_file(
+            [{"text": "Unique test line.", "author": "Zed Zedson"}]
+        )
+
+        self.assertIn("0 inserted, 0 updated, 0 deleted, 1 unchanged", output)
+        self.assertEqual(Quote.objects.get(), quote)
+
+        self.import_file([{"text": "Unique test line.", "author": "Zed"}])
+        output = self.import_file(
+            [{"text": "Unique test line.", "author": "Zed"}]
+        )
+
+        self.assertIn("0 inserted, 0 updated, 0 deleted, 1 unchanged", output)
+        zed = Quote.objects.exclude(pk=quote.pk).get().author
+        self.assertNotEqual(zed, author)
+        self.assertEqual(zed.full_name, "Zed")
+
+
+class TestReloadQuotes(TestCase):
+    """Class for the import_quotes --reload tests"""
+
+    def setUp(self):
+        """Quotes that are (and aren't) in the reloaded file"""
+
+        self.author = Author.objects.create(name="Buddha")
+        self.kept = Quote.objects.create(text="Kept", author=self.author)
+        self.gone = Quote.objects.create(text="Gone")
+
+    def reload(self, items, **options):
+        """Reload from a temporary file with the items"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "quotes.json")
+            with open(file_path, "w", encoding="utf-8") as file:
+                json.dump(items, file)
+            output = io.StringIO()
+            call_command(
+                "import_quotes",
+                file_path,
+                reload=True,
+                batch_size=2,
+                stdout=output,
+                **options,
+            )
+        return output.getvalue()
+
+    def test_reload(self):
+        """The file replaces the corpus, known quotes keep their ids"""
+
+        with self.assertLogs("apps.quotes.reloading", "INFO"):
+            output = self.reload(
+                [
+                    {"text": "Kept", "author": "Buddha", "active": True},
+                    {"text": "New words", "author": "Huxley"},
+                ]
+            )
+
+        self.assertIn("1 inserted, 1 updated, 1 deleted", output)
+        self.assertIn("swapped in", output)
+        self.assertFalse(Quote.objects.filter(pk=self.gone.pk).exists())
+        kept = Quote.objects.get(pk=self.kept.pk)
+        self.assertTrue(kept.active)
+        self.assertEqual(kept.author, self.author)
+        new = Quote.objects.get(text="New words")
+        self.assertGreater(new.pk, self.gone.pk)
+        self.assertEqual(new.author.name, "Huxley")
+        self.assertEqual(
+            new.content_hash, content_hash_of("New words", "Huxley")
+        )
+
+    def test_reload_keeps_authors_with_a_lastname(self):
+        """An author is matched by their full name, and keeps their id"""
+
+        author = Author.objects.create(name="Aldous", lastname="Huxley")
+        Quote.objects.create(text="Brave", author=author)
+
+        with self.assertLogs("apps.quotes.reloading", "INFO"):
+            self.reload([{"text": "Brave", "author": "Aldous Huxley"}])
+
+        self.assertEqual(Author.objects.get(), author)
+        self.assertEqual(Quote.objects.get().author, author)
+
+    def test_quote_saved_while_staging(self):
+        """The new quotes get ids the quotes saved meanwhile don't have"""
+
+        swap = reloading._swap  # pylint: disable=protected-access
+        saved = []
+
+        def save_then_swap(stager):
+            saved.append(
+                Quote.objects.create(
+                    text="Saved meanwhile",
+                    author=Author.objects.create(name="Admin"),
+                )
+            )
+            swap(stager)
+
+        with mock.patch(
+            "apps.quotes.reloading._swap", side_effect=save_then_swap
+        ), self.assertLogs("apps.quotes.reloading", "INFO"):
+            self.reload([{"text": "New words", "author": "Huxley"}])
+
+        new = Quote.objects.get()
+        self.assertEqual(new.text, "New words")
+        self.assertEqual(new.author.name, "Huxley")
+        self.assertGreater(new.pk, saved[0].pk)
+        self.assertGreater(new.author.pk, saved[0].author.pk)
+
+    def test_reload_keeps_derived_data_in_sync(self):
+        """Slots, counts and the search index follow the swap"""
+
+        with self.assertLogs("apps.quotes.reloading", "INFO"):
+            self.reload([{"text": "Kept", "author": "Buddha"}, {"text": "Hi"}])
+
+        self.assertEqual(
+            set(QuoteSlot.objects.values_list("slot", flat=True)), {0, 1}
+        )
+        self.assertEqual(counters.get_counts()["total"], 2)
+        self.assertEqual(search.search_quote_ids("gone"), [])
+        self.assertEqual(len(search.search_quote_ids("hi")), 1)
+
+    def test_reload_empty_file(self):
+        """An empty file is refused, instead of emptying the site"""
+
+        with self.assertRaises(CommandError):
+            self.reload([])
+
+        self.assertEqual(Quote.objects.count(), 2)
+
+    def test_reload_malformed_item(self):
+        """A malformed item is refused, nothing is changed"""
+
+        with self.assertRaisesMessage(CommandError, "Item 1: Missing text"):
+            self.reload([{"text": "Kept"}, {"text": ""}])
+
+        self.assertEqual(Quote.objects.count(), 2)
+        self.assertEqual(Quote.objects.get(pk=self.gone.pk).text, "Gone")
+
+    def test_failed_swap_changes_nothing(self):
+        """The swap is all or nothing"""
+
+        with mock.patch(
+            "apps.quotes.reloading._upsert_staged",
+            side_effect=DatabaseError("disk full"),
+        ):
+            with self.assertRaises(DatabaseError):
+                self.reload([{"text": "New"}])
+
+        self.assertEqual(
+            set(Quote.objects.values_list("pk", flat=True)),
+            {self.kept.pk, self.gone.pk},
+        )
+        self.assertEqual(Author.objects.get(), self.author)
+
+    def test_reload_dry_run(self):
+        """A dry run stages and reports, but doesn't swap"""
+
+        output = self.reload([{"text": "New"}], dry_run=True)
+
+        self.assertIn("1 inserted, 0 updated, 2 deleted", output)
+        self.assertEqual(Quote.objects.count(), 2)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_temp_master")
+            self.assertEqual(cursor.fetchall(), [])
+
+
+class TestContentHash(TestCase):
+    """Class for the quote content hash tests"""
+
+    def test_hash_follows_author_rename(self):
+        """Renaming an author updates the hashes of their quotes"""
+
+        author = Author.objects.create(name="Budha")
+        quote = Quote.objects.create(text="One", author=author)
+
+        author.name = "Buddha"
+        author.save()
+
+        quote.refresh_from_db()
+        self.assertEqual(quote.content_hash, content_hash_of("One", "Buddha"))
+
+    def test_hash_follows_author_delete(self):
+        """Quotes of a deleted author are hashed as quotes without one"""
+
+        author = Author.objects.create(name="Buddha")
+        quote = Quote.objects.create(text="One", author=author)
+
+        author.delete()
+
+        quote.refresh_from_db()
+        self.assertEqual(quote.content_hash, content_hash_of("One", ""))
+
+    def test_duplicate_after_author_delete(self):
+        """A quote that becomes a duplicate is left without a hash"""
+
+        Quote.objects.create(text="One")
+        author = Author.objects.create(name="Buddha")
+        quote = Quote.objects.create(text="One", author=author)
+
+        author.delete()
+
+        quote.refresh_from_db()
+        self.assertIsNone(quote.content_hash)
+
+    def test_form_rejects_duplicates(self):
+        """The quote form doesn't allow adding the same quote twice"""
+
+        author = Author.objects.create(name="Buddha")
+        quote = Quote.objects.create(text="One", author=author)
+        data = {"text": " one", "author": author.pk}
+
+        self.assertFalse(QuoteForm(data).is_valid())
+        self.assertTrue(QuoteForm(data, instance_pk=quote.pk).is_valid())
@@ -0,0 +1,137 @@
+"""File that contains the tests for the database indexes"""
+
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ag_mixins import AgKeysetPaginationMixin
+from apps.authors.models import Author
+from apps.quotes.models import Quote
+
+TABLES = ("quotes_quote", "authors_author")
+
+
+class TestIndexes(TestCase):
+    """
+    Class for the tests of the views' access paths: the main queries of the
+    views are searches of an index, or scans of an index in the order asked
+    for - never a full table scan or a sort of the whole table.
+    """
+
+    def setUp(self):
+        """Quotes of a few authors, active and not"""
+
+        self.author = Author.objects.create(name="Aldous", lastname="Huxley")
+        other = Author.objects.create(name="Buddha")
+        for number in range(6):
+            Quote.objects.create(
+                text=f"Quote {number}",
+                author=self.author if number % 2 else other,
+                active=bool(number % 3),
+            )
+
+    def plans_of(self, url):
+        """
+        GET the url, and EXPLAIN QUERY PLAN its SELECTs of quotes and
+        authors.
+
+        Returns:
+            list: The plans, every one a list of its lines.
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        for query in queries.captured_queries:
+            if query["sql"].startswith("SELECT") and any(
+                f'FROM "{table}"' in query["sql"] for table in TABLES
+            ):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append([row[-1] for row in cursor.fetchall()])
+        return plans
+
+    def assert_indexed(self, url, *indexes):
+        """The url's queries go through indexes (these ones among them)"""
+
+        plans = self.plans_of(url)
+        self.assertTrue(plans, url)
+        for plan in plans:
+            for line in plan:
+                if any(f" {table} " in f"{line} " for table in TABLES):
+                    self.assertTrue(
+                        line.startswith("SEARCH") or "USING INDEX" in line,
+                        plan,
+                    )
+                self.assertNotIn("TEMP B-TREE", line, plan)
+        lines = " ".join(line for plan in plans for line in plan)
+        for index in indexes:
+            self.assertIn(index, lines, plans)
+
+    def test_quote_list(self):
+        """The quote list is read in the order of the date index"""
+
+        self.assert_indexed(reverse("quote-list"), "quotes_created_idx")
+        self.assert_indexed(reverse("api-quote-list"), "quotes_created_idx")
+
+    def test_quote_list_next_page(self):
+        """The next page starts with a search of the date index"""
+
+        with mock.patch.object(AgKeysetPaginationMixin, "page_size", 2):
+            response = self.client.get(reverse("quote-list"))
+            plans = self.plans_of(response.context["next_page_url"])
+
+        self.assertIn("SEARCH quotes_quote USING INDEX", plans[0][0])
+        self.assertIn("quotes_created_idx (date_created>?)", plans[0][0])
+
+    def test_author_quotes(self):
+        """The quotes of an author come from the author + date index"""
+
+        self.assert_indexed(
+            reverse("author-detail", args=[self.author.pk]),
+            "quotes_author_created_idx",
+        )
+        self.assert_indexed(
+            f"{reverse('api-quote-list')}?author={self.author.pk}",
+            "quotes_author_created_idx",
+        )
+
+    def test_author_list(self):
+        """The author list is read in the order of an index"""
+
+        self.assert_indexed(reverse("author-list"), "authors_popular_idx")
+        self.assert_indexed(
+            f"{reverse('author-list')}?sort=date", "authors_created_idx"
+        )
+        self.assert_indexed(reverse("api-author-list"), "authors_created_idx")
+
+    def test_active_search(self):
+        """active: searches read the partial index of their kind of quotes"""
+
+        url = reverse("quote-list-page")
+
+        self.assert_indexed(f"{url}?q=active%3Atrue", "quotes_active_created")
+        self.assert_indexed(
+            f"{url}?q=active%3Afalse", "quotes_inactive_created"
+        )
+
+    def test_author_search(self):
+        """author: looks the authors up case insensitively, by index"""
+
+        url = f"{reverse('quote-list-page')}?q=author%3AHUXLEY"
+
+        self.assert_indexed(
+            url, "authors_lastname_lower_idx", "quotes_author_created_idx"
+        )
+
+    def test_author_by_name(self):
+        """The importers' author lookups search the name index"""
+
+        plan = Author.objects.filter(name__in=["Buddha", "Huxley"]).explain()
+
+        self.assertIn("USING INDEX authors_name_idx", plan)
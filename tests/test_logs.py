@@ -0,0 +1,159 @@
+"""File that contains the tests for the queued logging pipeline"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from project.logs import QueueLogHandler, log_queue_stats, prune_logs
+
+
+class TestQueueLogHandler(SimpleTestCase):
+    """Class for the queued logging pipeline tests"""
+
+    def setUp(self):
+        """A logger of its own, writing to a file of its own"""
+
+        # pylint: disable=consider-using-with
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "test.jsonl")
+        self.logger = logging.getLogger("tests.test_logs")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def handler(self, **kwargs):
+        """A handler for the logger, closed after the test"""
+
+        handler = QueueLogHandler(self.filename, **kwargs)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return handler
+
+    def entries(self):
+        """The JSON lines in the file"""
+
+        with open(self.filename, encoding="utf-8") as file:
+            return [json.loads(line) for line in file]
+
+    def test_written_as_json(self):
+        """The listener writes the records as JSON lines"""
+
+        handler = self.handler()
+        user = ["Buddha"]
+        self.logger.info(
+            "Index view accessed by user: %s", user, extra={"pk": 7}
+        )
+        # changed after the call, the record has the message as it was
+        user[0] = "Changed"
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            self.logger.exception("Failed")
+        handler.stop_listener()
+
+        first, second = self.entries()
+        self.assertEqual(
+            first["message"], "Index view accessed by user: ['Buddha']"
+        )
+        self.assertEqual(first["level"], "INFO")
+        self.assertEqual(first["logger"], "tests.test_logs")
+        self.assertEqual(first["pk"], 7)
+        self.assertIn("ValueError: broken", second["exception"])
+
+    def test_drop_policy(self):
+        """A full queue drops the records right away, and counts them"""
+
+        handler = self.handler(maxsize=1)
+        # nothing takes the records off the queue any more
+        handler.stop_listener()
+        dropped = log_queue_stats()["dropped"]
+
+        started = time.perf_counter()
+        for number in range(3):
+            self.logger.info("Record %s", number)
+
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(log_queue_stats()["dropped"], dropped + 2)
+
+    def test_block_policy(self):
+        """A full queue makes the record wait, then drops it"""
+
+        handler = self.handler(maxsize=1, policy="block", block_timeout=0.05)
+        handler.stop_listener()
+
+        started = time.perf_counter()
+        self.logger.info("Queued")
+        self.logger.info("Dropped")
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_file_per_process(self):
+        """A {pid} in the filename is the process's id"""
+
+        self.filename = self.filename.replace(".jsonl", ".{pid}.jsonl")
+        handler = self.handler()
+        self.logger.info("Mine")
+        handler.stop_listener()
+        self.filename = self.filename.replace("{pid}", str(os.getpid()))
+
+        self.assertEqual(self.entries()[0]["message"], "Mine")
+
+    def test_restart_in_child(self):
+        """A forked process writes its records to a file of its own"""
+
+        self.filename = self.filename.replace(".jsonl", ".{pid}.jsonl")
+        handler = self.handler()
+        parent_listener = handler.listener
+        # what the fork does to the handler, the child being process 7
+        with mock.patch("os.getpid", return_value=7):
+            handler.restart_in_child()
+        self.logger.info("Child's")
+        handler.stop_listener()
+        parent_listener.stop()
+        self.filename = self.filename.replace("{pid}", "7")
+
+        self.assertIsNot(handler.listener, parent_listener)
+        self.assertEqual(self.entries()[0]["message"], "Child's")
+
+    def test_gone_processes_logs_pruned(self):
+        """Of the gone processes' logs, the newest backup_count are kept"""
+
+        directory = os.path.dirname(self.filename)
+        names = [
+            "test.1.jsonl",
+            "test.1.jsonl.1",
+            "test.2.jsonl",
+            "test.3.jsonl",
+            f"test.{os.getpid()}.jsonl",
+            "other.1.jsonl",
+        ]
+        for age, name in enumerate(reversed(names)):
+            path = os.path.join(directory, name)
+            with open(path, "w", encoding="utf-8"):
+                pass
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        with mock.patch(
+            "project.logs.process_alive",
+            side_effect=lambda pid: pid == os.getpid(),
+        ):
+            prune_logs(os.path.join(directory, "test.{pid}.jsonl"), 1)
+
+        self.assertEqual(
+            set(os.listdir(directory)),
+            {"other.1.jsonl", "test.3.jsonl", f"test.{os.getpid()}.jsonl"},
+        )
+
+    def test_unknown_policy(self):
+        """Only the known policies are taken"""
+
+        with self.assertRaises(ValueError):
+            QueueLogHandler(self.filename, policy="wait")
@@ -0,0 +1,238 @@
+"""File that contains the tests for the request metrics"""
+
+import glob
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.metrics import collector
+from apps.metrics.middleware import install_query_timer, time_queries
+from apps.quotes.models import Quote
+
+
+def sample(text, line_start):
+    """The value of the exposition line that starts with line_start"""
+
+    for line in text.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+@override_settings(METRICS_TOKEN="secret", METRICS_DIR=None)
+class TestMetrics(TestCase):
+    """Class for the request metrics tests"""
+
+    def setUp(self):
+        """Fresh totals and a quote by an author"""
+
+        collector.reset()
+        author = Author.objects.create(name="Buddha")
+        Quote.objects.create(text="Measured", author=author)
+
+    def scrape(self):
+        """Get /metrics with the token"""
+
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_counted(self):
+        """A view's requests show up in its histogram, size and queries"""
+
+        self.client.get(reverse("quote-list"))
+        self.client.get(reverse("quote-list"))
+
+        text = self.scrape()
+        labels = '{view="quote-list",method="GET"}'
+        self.assertEqual(
+            sample(text, f"quotes_request_duration_seconds_count{labels}"), 2
+        )
+        self.assertEqual(
+            sample(
+                text,
+                'quotes_request_duration_seconds_bucket{view="quote-list",'
+                'method="GET",le="+Inf"}',
+            ),
+            2,
+        )
+        self.assertGreater(
+            sample(text, f"quotes_response_size_bytes_sum{labels}"), 0
+        )
+        self.assertGreater(sample(text, f"quotes_db_queries_total{labels}"), 0)
+        self.assertEqual(
+            sample(
+                text,
+                'quotes_requests_total{view="quote-list",method="GET",'
+                'status="200"}',
+            ),
+            2,
+        )
+
+    def test_unresolved(self):
+        """The requests to urls of no view are counted together"""
+
+        self.client.get("/no/such/page")
+
+        self.assertEqual(
+            sample(
+                self.scrape(),
+                'quotes_requests_total{view="unresolved",method="GET",'
+                'status="404"}',
+            ),
+            1,
+        )
+
+    def test_protected(self):
+        """Without the token or a superuser, /metrics is forbidden"""
+
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_AUTHORIZATION="Bearer wrong"
+            ).status_code,
+            403,
+        )
+
+        User.objects.create_user(username="test", password="password")
+        self.client.login(username="test", password="password")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        User.objects.create_superuser(username="admin", password="password")
+        self.client.login(username="admin", password="password")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    def test_buckets(self):
+        """The buckets are cumulative, a request counts in its and above"""
+
+        collector.observe("view", "GET", 200, 0.02)
+        collector.observe("view", "GET", 200, 3.0)
+        text = collector.render(collector.collect())
+
+        def bucket(bound):
+            return sample(
+                text,
+                "quotes_request_duration_seconds_bucket"
+                f'{{view="view",method="GET",le="{bound}"}}',
+            )
+
+        self.assertEqual(bucket(0.01), 0)
+        self.assertEqual(bucket(0.025), 1)
+        self.assertEqual(bucket(2.5), 1)
+        self.assertEqual(bucket(5.0), 2)
+        self.assertEqual(bucket("+Inf"), 2)
+
+    def test_label_values_escaped(self):
+        """Quotes and backslashes in label values are escaped"""
+
+        collector.observe('a"b\\c', "GET", 200, 0.001)
+
+        self.assertIn(
+            'view="a\\"b\\\\c"', collector.render(collector.collect())
+        )
+
+    def test_processes_added_up(self):
+        """With METRICS_DIR the totals of all the processes are added up"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            other = collector.Metrics()
+            other.observe("quote-list", "GET", 200, 0.001, (None, 3, 0.0))
+            other.flush(directory)
+            # a half written file of a process is skipped
+            with open(
+                os.path.join(directory, "broken.json"), "w", encoding="utf-8"
+            ) as file:
+                file.write('{"requests": [')
+
+            with self.settings(METRICS_DIR=directory), self.assertLogs(
+                "apps.metrics.collector", "WARNING"
+            ):
+                collector.observe(
+                    "quote-list", "GET", 200, 0.001, (None, 2, 0.0)
+                )
+                snapshot = collector.collect()
+
+            self.assertEqual(len(glob.glob(f"{directory}/*.json")), 3)
+            with open(
+                os.path.join(directory, f"{other.name}.json"),
+                encoding="utf-8",
+            ) as file:
+                self.assertEqual(len(json.load(file)["requests"]), 1)
+
+        (view, method, totals) = snapshot["requests"][0]
+        self.assertEqual((view, method), ("quote-list", "GET"))
+        self.assertEqual(totals[collector.COUNT], 2)
+        self.assertEqual(totals[collector.QUERIES], 5)
+
+    def test_gone_processes_retired(self):
+        """The counters of a gone process stay, its gauges and file don't"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            gone = collector.Metrics()
+            gone.observe("quote-list", "GET", 200, 0.001, (None, 3, 0.0))
+            gone.flush(directory)
+            path = os.path.join(directory, f"{gone.name}.json")
+            with open(path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+            snapshot["samples"] = [
+                ["quotes_log_records_queued", {}, 7],
+                ["quotes_log_records_dropped_total", {}, 2],
+            ]
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(snapshot, file)
+            old = os.stat(path).st_mtime - 5 * collector.flush_interval()
+            os.utime(path, (old, old))
+
+            with self.settings(METRICS_DIR=directory):
+                collector.observe(
+                    "quote-list", "GET", 200, 0.001, (None, 2, 0.0)
+                )
+                first = collector.collect()
+                second = collector.collect()
+
+            self.assertFalse(os.path.exists(path))
+            self.assertTrue(
+                os.path.exists(os.path.join(directory, "retired.json"))
+            )
+
+        for snapshot in (first, second):
+            with self.subTest(snapshot=snapshot):
+                totals = snapshot["requests"][0][2]
+                self.assertEqual(totals[collector.COUNT], 2)
+                self.assertEqual(totals[collector.QUERIES], 5)
+                samples = {
+                    name: value for name, _, value in snapshot["samples"]
+                }
+                self.assertEqual(
+                    samples["quotes_log_records_dropped_total"], 2
+                )
+                # this process's queue only
+                self.assertLess(samples["quotes_log_records_queued"], 7)
+
+    def test_query_timer_outlives_wrapper_blocks(self):
+        """A connection opened in a wrapper block keeps the query timer"""
+
+        def counter(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        class Connection:  # pylint: disable=too-few-public-methods
+            """The wrappers of a connection opened in a block"""
+
+            execute_wrappers = [counter]
+
+        connection = Connection()
+        install_query_timer(None, connection)
+        # what the block does when it ends
+        connection.execute_wrappers.pop()
+
+        self.assertEqual(connection.execute_wrappers, [time_queries])
@@ -0,0 +1,143 @@
+"""File that contains the tests for the anonymous page cache"""
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.views import View
+
+from ag_mixins import AgAnonymousCacheMixin, ag_cache_stats
+from apps.authors.models import Author
+from apps.quotes.models import Quote
+from apps.quotes.signals import quotes_bulk_changed
+
+
+class CsrfTokenView(AgAnonymousCacheMixin, View):
+    """A view with a form (a CSRF token) in its page"""
+
+    cache_namespaces = ("quotes",)
+
+    def get(self, request):
+        """Render the token"""
+        return HttpResponse(get_token(request))
+
+    def dispatch(self, request, *args, **kwargs):
+        """No middleware here, so set the user the mixin asks about"""
+        request.user = AnonymousUser()
+        return super().dispatch(request, *args, **kwargs)
+
+
+class TestPageCache(TestCase):
+    """Class for the anonymous page cache tests"""
+
+    def setUp(self):
+        """A quote by an author"""
+
+        self.author = Author.objects.create(name="Buddha")
+        self.quote = Quote.objects.create(text="Cached", author=self.author)
+
+    def test_second_request_is_a_hit(self):
+        """A repeated anonymous request is served without queries"""
+
+        url = reverse("quote-list")
+        first = self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+
+        self.assertEqual(first["X-Cache"], "miss")
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertGreaterEqual(ag_cache_stats()["QuoteListView"]["hit"], 1)
+
+    def test_quote_save_invalidates(self):
+        """Saving a quote makes the pages that show it misses"""
+
+        url = reverse("quote-detail", kwargs={"pk": self.quote.pk})
+        self.client.get(url)
+
+        self.quote.text = "Changed"
+        self.quote.save()
+        response = self.client.get(url)
+
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertContains(response, "Changed")
+
+    def test_quote_delete_invalidates(self):
+        """Deleting a quote takes it off the cached author page"""
+
+        url = reverse("author-detail", kwargs={"pk": self.author.pk})
+        self.client.get(url)
+
+        self.quote.delete()
+
+        self.assertNotContains(self.client.get(url), "Cached")
+
+    def test_author_save_invalidates(self):
+        """Renaming an author changes the cached quote pages"""
+
+        url = reverse("quote-list")
+        self.client.get(url)
+
+        self.author.name = "Gautama"
+        self.author.save()
+
+        self.assertContains(self.client.get(url), "Gautama")
+
+    def test_bulk_change_invalidates(self):
+        """Bulk imports invalidate the pages too"""
+
+        url = reverse("author-list")
+        self.client.get(url)
+
+        Author.objects.bulk_create([Author(name="Huxley")])
+        quotes_bulk_changed.send(sender=Quote)
+
+        self.assertContains(self.client.get(url), "Huxley")
+
+    def test_unrelated_change_keeps_cache(self):
+        """A quote change doesn't invalidate the author list"""
+
+        url = reverse("author-list")
+        self.client.get(url)
+
+        Quote.objects.create(text="Another")
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "hit")
+
+    def test_logged_in_users_not_cached(self):
+        """Pages of logged in users are always rendered"""
+
+        User.objects.create_user(username="test", password="password")
+        self.client.login(username="test", password="password")
+        url = reverse("quote-list")
+
+        self.client.get(url)
+        response = self.client.get(url)
+
+        self.assertFalse(response.has_header("X-Cache"))
+
+    def test_search_partial_cached(self):
+        """Search results (a GET partial) are cached"""
+
+        url = f"{reverse('quote-list-page')}?q=cached"
+        self.client.get(url)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response["X-Cache"], "hit")
+        self.assertContains(response, "Cached")
+
+    def test_csrf_pages_not_cached(self):
+        """A page with a CSRF token in it is never cached"""
+
+        view = CsrfTokenView.as_view()
+        view(RequestFactory().get("/"))
+
+        response = view(RequestFactory().get("/"))
+
+        self.assertEqual(response["X-Cache"], "miss")
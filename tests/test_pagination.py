@@ -0,0 +1,112 @@
+"""File that contains the tests for the keyset paginated lists"""
+
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.authors.views import AuthorDetailView, AuthorListView
+from apps.quotes.models import Quote
+from apps.quotes.views import QuoteListView
+
+
+@mock.patch.object(QuoteListView, "page_size", 2)
+@mock.patch.object(AuthorListView, "page_size", 2)
+@mock.patch.object(AuthorDetailView, "page_size", 2)
+class TestPagination(TestCase):
+    """Class for infinite scroll pagination tests"""
+
+    def setUp(self):
+        """Create enough quotes and authors for a few pages"""
+
+        self.quotes = [
+            Quote.objects.create(text=f"Paged quote {number}")
+            for number in range(5)
+        ]
+        self.authors = [
+            Author.objects.create(name=f"Paged author {number}")
+            for number in range(3)
+        ]
+
+    def collect_pages(self, response):
+        """Follow the next page urls, return all the rows seen"""
+
+        rows = list(response.context["object_list"])
+        while response.context["next_page_url"]:
+            response = self.client.get(response.context["next_page_url"])
+            self.assertEqual(response.status_code, 200)
+            rows.extend(response.context["object_list"])
+        return rows
+
+    def test_quote_list_first_page(self):
+        """Only the first page is rendered, with a link to the next one"""
+
+        response = self.client.get(reverse("quote-list"))
+
+        self.assertEqual(
+            list(response.context["object_list"]), self.quotes[:2]
+        )
+        self.assertContains(response, 'hx-trigger="revealed"')
+
+    def test_quote_list_all_pages(self):
+        """Following the cursors walks every quote exactly once, in order"""
+
+        response = self.client.get(reverse("quote-list"))
+
+        self.assertEqual(self.collect_pages(response), self.quotes)
+
+    def test_quote_list_last_page(self):
+        """The last page has no link to a next one"""
+
+        response = self.client.get(reverse("quote-list"))
+        while response.context["next_page_url"]:
+            response = self.client.get(response.context["next_page_url"])
+
+        self.assertNotContains(response, 'hx-trigger="revealed"')
+
+    def test_quote_search_all_pages(self):
+        """Search results are paginated too"""
+
+        response = self.client.post(reverse("quote-list"), data={"q": "paged"})
+
+        self.assertEqual(
+            sorted(quote.pk for quote in self.collect_pages(response)),
+            [quote.pk for quote in self.quotes],
+        )
+
+    def test_author_list_all_pages(self):
+        """Following the cursors walks every author exactly once, in order"""
+
+        response = self.client.get(reverse("author-list"))
+
+        self.assertEqual(len(response.context["author_list"]), 2)
+        self.assertEqual(self.collect_pages(response), self.authors)
+
+    def test_author_quotes_all_pages(self):
+        """An author's quotes are paginated, oldest first"""
+
+        author = self.authors[0]
+        Quote.objects.filter(pk__in=[q.pk for q in self.quotes]).update(
+            author=author
+        )
+
+        response = self.client.get(reverse("author-detail", args=[author.pk]))
+        rows = list(response.context["quotes"])
+        while response.context["next_page_url"]:
+            response = self.client.get(response.context["next_page_url"])
+            rows.extend(response.context["quotes"])
+
+        self.assertEqual(rows, self.quotes)
+        self.assertTemplateUsed(
+            response, "authors/partials/author_quotes_partial.html"
+        )
+
+    def test_invalid_cursor(self):
+        """A damaged cursor is a bad request"""
+
+        response = self.client.get(
+            reverse("quote-list-page"), {"cursor": "not-a-cursor"}
+        )
+
+        self.assertEqual(response.status_code, 400)
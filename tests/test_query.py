@@ -0,0 +1,183 @@
+"""File that contains the tests for the structured search queries"""
+
+import datetime
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ag_mixins import AgQueryBudgetTestMixin
+from apps.authors.models import Author
+from apps.quotes import search
+from apps.quotes.models import Quote, QuoteSlot
+from apps.quotes.query import (
+    QueryError,
+    QueryPlan,
+    explain_query,
+    is_indexed,
+    parse_query,
+    query_quote_ids,
+)
+
+
+class TestParseQuery(TestCase):
+    """Class for the query parser tests"""
+
+    def test_fields_and_text(self):
+        """Fields are taken out, the rest is text"""
+
+        parsed = parse_query(
+            'author:"Aldous Huxley" Active:yes after:2020-01-02 '
+            'before:2024-01-01T10:00 "exact  phrase" more words'
+        )
+
+        self.assertEqual(parsed.authors, ["Aldous Huxley"])
+        self.assertTrue(parsed.active)
+        self.assertEqual(parsed.after.date(), datetime.date(2020, 1, 2))
+        self.assertEqual(parsed.before.hour, 10)
+        self.assertEqual(parsed.phrases, ["exact phrase"])
+        self.assertEqual(parsed.terms, ["more", "words"])
+        self.assertFalse(parsed.is_plain)
+
+    def test_plain_query(self):
+        """Words only (and unknown fields) are an ordinary search"""
+
+        parsed = parse_query('note:this "single" word')
+
+        self.assertEqual(parsed.terms, ["note", "this", "single", "word"])
+        self.assertTrue(parsed.is_plain)
+
+    def test_bad_values(self):
+        """Values that make no sense are errors"""
+
+        for query in ("active:maybe", "before:yesterday", 'author:""'):
+            with self.assertRaises(QueryError):
+                parse_query(query)
+
+    def test_field_being_typed(self):
+        """A field without a value yet is just text"""
+
+        self.assertEqual(parse_query("author:").terms, ["author"])
+
+
+class TestQueryPlan(AgQueryBudgetTestMixin, TestCase):
+    """Class for the structured query planning and results tests"""
+
+    def setUp(self):
+        """Quotes of two authors, made at different times"""
+
+        search.clear_search_cache()
+        self.huxley = Author.objects.create(name="Aldous", lastname="Huxley")
+        buddha = Author.objects.create(name="Buddha")
+        self.old = Quote.objects.create(
+            text="The truth shall set you free", author=self.huxley
+        )
+        self.new = Quote.objects.create(
+            text="Truth, the whole of it", author=self.huxley, active=True
+        )
+        self.other = Quote.objects.create(
+            text="The truth is simple", author=buddha, active=True
+        )
+        Quote.objects.filter(pk=self.old.pk).update(
+            date_created=timezone.make_aware(datetime.datetime(2020, 1, 1))
+        )
+
+    def ids(self, query):
+        """The ids the query finds"""
+
+        return query_quote_ids(parse_query(query))
+
+    def test_author(self):
+        """Authors are found by name, lastname or full name"""
+
+        for query in ("author:huxley", 'author:"Aldous Huxley"'):
+            self.assertEqual(self.ids(query), [self.old.pk, self.new.pk])
+        self.assertEqual(self.ids("author:Nobody truth"), [])
+
+    def test_fields_filter_the_text_search(self):
+        """The fields narrow down what the text finds"""
+
+        self.assertEqual(
+            set(self.ids("truth active:true")), {self.new.pk, self.other.pk}
+        )
+        self.assertEqual(self.ids("truth before:2021-01-01"), [self.old.pk])
+        self.assertEqual(
+            self.ids("author:Buddha after:2021-01-01 truth"), [self.other.pk]
+        )
+
+    def test_phrase(self):
+        """A phrase matches its words in that order only"""
+
+        self.assertEqual(
+            set(self.ids('"the truth"')), {self.old.pk, self.other.pk}
+        )
+
+    def test_text_drives_the_plan(self):
+        """The full text index is used first, then the other predicates"""
+
+        plan = QueryPlan(parse_query("author:Huxley truth active:true"))
+
+        self.assertEqual(plan.driver, "text")
+        self.assertTrue(plan.predicates()[0].startswith("quotes_quote_fts"))
+
+    def test_indexed_predicate_is_never_scanned(self):
+        """With an indexed predicate the quote table is never scanned"""
+
+        lines = explain_query(parse_query("author:Huxley active:true"))
+
+        self.assertTrue(lines[0].startswith("driver author"))
+        self.assertTrue(any(line.startswith("SEARCH") for line in lines))
+        self.assertFalse(
+            any(line.startswith("SCAN quotes_quote") for line in lines)
+        )
+
+    def test_is_indexed(self):
+        """Columns that lead an index or a partial one's condition are"""
+
+        self.assertTrue(is_indexed(Quote, "author"))
+        self.assertTrue(is_indexed(Quote, "date_created"))
+        self.assertTrue(is_indexed(Quote, "active"))
+        self.assertTrue(is_indexed(QuoteSlot, "slot"))
+        self.assertFalse(is_indexed(Quote, "text"))
+
+    def test_list_view(self):
+        """The quote list takes structured queries, and reports bad ones"""
+
+        url = reverse("quote-list-page")
+
+        response = self.client.get(url, {"q": "author:Buddha"})
+        self.assertContains(response, "The truth is simple")
+        self.assertNotContains(response, "free")
+
+        response = self.client.get(url, {"q": "active:maybe"})
+        self.assertContains(response, "active: must be true or false")
+
+        self.assert_within_query_budget(f"{url}?q=author%3ABuddha+truth")
+
+    def test_api(self):
+        """The API search takes structured queries, bad ones are a 400"""
+
+        url = reverse("api-quote-search")
+
+        response = self.client.get(url, {"q": "author:Buddha"})
+        self.assertEqual(
+            [quote["id"] for quote in response.json()["results"]],
+            [self.other.pk],
+        )
+        self.assertNotIn("plan", response.json())
+
+        response = self.client.get(url, {"q": "before:soon"})
+        self.assertEqual(response.status_code, 400)
+
+        self.assert_within_query_budget(f"{url}?q=author%3ABuddha+truth")
+
+    @override_settings(DEBUG=True)
+    def test_api_explain(self):
+        """With DEBUG on the API shows the plan"""
+
+        response = self.client.get(
+            reverse("api-quote-search"),
+            {"q": "author:Buddha truth", "explain": "1"},
+        )
+
+        self.assertTrue(response.json()["plan"][0].startswith("driver text"))
@@ -0,0 +1,117 @@
+"""File that contains the tests for the views' query budgets"""
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.views import View
+
+from ag_mixins import (
+    AgQueryBudgetMixin,
+    AgQueryBudgetTestMixin,
+    QueryBudgetExceeded,
+)
+from apps.authors.models import Author
+from apps.quotes.models import Quote
+
+
+class TwoQueriesView(AgQueryBudgetMixin, View):
+    """A view that runs two queries, but is only allowed one"""
+
+    query_budget = 1
+
+    def get(self, _request):
+        """Run two queries"""
+        Quote.objects.count()
+        Author.objects.count()
+        return HttpResponse()
+
+
+class TestQueryBudget(AgQueryBudgetTestMixin, TestCase):
+    """Class for query budget tests"""
+
+    def setUp(self):
+        """Enough quotes by different authors to show an N+1 problem"""
+
+        self.authors = [
+            Author.objects.create(name=f"Author {number}")
+            for number in range(10)
+        ]
+        self.quotes = [
+            Quote.objects.create(text=f"Quote {number}", author=author)
+            for number, author in enumerate(self.authors)
+        ]
+        self.user = User.objects.create_user(
+            username="test", password="password", is_superuser=True
+        )
+
+    def test_budget_exceeded_strict(self):
+        """Over the budget the view fails loudly"""
+
+        request = RequestFactory().get("/")
+
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                TwoQueriesView.as_view()(request)
+
+    def test_budget_exceeded_not_strict(self):
+        """Outside of strict mode it's only logged"""
+
+        request = RequestFactory().get("/")
+
+        with override_settings(QUERY_BUDGET_STRICT=False):
+            with self.assertLogs("ag_mixins", "ERROR"):
+                TwoQueriesView.as_view()(request)
+
+        self.assertEqual(request.query_count, 2)
+
+    def test_index_budget(self):
+        """Index view stays within its budget"""
+
+        self.assert_within_query_budget(reverse("index"))
+
+    def test_random_quote_budget(self):
+        """Random quote view stays within its budget"""
+
+        self.assert_within_query_budget(reverse("random-quote"))
+
+    def test_quote_list_budget(self):
+        """Quote list doesn't run a query per quote author"""
+
+        self.client.login(username="test", password="password")
+
+        response = self.assert_within_query_budget(reverse("quote-list"))
+        self.assertContains(response, "Author 9")
+
+    def test_quote_search_budget(self):
+        """Quote search doesn't run a query per quote author"""
+
+        self.client.login(username="test", password="password")
+
+        response = self.assert_within_query_budget(
+            reverse("quote-list"), method="post", data={"q": "quote"}
+        )
+        self.assertContains(response, "Author 9")
+
+    def test_quote_detail_budget(self):
+        """Quote detail view stays within its budget"""
+
+        self.assert_within_query_budget(
+            reverse("quote-detail", kwargs={"pk": self.quotes[0].pk})
+        )
+
+    def test_author_list_budget(self):
+        """Author list view stays within its budget"""
+
+        self.client.login(username="test", password="password")
+
+        self.assert_within_query_budget(reverse("author-list"))
+
+    def test_author_detail_budget(self):
+        """Author detail view stays within its budget"""
+
+        self.client.login(username="test", password="password")
+
+        self.assert_within_query_budget(
+            reverse("author-detail", kwargs={"pk": self.authors[0].pk})
+        )
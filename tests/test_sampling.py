@@ -0,0 +1,87 @@
+"""File that contains the tests for picking a random quote"""
+
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.quotes import sampling
+from apps.quotes.models import Quote, QuoteSlot
+
+
+class TestSampling(TestCase):
+    """Class for random quote sampler tests"""
+
+    def setUp(self):
+        """Create a few quotes, every one of them should get a slot"""
+
+        self.quotes = [
+            Quote.objects.create(text=f"Quote {number}") for number in range(5)
+        ]
+
+    def assert_slots_are_dense(self):
+        """Slots must be exactly 0..n-1, one per quote"""
+
+        slots = sorted(QuoteSlot.objects.values_list("slot", flat=True))
+        self.assertEqual(slots, list(range(Quote.objects.count())))
+
+    def test_new_quotes_get_slots(self):
+        """Every created quote gets the next slot"""
+
+        self.assert_slots_are_dense()
+        self.assertEqual(self.quotes[-1].sample_slot.slot, 4)
+
+    def test_slots_stay_dense_after_delete(self):
+        """Deleting a quote from the middle doesn't leave a hole"""
+
+        self.quotes[1].delete()
+
+        self.assert_slots_are_dense()
+
+    def test_slots_stay_dense_after_bulk_delete(self):
+        """Deleting through a queryset doesn't leave holes either"""
+
+        Quote.objects.filter(
+            pk__in=[self.quotes[0].pk, self.quotes[2].pk]
+        ).delete()
+
+        self.assert_slots_are_dense()
+
+    def test_every_quote_can_be_picked_with_id_gaps(self):
+        """Every remaining quote is reachable, even with gaps in the ids"""
+
+        self.quotes[0].delete()
+        self.quotes[3].delete()
+
+        picked = set()
+        for slot in range(3):
+            with mock.patch.object(
+                sampling.secrets, "randbelow", return_value=slot
+            ):
+                picked.add(sampling.random_quote().pk)
+
+        self.assertEqual(
+            picked, set(Quote.objects.values_list("pk", flat=True))
+        )
+
+    def test_random_quote_no_quotes(self):
+        """None is returned when there are no quotes"""
+
+        Quote.objects.all().delete()
+
+        self.assertIsNone(sampling.random_quote())
+
+    def test_random_quote_without_slots_falls_back(self):
+        """Quotes without slots are still found (the slow way)"""
+
+        QuoteSlot.objects.all().delete()
+
+        with self.assertLogs("apps.quotes.sampling", "WARNING"):
+            self.assertIn(sampling.random_quote(), self.quotes)
+
+    def test_rebuild_slots(self):
+        """Rebuilding numbers every quote again"""
+
+        QuoteSlot.objects.filter(slot__lt=3).delete()
+
+        self.assertEqual(sampling.rebuild_slots(), 5)
+        self.assert_slots_are_dense()
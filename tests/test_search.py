@@ -0,0 +1,255 @@
+"""File that contains the tests for the quote search"""
+
+import threading
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from apps.authors.models import Author
+from apps.quotes import search
+from apps.quotes.models import Quote
+
+
+class TestSearch(TestCase):
+    """Class for quote search tests"""
+
+    def setUp(self):
+        """Create a few quotes to search through"""
+
+        self.huxley = Author.objects.create(name="Aldous", lastname="Huxley")
+        self.words = Quote.objects.create(
+            text="Words can be like X-rays if you use them properly",
+            author=self.huxley,
+        )
+        self.illusion = Quote.objects.create(
+            text="The hard truth is better than the ilusión of everything"
+        )
+        self.truth = Quote.objects.create(
+            text="Truth, truth and nothing but the truth"
+        )
+
+    def test_full_text_index_exists(self):
+        """Tests run on SQLite, which has FTS5"""
+
+        self.assertTrue(search.fts_available())
+
+    def test_search_by_word(self):
+        """A word finds the quotes that contain it"""
+
+        self.assertEqual(
+            set(search.search_quote_ids("words")), {self.words.pk}
+        )
+
+    def test_search_by_prefix(self):
+        """Half typed words match too"""
+
+        self.assertEqual(search.search_quote_ids("prop"), [self.words.pk])
+
+    def test_search_ignores_diacritics(self):
+        """'ilusion' finds 'ilusión'"""
+
+        self.assertEqual(
+            search.search_quote_ids("ilusion"), [self.illusion.pk]
+        )
+
+    def test_search_ranks_best_match_first(self):
+        """The quote that is all about truth comes first"""
+
+        self.assertEqual(
+            search.search_quote_ids("truth"),
+            [self.truth.pk, self.illusion.pk],
+        )
+
+    def test_search_by_author(self):
+        """Author name and lastname are searched too"""
+
+        self.assertEqual(search.search_quote_ids("huxley"), [self.words.pk])
+
+    def test_search_limit(self):
+        """No more than the limit of results is returned"""
+
+        self.assertEqual(len(search.search_quote_ids("the", limit=1)), 1)
+
+    def test_search_syntax_characters_are_harmless(self):
+        """FTS5 syntax in the query doesn't break the search"""
+
+        self.assertEqual(
+            search.search_quote_ids('"truth AND ('), [self.truth.pk]
+        )
+        self.assertEqual(search.search_quote_ids("***"), [])
+
+    def test_index_follows_quote_changes(self):
+        """Updated and deleted quotes are reindexed by the triggers"""
+
+        self.words.text = "Completely different now"
+        self.words.save()
+        self.illusion.delete()
+
+        self.assertEqual(search.search_quote_ids("words"), [])
+        self.assertEqual(search.search_quote_ids("ilusion"), [])
+        self.assertEqual(search.search_quote_ids("different"), [self.words.pk])
+
+    def test_index_follows_author_changes(self):
+        """Renaming the author reindexes their quotes"""
+
+        self.huxley.lastname = "Orwell"
+        self.huxley.save()
+
+        self.assertEqual(search.search_quote_ids("huxley"), [])
+        self.assertEqual(search.search_quote_ids("orwell"), [self.words.pk])
+
+    def test_index_follows_author_delete(self):
+        """Deleting the author leaves the quote without one"""
+
+        self.huxley.delete()
+
+        self.assertEqual(search.search_quote_ids("huxley"), [])
+        self.assertEqual(search.search_quote_ids("words"), [self.words.pk])
+
+    def test_fallback_without_full_text_index(self):
+        """Without FTS5 the old substring search is used"""
+
+        with mock.patch.object(search, "fts_available", return_value=False):
+            self.assertEqual(
+                search.search_quote_ids("ruth"),
+                [self.illusion.pk, self.truth.pk],
+            )
+
+    def test_rebuild_command(self):
+        """Rebuilding indexes every quote again"""
+
+        call_command("rebuild_quote_search", stdout=mock.MagicMock())
+
+        self.assertEqual(search.search_quote_ids("words"), [self.words.pk])
+
+    def test_missing_triggers_are_recreated(self):
+        """Triggers dropped by a table rebuild come back after migrate"""
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {search.FTS_TABLE}_quote_insert")
+        Quote.objects.create(text="Lost words")
+
+        with self.assertLogs("apps.quotes.search", "WARNING"):
+            recreated = search.ensure_triggers()
+        Quote.objects.create(text="Found words")
+
+        self.assertEqual(recreated, [f"{search.FTS_TABLE}_quote_insert"])
+        self.assertEqual(len(search.search_quote_ids("words")), 3)
+        self.assertEqual(search.ensure_triggers(), [])
+
+    def test_deferred_indexing(self):
+        """Quotes inserted in the block are indexed at its end, once"""
+
+        with search.deferred_indexing():
+            first = Quote.objects.create(text="Deferred words")
+            self.assertEqual(search.search_quote_ids("deferred"), [])
+            # updated before the end, indexed by the update trigger already
+            second = Quote.objects.create(text="Deferred too")
+            second.text = "Deferred again"
+            second.save()
+
+        self.assertEqual(
+            sorted(search.search_quote_ids("deferred")),
+            [first.pk, second.pk],
+        )
+        self.assertEqual(search.ensure_triggers(), [])
+
+
+class TestSearchResultCache(TestCase):
+    """Class for the search result cache tests"""
+
+    def setUp(self):
+        """A quote to find, nothing cached yet"""
+
+        search.clear_search_cache()
+        self.quote = Quote.objects.create(text="Truth be told")
+
+    def test_repeated_search_is_cached(self):
+        """The same query, however it's typed, runs only once"""
+
+        self.assertEqual(search.search_quote_ids("truth"), [self.quote.pk])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                search.search_quote_ids("  TRUTH!"), [self.quote.pk]
+            )
+
+    def test_writes_invalidate(self):
+        """Saved quotes show up in the results right away"""
+
+        search.search_quote_ids("truth")
+        other = Quote.objects.create(text="Truth hurts")
+
+        self.assertEqual(
+            set(search.search_quote_ids("truth")), {self.quote.pk, other.pk}
+        )
+
+    def test_cached_results_can_be_changed(self):
+        """Changing the returned list doesn't change the cached one"""
+
+        search.search_quote_ids("truth").clear()
+
+        self.assertEqual(search.search_quote_ids("truth"), [self.quote.pk])
+
+    def test_least_recently_used_are_evicted(self):
+        """The cache doesn't grow beyond its size"""
+
+        cache = search.SearchResultCache(max_size=2)
+        for key in ("a", "b", "a", "c"):
+            cache.get_or_search(key, "1", lambda: [1])
+
+        self.assertEqual(list(cache.results), ["a", "c"])
+        self.assertEqual(cache.stats["hit"], 1)
+
+    def test_other_versions_empty_the_cache(self):
+        """Results searched at older versions are not served"""
+
+        cache = search.SearchResultCache(max_size=2)
+        cache.get_or_search("a", "1", lambda: [1])
+
+        self.assertEqual(cache.get_or_search("a", "2", lambda: [2]), [2])
+
+    def test_identical_misses_search_once(self):
+        """Concurrent identical searches wait for the one that runs"""
+
+        cache = search.SearchResultCache(max_size=2)
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_search():
+            calls.append(1)
+            release.wait(5)
+            return [1, 2]
+
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    cache.get_or_search("a", "1", slow_search)
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        # let the others queue up behind the first one
+        while cache.stats["coalesced"] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[1, 2]] * 5)
+
+    def test_failed_search_is_not_cached(self):
+        """When the search fails, the waiting ones search on their own"""
+
+        cache = search.SearchResultCache(max_size=2)
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_search("a", "1", mock.Mock(side_effect=RuntimeError))
+
+        self.assertEqual(cache.get_or_search("a", "1", lambda: [1]), [1])
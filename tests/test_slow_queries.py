@@ -0,0 +1,164 @@
+"""File that contains the tests for the slow query log"""
+
+# pylint: disable=protected-access
+
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.metrics import slow_queries
+from apps.quotes.models import Quote
+
+
+class TestSlowQueries(TestCase):
+    """Class for the slow query log tests"""
+
+    def setUp(self):
+        """Authors, one with a quote, no fingerprint explained yet"""
+
+        slow_queries._explained.clear()
+        self.author = Author.objects.create(name="Buddha")
+        self.other = Author.objects.create(name="Seneca")
+        Quote.objects.create(text="Slow", author=self.author)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_logged_with_view_and_plan(self):
+        """A slow query is logged with its view, and explained once"""
+
+        with self.assertLogs("apps.metrics.slow_queries", "WARNING") as logs:
+            for author in (self.author, self.other):
+                self.client.get(reverse("author-detail", args=[author.pk]))
+
+        entries = [
+            record
+            for record in logs.records
+            if "quotes_quote" in record.sql and record.sql.startswith("SELECT")
+        ]
+        self.assertGreaterEqual(len(entries), 2)
+        self.assertEqual({entry.view for entry in entries}, {"author-detail"})
+        first, *others = [
+            entry
+            for entry in entries
+            if entry.fingerprint == entries[0].fingerprint
+        ]
+        self.assertTrue(first.plan)
+        self.assertIn("quotes_quote", " ".join(first.plan))
+        self.assertTrue(others)
+        self.assertTrue(all(entry.plan is None for entry in others))
+        # the same query, with the other author's params
+        self.assertNotEqual(
+            first.params_fingerprint, others[-1].params_fingerprint
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_outside_of_requests(self):
+        """A slow query outside of a request has no view"""
+
+        with self.assertLogs("apps.metrics.slow_queries", "WARNING") as logs:
+            list(Author.objects.all())
+
+        self.assertIsNone(logs.records[0].view)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_off(self):
+        """Without a threshold nothing is logged"""
+
+        with self.assertNoLogs("apps.metrics.slow_queries"):
+            self.client.get(reverse("author-detail", args=[self.author.pk]))
+
+    def test_fingerprint_ignores_values(self):
+        """The same query with other values has the same fingerprint"""
+
+        self.assertEqual(
+            slow_queries.normalize(
+                "SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21"
+            ),
+            slow_queries.normalize("SELECT * FROM t WHERE id IN (%s) LIMIT 5"),
+        )
+
+    def test_command(self):
+        """The command groups the logged queries by fingerprint"""
+
+        def entry(fingerprint, seconds, plan=None):
+            return json.dumps(
+                {
+                    "time": "2024-01-01T00:00:00+00:00",
+                    "sql": f"SELECT {fingerprint}",
+                    "fingerprint": fingerprint,
+                    "seconds": seconds,
+                    "view": "quote-list",
+                    "plan": plan,
+                }
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "slow_queries.jsonl")
+            with open(f"{log}.1", "w", encoding="utf-8") as file:
+                file.write(entry("slowest", 2.0, ["SCAN quotes_quote"]) + "\n")
+            with open(log, "w", encoding="utf-8") as file:
+                file.write(entry("slowest", 1.0) + "\n")
+                file.write(entry("other", 0.5) + "\n")
+                # killed while writing
+                file.write('{"sql": "SEL')
+
+            out = io.StringIO()
+            call_command("slow_queries", log=log, limit=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("slowest: 2 times, 3.000s total, 2.000s worst", output)
+        self.assertIn("| SCAN quotes_quote", output)
+        self.assertNotIn("other:", output)
+        self.assertIn("Successfully read 2 slow queries", output)
+
+    def test_logs_of_all_processes(self):
+        """The logs of every process are read, merged by time"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            for pid, fingerprint, second in ((1, "a", 1), (2, "b", 2)):
+                # the rotated file is read although its current one isn't
+                # written yet
+                log = os.path.join(directory, f"slow_queries.{pid}.jsonl.1")
+                with open(log, "a", encoding="utf-8") as file:
+                    file.write(
+                        json.dumps(
+                            {
+                                "time": f"2024-01-01T00:00:0{second}",
+                                "sql": "SELECT 1",
+                                "fingerprint": fingerprint,
+                                "seconds": 0.5,
+                            }
+                        )
+                        + "\n"
+                    )
+            with open(
+                os.path.join(directory, "slow_queries.1.jsonl"),
+                "w",
+                encoding="utf-8",
+            ) as file:
+                file.write(
+                    json.dumps(
+                        {
+                            "time": "2024-01-01T00:00:03",
+                            "sql": "SELECT 1",
+                            "fingerprint": "c",
+                            "seconds": 0.5,
+                        }
+                    )
+                    + "\n"
+                )
+
+            entries = list(
+                slow_queries.read_entries(
+                    os.path.join(directory, "slow_queries.{pid}.jsonl")
+                )
+            )
+
+        self.assertEqual(
+            [entry["fingerprint"] for entry in entries], ["a", "b", "c"]
+        )
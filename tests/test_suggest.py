@@ -0,0 +1,205 @@
+"""File that contains the tests for the search box autocomplete"""
+
+# pylint: disable=protected-access
+
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.authors.models import Author
+from apps.quotes import suggest
+from apps.quotes.models import Quote
+from apps.quotes.signals import quotes_bulk_changed
+
+
+class TestPrefixIndex(TestCase):
+    """Class for the prefix index tests"""
+
+    def test_most_common_first(self):
+        """Completions are ordered by count, then alphabetically"""
+
+        index = suggest.PrefixIndex({"truth": 3, "true": 1, "trust": 3})
+
+        self.assertEqual(index.complete("tru"), ["trust", "truth", "true"])
+        self.assertEqual(index.complete("tru", limit=1), ["trust"])
+        self.assertEqual(index.complete("x"), [])
+
+    def test_changes_reach_remembered_completions(self):
+        """Short prefixes' completions follow added and removed words"""
+
+        index = suggest.PrefixIndex({"truth": 1})
+        self.assertEqual(index.complete("t"), ["truth"])
+
+        index.add({"tree", "truth"})
+        index.remove({"truth"})
+        index.remove({"truth"})
+
+        self.assertEqual(index.complete("t"), ["tree"])
+        self.assertEqual(index.words, ["tree"])
+
+    def test_max_words(self):
+        """Only the most common words are kept"""
+
+        index = suggest.PrefixIndex({"one": 1, "two": 2, "six": 6}, 2)
+        index.add({"ten"})
+
+        self.assertEqual(index.words, ["six", "two"])
+
+    def test_words_are_normalized(self):
+        """Words are lowercase, without diacritics, numbers or short ones"""
+
+        self.assertEqual(
+            suggest.words_of("La ilusión de 1984, Ilusión!"), {"ilusion"}
+        )
+
+
+class TestSuggest(TestCase):
+    """Class for the quote suggestion tests"""
+
+    def setUp(self):
+        """Quotes and authors to suggest words from"""
+
+        suggest.forget_index()
+        self.author = Author.objects.create(name="Aldous", lastname="Huxley")
+        self.quote = Quote.objects.create(
+            text="Words can be like X-rays", author=self.author
+        )
+        Quote.objects.create(text="Words, words, wonders")
+
+    def test_suggest(self):
+        """The last word typed is completed from quotes and authors"""
+
+        self.assertEqual(
+            suggest.suggest("x-rays and WO"), ["words", "wonders"]
+        )
+        self.assertEqual(suggest.suggest("hux"), ["huxley"])
+        self.assertEqual(suggest.suggest("  "), [])
+
+    def test_index_follows_quote_changes(self):
+        """New, changed and deleted quotes change the suggestions"""
+
+        suggest.suggest("w")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quote.text = "Wisdom begins in wonder"
+            self.quote.save()
+        self.assertEqual(suggest.suggest("wi"), ["wisdom"])
+        self.assertEqual(
+            suggest.suggest("w"), ["wisdom", "wonder", "wonders", "words"]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quote.delete()
+        self.assertEqual(suggest.suggest("wi"), [])
+
+    def test_index_follows_author_changes(self):
+        """Renamed and deleted authors change the suggestions"""
+
+        suggest.suggest("h")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.lastname = "Orwell"
+            self.author.save()
+        self.assertEqual(suggest.suggest("hux"), [])
+        self.assertEqual(suggest.suggest("orw"), ["orwell"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertEqual(suggest.suggest("orw"), [])
+
+    def test_bulk_changes_rebuild(self):
+        """After a bulk change the index is built again"""
+
+        suggest.suggest("w")
+        Quote.objects.bulk_create([Quote(text="Bulky words")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quotes_bulk_changed.send(sender=Quote)
+
+        self.assertEqual(suggest.suggest("bul"), ["bulky"])
+
+    def test_index_is_built_once(self):
+        """Concurrent suggestions without an index wait for one build"""
+
+        release = threading.Event()
+        built = []
+
+        def slow_build():
+            built.append(1)
+            release.wait(5)
+            index = suggest.PrefixIndex({"words": 1})
+            suggest._index.update(index=index, built=time.monotonic())
+            return index
+
+        results = []
+        with mock.patch.object(suggest, "build_index", slow_build):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(suggest.suggest("wo"))
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            while not built:
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(built), 1)
+        self.assertEqual(results, [["words"]] * 5)
+
+    @override_settings(QUOTES_SUGGEST_MAX_AGE=0)
+    def test_old_index_is_served_while_building(self):
+        """An old index keeps answering while one thread builds the new one"""
+
+        suggest.suggest("w")
+        release = threading.Event()
+
+        def slow_build():
+            release.wait(5)
+
+        with mock.patch.object(suggest, "build_index", slow_build):
+            builder = threading.Thread(target=suggest.get_index)
+            builder.start()
+            while not suggest._build_lock.locked():
+                threading.Event().wait(0.01)
+
+            self.assertEqual(suggest.suggest("hux"), ["huxley"])
+            release.set()
+            builder.join()
+
+    def test_stats(self):
+        """The size of the index is reported"""
+
+        self.assertIsNone(suggest.suggest_index_stats()["words"])
+
+        suggest.suggest("w")
+
+        stats = suggest.suggest_index_stats()
+        self.assertEqual(stats["words"], 7)
+        self.assertGreater(stats["memory_bytes"], 0)
+
+    def test_suggest_view(self):
+        """The view returns the completions as JSON"""
+
+        response = self.client.get(
+            reverse("quote-suggest"), {"prefix": "wo", "limit": 1}
+        )
+
+        self.assertEqual(
+            response.json(), {"prefix": "wo", "suggestions": ["words"]}
+        )
+
+    def test_suggest_view_bad_limit(self):
+        """A limit that isn't a number is a bad request"""
+
+        response = self.client.get(
+            reverse("quote-suggest"), {"prefix": "wo", "limit": "many"}
+        )
+
+        self.assertEqual(response.status_code, 400)